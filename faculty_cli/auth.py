@@ -0,0 +1,267 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Credentials handling and authentication."""
+
+import datetime
+import math
+import os
+import stat
+import textwrap
+import uuid
+
+import click
+import faculty
+import faculty.clients.base
+import faculty.config
+import faculty.session
+from faculty.session.accesstoken import AccessToken, AccessTokenMemoryCache
+
+import faculty_cli.cache
+import faculty_cli.util
+
+
+def populate_creds_file():
+    """Prompt user for client ID and secret and save them."""
+    while True:
+        domain = click.prompt(
+            "Domain", default=faculty.config.DEFAULT_DOMAIN, err=True
+        )
+        client_id = click.prompt("Client ID", err=True).strip()
+        client_secret = click.prompt("Client secret", err=True).strip()
+
+        profile = faculty.config.Profile(
+            domain=domain,
+            protocol=faculty.config.DEFAULT_PROTOCOL,
+            client_id=client_id,
+            client_secret=client_secret,
+        )
+        credentials_session = faculty.session.Session(
+            profile, AccessTokenMemoryCache()
+        )
+
+        try:
+            credentials_session.access_token()
+        except Exception:
+            click.echo("Invalid credentials. Please try again.", err=True)
+        else:
+            break
+
+    credentials = textwrap.dedent(
+        """\
+        [{profile}]
+        domain = {domain}
+        client_id = {client_id}
+        client_secret = {client_secret}
+        """.format(
+            profile=faculty.config.DEFAULT_PROFILE,
+            client_id=client_id,
+            client_secret=client_secret,
+            domain=domain,
+        )
+    )
+    credentials_file = faculty.config.resolve_credentials_path()
+    try:
+        os.makedirs(os.path.dirname(credentials_file))
+    except OSError:
+        pass
+    with open(credentials_file, "w") as creds_file:
+        creds_file.write(credentials)
+    os.chmod(
+        credentials_file,
+        stat.S_IRUSR | stat.S_IWUSR & ~stat.S_IRGRP & ~stat.S_IROTH,
+    )
+
+
+def _check_creds_file_perms():
+    """Check the permissions of the credentials file are correct."""
+    credentials_file = faculty.config.resolve_credentials_path()
+    if oct(os.stat(credentials_file).st_mode & 0o777)[-2:] != "00":
+        msg = textwrap.dedent(
+            """\
+        Permissions for {0} are too open.
+        Your credentials file must not be accessible to other users on this
+        computer.
+        Run 'chmod 0600 {0}' to fix this.""".format(
+                credentials_file
+            )
+        )
+        faculty_cli.util.print_and_exit(msg, 66)
+
+
+def _ensure_creds_file_present():
+    """Ensure the user's credentials file is present."""
+    credentials_file = faculty.config.resolve_credentials_path()
+    try:
+        open(credentials_file)
+    except IOError:
+        msg = textwrap.dedent(
+            """\
+        It looks like this is the first time you've used the Faculty CLI on
+        this computer, so you must enter your Faculty credentials. They'll be
+        saved so you don't have to enter them again.
+        """
+        )
+        click.echo(msg, err=True)
+        populate_creds_file()
+
+
+def check_credentials():
+    """Check if credentials are present in environment or config file."""
+    try:
+        faculty.config.resolve_profile()
+    except faculty.config.CredentialsError:
+        _ensure_creds_file_present()
+        _check_creds_file_perms()
+
+
+class AccessTokenFileCache:
+    """A cache for access tokens, shared between invocations of the CLI.
+
+    Tokens are stored per profile in the local cache. When no valid token is
+    cached, a lock is held while a new one is fetched, so that concurrent
+    invocations share a single token refresh.
+    """
+
+    # Tokens are renewed this long before they expire, so that they do not
+    # expire while a command is running
+    EXPIRY_MARGIN = datetime.timedelta(seconds=60)
+
+    def __init__(self):
+        self._tokens = {}
+
+    def _is_valid(self, access_token):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        return access_token is not None and access_token.expires_at >= (
+            now + self.EXPIRY_MARGIN
+        )
+
+    def _load(self, profile):
+        access_token = self._tokens.get(profile)
+        if not self._is_valid(access_token):
+            # Another invocation may have stored a newer token
+            access_token = None
+            data = faculty_cli.cache.load(profile, "access_token", math.inf)
+            if data is not None:
+                access_token = AccessToken(
+                    data["token"],
+                    datetime.datetime.fromtimestamp(
+                        data["expires_at"], datetime.timezone.utc
+                    ),
+                )
+            if not self._is_valid(access_token):
+                return None
+        self._tokens[profile] = access_token
+        return access_token
+
+    def get(self, profile):
+        """Get a valid access token, fetching a new one if needed."""
+        access_token = self._load(profile)
+        if access_token is None:
+            with faculty_cli.cache.lock(profile, "access_token"):
+                # Another invocation may have refreshed the token while we
+                # were waiting for the lock
+                access_token = self._load(profile)
+                if access_token is None:
+                    session = faculty.session.Session(
+                        profile, AccessTokenMemoryCache()
+                    )
+                    access_token = session.access_token()
+                    self.add(profile, access_token)
+        return access_token
+
+    def add(self, profile, access_token):
+        """Insert an access token into the cache."""
+        self._tokens[profile] = access_token
+        data = {
+            "token": access_token.token,
+            "expires_at": access_token.expires_at.timestamp(),
+        }
+        faculty_cli.cache.store(profile, "access_token", data)
+
+
+_ACCESS_TOKEN_CACHE = AccessTokenFileCache()
+
+
+_CLIENTS = {}
+
+
+def client(resource):
+    """Get a client for a Faculty resource.
+
+    Clients are reused within a process, so that commands run together share
+    HTTP connections, and share access tokens with other invocations of the
+    CLI.
+    """
+    key = (faculty.config.resolve_profile(), resource)
+    if key not in _CLIENTS:
+        _CLIENTS[key] = faculty.client(
+            resource, access_token_cache=_ACCESS_TOKEN_CACHE
+        )
+    return _CLIENTS[key]
+
+
+def session():
+    """Get a Faculty session sharing access tokens with other invocations."""
+    return faculty.session.get_session(access_token_cache=_ACCESS_TOKEN_CACHE)
+
+
+_USER_IDS = {}
+
+
+def get_authenticated_user_id(refresh=False):
+    """Get the ID of the authenticated user.
+
+    The ID is cached per profile, as it does not change for a given set of
+    credentials. Pass refresh=True to fetch it again regardless.
+    """
+    profile = faculty.config.resolve_profile()
+    if not refresh:
+        if profile in _USER_IDS:
+            return _USER_IDS[profile]
+        user_id = faculty_cli.cache.load(profile, "user_id", ttl=math.inf)
+        if user_id is not None:
+            _USER_IDS[profile] = uuid.UUID(user_id)
+            return _USER_IDS[profile]
+    account_client = client("account")
+    user_id = account_client.authenticated_user_id()
+    faculty_cli.cache.store(profile, "user_id", str(user_id))
+    _USER_IDS[profile] = user_id
+    return user_id
+
+
+def with_authenticated_user_id(function, *args, **kwargs):
+    """Call a function with the ID of the authenticated user.
+
+    If the request is rejected, the cached user ID may belong to other
+    credentials, so it is fetched again and the call retried if it changed.
+    """
+    user_id = get_authenticated_user_id()
+    try:
+        return function(user_id, *args, **kwargs)
+    except (faculty.clients.base.Unauthorized, faculty.clients.base.Forbidden):
+        fresh_user_id = get_authenticated_user_id(refresh=True)
+        if fresh_user_id == user_id:
+            raise
+        return function(fresh_user_id, *args, **kwargs)
+
+
+@click.command()
+def login():
+    """Write Faculty credentials to file."""
+    credentials_file = faculty.config.resolve_credentials_path()
+    if os.path.exists(credentials_file):
+        if not click.confirm("Overwrite existing credentials file?"):
+            return
+    populate_creds_file()
@@ -0,0 +1,88 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Command for running many commands in one process."""
+
+import concurrent.futures
+import shlex
+import sys
+
+import click
+
+import faculty_cli.cli
+import faculty_cli.util
+
+
+def _parse_commands(lines):
+    """Parse lines of commands to run, skipping blank lines and comments."""
+    commands = []
+    for line_number, line in enumerate(lines, start=1):
+        try:
+            argv = shlex.split(line, comments=True)
+        except ValueError as err:
+            raise ValueError("line {}: {}".format(line_number, err))
+        if argv and argv[0] == "faculty":
+            argv = argv[1:]
+        if argv:
+            commands.append((line_number, line.strip(), argv))
+    return commands
+
+
+@click.command()
+@click.argument("file", type=click.File("r"), default="-")
+@click.option(
+    "--parallel",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of commands to run at the same time.",
+)
+def batch(file, parallel):
+    """Run many commands in one process.
+
+    Commands are read from FILE, or from standard input if it is '-' or not
+    given, one per line in the same form as on the command line, with or
+    without a leading 'faculty'. Blank lines and comments starting with '#'
+    are skipped.
+
+    Commands share clients, access tokens and cached names, so that each
+    does not pay the cost of starting the CLI. The exit status of each
+    command is printed to standard error with its line number, and the exit
+    status of the batch is non-zero if any command failed.
+    """
+    try:
+        commands = _parse_commands(file)
+    except ValueError as err:
+        faculty_cli.util.print_and_exit(
+            "Invalid batch file: {}".format(err), 64
+        )
+
+    def run(command):
+        line_number, line, argv = command
+        try:
+            exit_code = faculty_cli.cli.run(argv)
+        except Exception as exc:  # pylint: disable=broad-except
+            click.echo("Error: {}".format(exc), err=True)
+            exit_code = 1
+        sys.stdout.flush()
+        click.echo("{}\t{}\t{}".format(line_number, exit_code, line), err=True)
+        return exit_code
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=parallel
+    ) as executor:
+        exit_codes = list(executor.map(run, commands))
+
+    if any(exit_codes):
+        sys.exit(1)
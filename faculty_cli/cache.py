@@ -0,0 +1,162 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Local cache of Faculty resources, shared between invocations of the CLI.
+
+Entries are stored as JSON files under a directory per profile, so that
+different users or deployments never share cached data.
+"""
+
+import contextlib
+import fcntl
+import glob
+import json
+import os
+import shutil
+import threading
+import time
+
+import click
+
+
+CACHE_TTL_ENV_VAR = "FACULTY_CLI_CACHE_TTL"
+DEFAULT_CACHE_TTL = 3600
+
+
+def cache_directory():
+    """Return the directory the Faculty CLI caches data in."""
+    xdg_cache_dir = os.environ.get("XDG_CACHE_DIR")
+
+    if not xdg_cache_dir:
+        xdg_cache_dir = os.path.expanduser("~/.cache")
+
+    return os.path.join(xdg_cache_dir, "faculty")
+
+
+def _profile_directory(profile):
+    key = "{}_{}".format(profile.domain, profile.client_id)
+    return os.path.join(cache_directory(), "profiles", key)
+
+
+def _entry_path(profile, name):
+    return os.path.join(_profile_directory(profile), name + ".json")
+
+
+def default_ttl():
+    """Return the time in seconds for which cached entries are valid.
+
+    This can be configured with the FACULTY_CLI_CACHE_TTL environment variable.
+    Setting it to zero disables the cache.
+    """
+    try:
+        return float(os.environ[CACHE_TTL_ENV_VAR])
+    except (KeyError, ValueError):
+        return DEFAULT_CACHE_TTL
+
+
+def load(profile, name, ttl=None):
+    """Load a cached entry, or None if it is missing or has expired."""
+    if default_ttl() <= 0:
+        return None
+    if ttl is None:
+        ttl = default_ttl()
+    try:
+        with open(_entry_path(profile, name)) as fp:
+            entry = json.load(fp)
+    except (OSError, ValueError):
+        return None
+    try:
+        if time.time() - entry["created_at"] >= ttl:
+            return None
+        return entry["data"]
+    except (KeyError, TypeError):
+        return None
+
+
+def store(profile, name, data):
+    """Store an entry in the cache.
+
+    The file is replaced atomically, so that concurrent invocations never read
+    a partially written entry. Failure to write to the cache is not an error,
+    so that the CLI can be used where the cache directory is not writable.
+    """
+    if default_ttl() <= 0:
+        return
+    path = _entry_path(profile, name)
+    temporary_path = "{}.{}.{}".format(
+        path, os.getpid(), threading.get_ident()
+    )
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        fd = os.open(
+            temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600
+        )
+        with os.fdopen(fd, "w") as fp:
+            json.dump({"created_at": time.time(), "data": data}, fp)
+        os.replace(temporary_path, path)
+    except OSError:
+        pass
+
+
+@contextlib.contextmanager
+def lock(profile, name):
+    """Hold an exclusive lock on a cache entry, across processes.
+
+    If the lock file cannot be created, no lock is taken.
+    """
+    path = _entry_path(profile, name) + ".lock"
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    except OSError:
+        fd = None
+    try:
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        if fd is not None:
+            os.close(fd)
+
+
+def invalidate(profile, name):
+    """Remove an entry from the cache."""
+    try:
+        os.remove(_entry_path(profile, name))
+    except OSError:
+        pass
+
+
+def clear():
+    """Remove all cached resources."""
+    shutil.rmtree(os.path.join(cache_directory(), "profiles"), True)
+    # Keys of servers are cached next to SSH control sockets, which are left
+    # for any connections still open
+    for path in glob.glob(os.path.join(cache_directory(), "ssh", "*.key")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+@click.group()
+def cache():
+    """Manage the local cache of Faculty resources."""
+    pass
+
+
+@cache.command(name="clear")
+def clear_cache():
+    """Remove all cached resources."""
+    clear()
@@ -0,0 +1,276 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Resumable transfer of large files to and from servers.
+
+Files are copied in fixed size chunks, each with its own SSH command over the
+multiplexed connection to the server, and each verified against a SHA-256
+hash computed on the other end. Data is written to a partial file next to
+the destination, which is renamed once all chunks are copied. Completed
+chunks are recorded in a journal in the local cache, so that an interrupted
+transfer resumes from the first missing chunk when run again. A journal is
+discarded if the source file has changed since it was written.
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+
+import click
+import faculty.config
+
+import faculty_cli.cache
+import faculty_cli.shell
+import faculty_cli.ssh
+import faculty_cli.util
+
+
+# Chunks are copied with dd in blocks of this size
+BLOCK_SIZE = 1024 * 1024
+CHUNK_BLOCKS = 64
+
+# Attempts to copy a chunk before giving up, if its hash does not match
+CHUNK_ATTEMPTS = 3
+
+PART_SUFFIX = ".faculty-part"
+
+
+def _chunk_size():
+    return BLOCK_SIZE * CHUNK_BLOCKS
+
+
+def _chunk_count(size):
+    return math.ceil(size / _chunk_size())
+
+
+def _read_chunk_command(path, index):
+    """Build a shell command printing a chunk of a file."""
+    return "dd if={} bs={} skip={} count={} 2>/dev/null".format(
+        faculty_cli.shell.quote(path),
+        BLOCK_SIZE,
+        index * CHUNK_BLOCKS,
+        CHUNK_BLOCKS,
+    )
+
+
+def _journal_name(direction, connection, remote, local):
+    key = json.dumps(
+        [direction, str(connection.server_id), remote, os.path.abspath(local)]
+    )
+    return "transfers/{}".format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def _load_journal(name, source):
+    """Load a journal of a transfer, or None if it is missing or outdated."""
+    journal = faculty_cli.cache.load(
+        faculty.config.resolve_profile(), name, math.inf
+    )
+    if (
+        journal is None
+        or journal.get("source") != source
+        or journal.get("chunk_size") != _chunk_size()
+    ):
+        return None
+    return journal
+
+
+def _store_journal(name, journal):
+    faculty_cli.cache.store(faculty.config.resolve_profile(), name, journal)
+
+
+def _interrupted(path):
+    faculty_cli.util.print_and_exit(
+        "Copying {} was interrupted. Run the same command again to resume "
+        "it.".format(path),
+        75,
+    )
+
+
+def _remote_hash(connection, path, index):
+    output = faculty_cli.ssh.remote_output(
+        connection, _read_chunk_command(path, index) + " | sha256sum"
+    )
+    return output.split()[0].decode("ascii")
+
+
+def _copy_chunks(path, journal_name, journal, size, copy_chunk, remote_hash):
+    """Copy the chunks of a file missing from its journal.
+
+    Each chunk is copied by copy_chunk, which returns the hash of the data
+    it copied, and checked against the hash of the copy from remote_hash.
+    """
+    count = _chunk_count(size)
+    if journal["chunks"]:
+        click.echo(
+            "Resuming {} with {} of {} chunks copied.".format(
+                path, len(journal["chunks"]), count
+            ),
+            err=True,
+        )
+    for index in range(count):
+        if str(index) in journal["chunks"]:
+            continue
+        for _ in range(CHUNK_ATTEMPTS):
+            digest = copy_chunk(index)
+            if digest == remote_hash(index):
+                break
+        else:
+            faculty_cli.util.print_and_exit(
+                "Chunk {} of {} did not match its hash after {} "
+                "attempts.".format(index + 1, path, CHUNK_ATTEMPTS),
+                70,
+            )
+        journal["chunks"][str(index)] = digest
+        _store_journal(journal_name, journal)
+
+
+def remote_is_directory(connection, path):
+    """Check if a path on a server is a directory."""
+    output = faculty_cli.ssh.remote_output(
+        connection,
+        "[ -d {} ] && echo directory; true".format(
+            faculty_cli.shell.quote(path)
+        ),
+    )
+    return output.strip() == b"directory"
+
+
+def download(connection, remote, local):
+    """Copy a file from a server in chunks, resuming an earlier attempt."""
+    quoted_remote = faculty_cli.shell.quote(remote)
+    output = faculty_cli.ssh.remote_output(
+        connection, "stat -c '%s %Y' {}".format(quoted_remote)
+    )
+    size, mtime = (int(value) for value in output.split())
+    source = {"size": size, "mtime": mtime}
+
+    part = local + PART_SUFFIX
+    journal_name = _journal_name("get", connection, remote, local)
+    journal = _load_journal(journal_name, source)
+    if journal is None or not os.path.exists(part):
+        journal = {"source": source, "chunk_size": _chunk_size(), "chunks": {}}
+        open(part, "wb").close()
+
+    def copy_chunk(index):
+        digest = hashlib.sha256()
+        with open(part, "r+b") as fp:
+            fp.seek(index * _chunk_size())
+
+            def write(data):
+                fp.write(data)
+                digest.update(data)
+
+            exit_code = faculty_cli.ssh.run_ssh_cmd(
+                faculty_cli.ssh.ssh_command(
+                    connection, _read_chunk_command(remote, index)
+                ),
+                connection,
+                stdout_callback=write,
+            )
+        if exit_code != 0:
+            _interrupted(remote)
+        return digest.hexdigest()
+
+    _copy_chunks(
+        remote,
+        journal_name,
+        journal,
+        size,
+        copy_chunk,
+        lambda index: _remote_hash(connection, remote, index),
+    )
+    with open(part, "r+b") as fp:
+        fp.truncate(size)
+    os.replace(part, local)
+    faculty_cli.cache.invalidate(
+        faculty.config.resolve_profile(), journal_name
+    )
+
+
+def _write_to_pipe(fd, data):
+    view = memoryview(data)
+    try:
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    except BrokenPipeError:
+        # The command reading the data failed, and reports it
+        pass
+    finally:
+        os.close(fd)
+
+
+def upload(connection, local, remote):
+    """Copy a file to a server in chunks, resuming an earlier attempt."""
+    status = os.stat(local)
+    source = {"size": status.st_size, "mtime": int(status.st_mtime)}
+
+    part = remote + PART_SUFFIX
+    quoted_part = faculty_cli.shell.quote(part)
+    journal_name = _journal_name("put", connection, remote, local)
+    journal = _load_journal(journal_name, source)
+    if journal is not None:
+        output = faculty_cli.ssh.remote_output(
+            connection, "[ -f {} ] && echo exists; true".format(quoted_part)
+        )
+        if output.strip() != b"exists":
+            journal = None
+    if journal is None:
+        journal = {"source": source, "chunk_size": _chunk_size(), "chunks": {}}
+        faculty_cli.ssh.remote_output(connection, ": > {}".format(quoted_part))
+
+    def copy_chunk(index):
+        with open(local, "rb") as fp:
+            fp.seek(index * _chunk_size())
+            data = fp.read(_chunk_size())
+        read_fd, write_fd = os.pipe()
+        writer = threading.Thread(
+            target=_write_to_pipe, args=(write_fd, data), daemon=True
+        )
+        writer.start()
+        try:
+            exit_code = faculty_cli.ssh.run_ssh_cmd(
+                faculty_cli.ssh.ssh_command(
+                    connection,
+                    "dd of={} bs={} seek={} conv=notrunc 2>/dev/null".format(
+                        quoted_part, BLOCK_SIZE, index * CHUNK_BLOCKS
+                    ),
+                ),
+                connection,
+                stdin=read_fd,
+            )
+        finally:
+            os.close(read_fd)
+            writer.join()
+        if exit_code != 0:
+            _interrupted(local)
+        return hashlib.sha256(data).hexdigest()
+
+    _copy_chunks(
+        local,
+        journal_name,
+        journal,
+        status.st_size,
+        copy_chunk,
+        lambda index: _remote_hash(connection, part, index),
+    )
+    faculty_cli.ssh.remote_output(
+        connection,
+        "mv -f {} {}".format(quoted_part, faculty_cli.shell.quote(remote)),
+    )
+    faculty_cli.cache.invalidate(
+        faculty.config.resolve_profile(), journal_name
+    )
@@ -0,0 +1,317 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A background process that runs CLI commands without start up costs.
+
+The daemon imports all command groups and keeps access tokens in memory once,
+then serves commands over a Unix domain socket.
+"""
+
+import json
+import os
+import signal
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import time
+
+import click
+
+import faculty_cli.cache
+import faculty_cli.util
+import faculty_cli.version
+
+
+DISABLE_DAEMON_ENV_VAR = "FACULTY_CLI_NO_DAEMON"
+
+# Commands that need a controlling terminal, or that manage the daemon itself
+IN_PROCESS_COMMANDS = {"daemon", "login", "shell"}
+
+# Options of the top level group that take a value
+_GLOBAL_OPTIONS_WITH_VALUES = {"--output"}
+
+_HEADER = struct.Struct("!I")
+_STANDARD_STREAMS = [0, 1, 2]
+
+
+def socket_path():
+    return os.path.join(faculty_cli.cache.cache_directory(), "daemon.sock")
+
+
+def _pid_path():
+    return os.path.join(faculty_cli.cache.cache_directory(), "daemon.pid")
+
+
+def _read_message(rfile):
+    line = rfile.readline()
+    if not line:
+        raise ConnectionError("connection to the daemon was closed")
+    return json.loads(line.decode("utf-8"))
+
+
+def _write_message(wfile, message):
+    wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+    wfile.flush()
+
+
+def _wait_for_exit_code(rfile, pid):
+    while True:
+        try:
+            return _read_message(rfile)["exit_code"]
+        except KeyboardInterrupt:
+            os.kill(pid, signal.SIGINT)
+
+
+def _build_request(argv):
+    return {
+        "argv": list(argv),
+        "cwd": os.getcwd(),
+        "env": dict(os.environ),
+        "version": faculty_cli.version.__version__,
+    }
+
+
+def _command_name(argv):
+    """Find the command in arguments, skipping any global options before it."""
+    args = iter(argv)
+    for arg in args:
+        if arg in _GLOBAL_OPTIONS_WITH_VALUES:
+            next(args, None)
+        elif not arg.startswith("-"):
+            return arg
+    return None
+
+
+def forward(argv):
+    """Run a command in the daemon, if it is running.
+
+    Returns the exit code of the command, or None if the daemon is not
+    available and the command should be run in this process instead.
+    """
+    if os.environ.get(DISABLE_DAEMON_ENV_VAR):
+        return None
+    if _command_name(argv) in IN_PROCESS_COMMANDS:
+        return None
+
+    request = json.dumps(_build_request(argv)).encode("utf-8")
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path())
+        socket.send_fds(
+            sock, [_HEADER.pack(len(request)) + request], _STANDARD_STREAMS
+        )
+        rfile = sock.makefile("rb")
+        response = _read_message(rfile)
+    except (OSError, ValueError):
+        sock.close()
+        return None
+
+    if "pid" not in response:
+        # The daemon rejected the command, e.g. because it runs another version
+        sock.close()
+        return None
+
+    # The command has started in the daemon, so it must not be run again here
+    try:
+        return _wait_for_exit_code(rfile, response["pid"])
+    except (OSError, ValueError):
+        click.echo("Lost connection to the Faculty CLI daemon.", err=True)
+        return 1
+    finally:
+        sock.close()
+
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+    """Run a single command in a process forked from the daemon.
+
+    The command runs with the working directory, environment and standard
+    streams of the invocation that sent it, so that it behaves as if it were
+    run directly. HTTP connections are not shared between commands, as sockets
+    cannot safely be used by several processes at once.
+    """
+
+    def _receive_request(self):
+        data, fds, _, _ = socket.recv_fds(
+            self.request, 65536, len(_STANDARD_STREAMS)
+        )
+        header_size = _HEADER.size
+        (length,) = _HEADER.unpack(data[:header_size])
+        data = data[header_size:]
+        while len(data) < length:
+            chunk = self.request.recv(length - len(data))
+            if not chunk:
+                raise ConnectionError("incomplete request")
+            data += chunk
+        return json.loads(data.decode("utf-8")), fds
+
+    def handle(self):
+        import faculty_cli.cli
+
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        request, fds = self._receive_request()
+
+        if request["version"] != faculty_cli.version.__version__:
+            _write_message(self.wfile, {"error": "version mismatch"})
+            return
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        for fd, standard_fd in zip(fds, _STANDARD_STREAMS):
+            os.dup2(fd, standard_fd)
+            os.close(fd)
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+
+        _write_message(self.wfile, {"pid": os.getpid()})
+        try:
+            exit_code = faculty_cli.cli.run(request["argv"])
+        except Exception as exc:  # pylint: disable=broad-except
+            click.echo("Error: {}".format(exc), err=True)
+            exit_code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        _write_message(self.wfile, {"exit_code": exit_code})
+
+
+class _Server(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    pass
+
+
+def _warm_up():
+    """Import all commands and load credentials before serving commands."""
+    import faculty.config
+    import faculty_cli.auth
+    import faculty_cli.cli
+
+    for name in faculty_cli.cli.LAZY_SUBCOMMANDS:
+        faculty_cli.cli.cli.get_command(None, name)
+    try:
+        profile = faculty.config.resolve_profile()
+        faculty_cli.auth._ACCESS_TOKEN_CACHE.get(profile)
+    except Exception:  # pylint: disable=broad-except
+        # Commands will report any problem with credentials themselves
+        pass
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def serve():
+    """Serve commands on the daemon socket until terminated."""
+    _warm_up()
+
+    path = socket_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _remove(path)
+    previous_umask = os.umask(0o177)
+    try:
+        server = _Server(path, _CommandHandler)
+    finally:
+        os.umask(previous_umask)
+
+    with open(_pid_path(), "w") as fp:
+        fp.write(str(os.getpid()))
+
+    def terminate(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, terminate)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        _remove(path)
+        _remove(_pid_path())
+
+
+def _running_pid():
+    try:
+        with open(_pid_path()) as fp:
+            pid = int(fp.read().strip())
+        os.kill(pid, 0)
+    except (OSError, ValueError):
+        return None
+    return pid
+
+
+@click.group()
+def daemon():
+    """Manage the background command daemon."""
+    pass
+
+
+@daemon.command()
+@click.option(
+    "--foreground",
+    is_flag=True,
+    help="Run the daemon in this process rather than in the background.",
+)
+def start(foreground):
+    """Start the daemon.
+
+    While the daemon is running, other commands are sent to it instead of
+    being run in a new process. Set FACULTY_CLI_NO_DAEMON to bypass it.
+    """
+    if _running_pid() is not None:
+        faculty_cli.util.print_and_exit("The daemon is already running.", 1)
+    if foreground:
+        serve()
+        return
+
+    subprocess.Popen(
+        [sys.executable, "-m", "faculty_cli.daemon"],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        if os.path.exists(socket_path()) and _running_pid() is not None:
+            click.echo("Started the daemon.")
+            return
+        time.sleep(0.05)
+    faculty_cli.util.print_and_exit("The daemon failed to start.", 1)
+
+
+@daemon.command()
+def stop():
+    """Stop the daemon."""
+    pid = _running_pid()
+    if pid is None:
+        faculty_cli.util.print_and_exit("The daemon is not running.", 1)
+    os.kill(pid, signal.SIGTERM)
+    click.echo("Stopped the daemon.")
+
+
+@daemon.command()
+def status():
+    """Print whether the daemon is running."""
+    pid = _running_pid()
+    if pid is None:
+        faculty_cli.util.print_and_exit("The daemon is not running.", 1)
+    click.echo("The daemon is running with PID {}.".format(pid))
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,167 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Commands for manipulating files in Faculty datasets."""
+
+import click
+import faculty.datasets
+
+import faculty_cli.auth
+import faculty_cli.resolve
+import faculty_cli.table
+import faculty_cli.util
+
+
+@click.group()
+def datasets():
+    """Manipulate files in Faculty datasets."""
+    pass
+
+
+@datasets.command(name="get")
+@click.argument("project")
+@click.argument("project_path")
+@click.argument("local_path")
+def dataset_get(project, project_path, local_path):
+    """Copy from a project's datasets to the local filesystem."""
+    project_id = faculty_cli.resolve.resolve_project(project)
+    try:
+        faculty.datasets.get(
+            project_path,
+            local_path,
+            project_id=project_id,
+            object_client=faculty_cli.auth.client("object"),
+        )
+    except faculty.datasets.util.DatasetsError as err:
+        faculty_cli.util.print_and_exit(
+            str(err).replace(str(project_id), project), 64
+        )
+    except OSError as err:
+        faculty_cli.util.print_and_exit(err, 64)
+
+
+@datasets.command(name="put")
+@click.argument("project")
+@click.argument("local_path")
+@click.argument("project_path")
+def dataset_put(project, local_path, project_path):
+    """Copy from the local filesystem to a project's datasets."""
+    project_id = faculty_cli.resolve.resolve_project(project)
+    try:
+        faculty.datasets.put(
+            local_path,
+            project_path,
+            project_id=project_id,
+            object_client=faculty_cli.auth.client("object"),
+        )
+    except (faculty.clients.object.PathAlreadyExists, OSError) as err:
+        faculty_cli.util.print_and_exit(err, 64)
+
+
+@datasets.command()
+@click.argument("project")
+@click.argument("source_path")
+@click.argument("destination_path")
+def mv(project, source_path, destination_path):
+    """Move a file within a project's datasets."""
+    project_id = faculty_cli.resolve.resolve_project(project)
+    try:
+        faculty.datasets.mv(
+            source_path,
+            destination_path,
+            project_id=project_id,
+            object_client=faculty_cli.auth.client("object"),
+        )
+    except faculty.clients.object.PathNotFound as err:
+        faculty_cli.util.print_and_exit(err, 64)
+
+
+@datasets.command()
+@click.argument("project")
+@click.argument("source_path")
+@click.argument("destination_path")
+@click.option(
+    "--recursive",
+    is_flag=True,
+    help="Copy directories like a recursive copy in a filesystem",
+)
+def cp(project, source_path, destination_path, recursive):
+    """Copy a file within a project's datasets."""
+    project_id = faculty_cli.resolve.resolve_project(project)
+    try:
+        faculty.datasets.cp(
+            source_path,
+            destination_path,
+            project_id=project_id,
+            recursive=recursive,
+            object_client=faculty_cli.auth.client("object"),
+        )
+    except (
+        faculty.clients.object.PathNotFound,
+        faculty.clients.object.SourceIsADirectory,
+    ) as err:
+        faculty_cli.util.print_and_exit(err, 64)
+
+
+@datasets.command()
+@click.argument("project")
+@click.argument("project_path")
+@click.option(
+    "--recursive",
+    is_flag=True,
+    help="Deleting directories like a recursive delete in a filesystem",
+)
+def rm(project, project_path, recursive):
+    """Remove a file from the project's datasets."""
+    project_id = faculty_cli.resolve.resolve_project(project)
+    try:
+        faculty.datasets.rm(
+            project_path,
+            project_id=project_id,
+            recursive=recursive,
+            object_client=faculty_cli.auth.client("object"),
+        )
+    except (
+        faculty.clients.object.PathNotFound,
+        faculty.clients.object.TargetIsADirectory,
+    ) as err:
+        faculty_cli.util.print_and_exit(err, 64)
+
+
+@datasets.command(name="ls")
+@click.argument("project")
+@click.option(
+    "--prefix",
+    default="/",
+    help="List only files in the datasets matching this prefix.",
+)
+@click.option(
+    "--show-hidden", is_flag=True, help="Include hidden files in the output."
+)
+def dataset_ls(project, prefix, show_hidden):
+    """List contents of project datasets."""
+    project_id = faculty_cli.resolve.resolve_project(project)
+    items = faculty.datasets.ls(
+        prefix,
+        project_id=project_id,
+        show_hidden=show_hidden,
+        object_client=faculty_cli.auth.client("object"),
+    )
+    if faculty_cli.table.machine_readable():
+        faculty_cli.table.echo_records(
+            ((project_id, item) for item in items), ("project_id", "path")
+        )
+    else:
+        for item in items:
+            click.echo(item)
@@ -0,0 +1,195 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Commands for manipulating Faculty server environments."""
+
+import click
+from faculty.clients.serveragent import ServerAgentClient
+
+import faculty_cli.auth
+import faculty_cli.resolve
+import faculty_cli.table
+import faculty_cli.util
+
+
+@click.group()
+def environment():
+    """Manipulate Faculty server environments."""
+    faculty_cli.auth.check_credentials()
+
+
+@environment.command(name="list")
+@click.argument("project")
+@click.option(
+    "-v",
+    "--verbose",
+    is_flag=True,
+    help="Print extra information about environments.",
+)
+def list_environments(project, verbose):
+    """List your environments."""
+    project_id = faculty_cli.resolve.resolve_project(project)
+    environments = faculty_cli.resolve.list_environments(project_id)
+    if faculty_cli.table.machine_readable():
+        faculty_cli.table.echo_records(
+            (
+                (e.id, e.project_id, e.name, e.description)
+                for e in environments
+            ),
+            ("id", "project_id", "name", "description"),
+        )
+    elif verbose:
+        if not environments:
+            click.echo("No environments.")
+        else:
+            faculty_cli.table.echo_table(
+                ((e.name, e.id) for e in environments),
+                ("Environment Name", "ID"),
+                (None, faculty_cli.table.UUID_WIDTH),
+            )
+    else:
+        for environment in environments:
+            click.echo(environment.name)
+
+
+@environment.command()
+@click.argument("project")
+@click.argument("server")
+@click.argument("environment")
+def apply(project, server, environment):
+    """Apply an environment to the server."""
+
+    def resolve():
+        project_id, server_id = faculty_cli.resolve.resolve_server(
+            project, server
+        )
+        environment_id = faculty_cli.resolve.resolve_environment(
+            project_id, environment
+        )
+        return server_id, environment_id
+
+    client = faculty_cli.auth.client("server")
+    faculty_cli.resolve.with_resolved(
+        resolve, lambda ids: client.apply_environment(*ids)
+    )
+
+    click.echo(
+        "Applying environment {} to server {} for project {}".format(
+            environment, server, project
+        )
+    )
+
+
+def _format_command(command):
+    formatted_parts = []
+    for part in command:
+        if len(part.split()) > 1:
+            formatted_parts.append(repr(part))
+        else:
+            formatted_parts.append(part)
+    return " ".join(formatted_parts)
+
+
+def _get_service(server, name):
+    for service in server.services:
+        if service.name == name:
+            return service
+    raise RuntimeError("cube has no service called {}".format(name))
+
+
+def _get_hound_url(server):
+    service = _get_service(server, "hound")
+    return "{}://{}:{}".format(service.scheme, service.host, service.port)
+
+
+@environment.command()
+@click.argument("project")
+@click.argument("server")
+def status(project, server):
+    """Get the execution status for an environment."""
+    server_client = faculty_cli.auth.client("server")
+    server = faculty_cli.resolve.with_resolved(
+        lambda: faculty_cli.resolve.resolve_server(project, server),
+        lambda ids: server_client.get(*ids),
+    )
+
+    hound_url = _get_hound_url(server)
+    session = faculty_cli.auth.session()
+
+    client = ServerAgentClient(hound_url, session)
+    execution = client.latest_environment_execution()
+
+    if execution is None:
+        msg = "No environment has yet been applied to this server."
+        faculty_cli.util.print_and_exit(msg, 64)
+
+    click.echo("Latest environment execution:")
+    click.echo("  Status: {}".format(execution.status.value))
+    for i, environment in enumerate(execution.environments):
+        click.echo("")
+        click.echo("Environment {}".format(i))
+        for j, step in enumerate(environment.steps):
+            click.echo("")
+            click.echo("Step {}:".format(j))
+            click.echo("  Status:  {}".format(step.status.value))
+            click.echo("  Command: {}".format(_format_command(step.command)))
+
+
+@environment.command()
+@click.argument("project")
+@click.argument("server")
+@click.option(
+    "--step",
+    "-s",
+    "step_number",
+    type=int,
+    help="Display only the logs for this step",
+)
+def logs(project, server, step_number):
+    """Stream the logs for a server environment application."""
+    server_client = faculty_cli.auth.client("server")
+    server = faculty_cli.resolve.with_resolved(
+        lambda: faculty_cli.resolve.resolve_server(project, server),
+        lambda ids: server_client.get(*ids),
+    )
+
+    hound_url = _get_hound_url(server)
+    session = faculty_cli.auth.session()
+
+    client = ServerAgentClient(hound_url, session)
+    execution = client.latest_environment_execution()
+
+    if execution is None:
+        msg = "No environment has yet been applied to this server."
+        faculty_cli.util.print_and_exit(msg, 64)
+
+    steps = [
+        step
+        for environment_execution in execution.environments
+        for step in environment_execution.steps
+    ]
+
+    if step_number is not None:
+        try:
+            steps = [steps[step_number]]
+        except IndexError:
+            faculty_cli.util.print_and_exit(
+                "step {} out of range".format(step_number), 64
+            )
+
+    for step in steps:
+        for line in client.stream_environment_execution_step_logs(
+            execution.id, step.id
+        ):
+            click.echo(line.content)
@@ -0,0 +1,774 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Commands for manipulating files in a Faculty project."""
+
+import collections
+import concurrent.futures
+import functools
+import glob
+import os
+import os.path
+import posixpath
+import re
+import sys
+import tempfile
+import time
+
+import click
+import faculty
+import faculty.clients.base
+
+import faculty_cli.auth
+import faculty_cli.chunked
+import faculty_cli.resolve
+import faculty_cli.shell
+import faculty_cli.ssh
+import faculty_cli.stream
+import faculty_cli.table
+import faculty_cli.util
+
+
+SUMMARY_FIELDS = ("files", "bytes", "elapsed_seconds", "megabytes_per_second")
+
+# Only the end of rsync's output, where --stats are printed, is kept
+RSYNC_OUTPUT_TAIL_LENGTH = 65536
+
+# When sharding a tree between rsync workers, each file weighs as much as this
+# many bytes, as rsync has a cost per file as well as per byte
+RSYNC_FILE_WEIGHT = 65536
+
+RSYNC_FILES_PATTERN = re.compile(
+    rb"Number of (?:regular )?files transferred: ([\d,.]+)"
+)
+RSYNC_BYTES_PATTERN = re.compile(
+    rb"Total transferred file size: ([\d,.]+) bytes"
+)
+
+
+@click.group()
+def file():
+    """Manipulate files in a Faculty project."""
+    faculty_cli.auth.check_credentials()
+
+
+def _local_size(paths):
+    """Count the files and bytes at local paths that exist."""
+    files = 0
+    size = 0
+    for path in paths:
+        if os.path.isdir(path):
+            filenames = (
+                os.path.join(directory, filename)
+                for directory, _, names in os.walk(path)
+                for filename in names
+            )
+        else:
+            filenames = [path]
+        for filename in filenames:
+            try:
+                size += os.path.getsize(filename)
+            except OSError:
+                continue
+            files += 1
+    return files, size
+
+
+def _expand_local(patterns):
+    """Expand glob patterns in local paths, as a shell would.
+
+    Paths that exist are used as they are, even if they look like patterns,
+    such as data[1].csv.
+    """
+    paths = []
+    for pattern in patterns:
+        pattern = os.path.expanduser(pattern)
+        if os.path.exists(pattern) or not faculty_cli.shell.has_glob(pattern):
+            paths.append(pattern)
+            continue
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            faculty_cli.util.print_and_exit(
+                "{}: No such file or directory".format(pattern), 66
+            )
+        paths += matches
+    return paths
+
+
+def _remote_path(connection, path):
+    return "{}@{}:{}".format(connection.username, connection.hostname, path)
+
+
+def _expand_remote(connection, patterns):
+    """Expand glob patterns in paths on the server, over its connection."""
+    output = faculty_cli.ssh.remote_output(
+        connection,
+        "printf '%s\\0' "
+        + " ".join(
+            faculty_cli.shell.quote_pattern(pattern) for pattern in patterns
+        ),
+    )
+    return [path for path in output.decode("utf-8").split("\0") if path]
+
+
+def _check_transfer_options(parallel, stream, resume=False, rsync_opts=()):
+    """Exit if options choosing how to transfer files conflict."""
+    modes = [
+        name
+        for name, selected in [
+            ("--parallel", parallel > 1),
+            ("--stream", stream),
+            ("--resume", resume),
+        ]
+        if selected
+    ]
+    if len(modes) > 1:
+        faculty_cli.util.print_and_exit(
+            "{} cannot be used together".format(" and ".join(modes)), 64
+        )
+    if stream and rsync_opts:
+        faculty_cli.util.print_and_exit(
+            "rsync options cannot be used with --stream", 64
+        )
+
+
+def _exit_if_stream_failed(exit_code):
+    if exit_code != 0:
+        faculty_cli.util.print_and_exit("Streaming files failed.", exit_code)
+
+
+def _resumable_destinations(sources, destination, is_directory, pathmodule):
+    """Pair files with the paths to copy them to, as scp would."""
+    if len(sources) > 1 or is_directory(destination):
+        return [
+            (source, pathmodule.join(destination, posixpath.basename(source)))
+            for source in sources
+        ]
+    return [(sources[0], destination)]
+
+
+def _shards(items, count, weight):
+    """Split items into at most count groups of similar total weight."""
+    shards = [[] for _ in range(min(count, len(items)))]
+    totals = [0] * len(shards)
+    for item in sorted(items, key=weight, reverse=True):
+        lightest = totals.index(min(totals))
+        shards[lightest].append(item)
+        totals[lightest] += weight(item)
+    return shards
+
+
+def _scp(connection, sources, destination, parallel, weight=None):
+    """Copy files with scp, spread over parallel streams.
+
+    All streams share the multiplexed SSH connection to the server, so only
+    the first needs to authenticate. Returns the first non-zero exit code of
+    the streams, or zero if they all succeeded.
+    """
+
+    def copy(shard):
+        cmd = (
+            ["scp"]
+            + connection.options
+            + ["-P", str(connection.port)]
+            + shard
+            + [destination]
+        )
+        return faculty_cli.ssh.run_ssh_cmd(cmd, connection)
+
+    if parallel <= 1 or len(sources) <= 1:
+        return copy(list(sources))
+
+    shards = _shards(sources, parallel, weight or (lambda source: 1))
+    with concurrent.futures.ThreadPoolExecutor(len(shards)) as executor:
+        exit_codes = list(executor.map(copy, shards))
+    return next((code for code in exit_codes if code != 0), 0)
+
+
+def _parse_count(pattern, output):
+    match = pattern.search(output)
+    if match is None:
+        return None
+    return int(re.sub(rb"[,.]", b"", match.group(1)))
+
+
+def _echo_summary(files, size, elapsed):
+    """Print statistics of a transfer, as text or as a record."""
+    rate = None
+    if size is not None and elapsed > 0:
+        rate = size / elapsed / 1e6
+    if faculty_cli.table.machine_readable():
+        faculty_cli.table.echo_records(
+            [(files, size, round(elapsed, 3), rate)], SUMMARY_FIELDS
+        )
+        return
+    parts = []
+    if files is not None:
+        parts.append("{} file{}".format(files, "" if files == 1 else "s"))
+    if size is not None:
+        parts.append("{:.1f} MB".format(size / 1e6))
+    message = "Transferred {} in {:.1f}s".format(
+        ", ".join(parts) or "files", elapsed
+    )
+    if rate is not None:
+        message += " ({:.2f} MB/s)".format(rate)
+    click.echo(message, err=True)
+
+
+@file.command()
+@click.argument("project")
+@click.argument("local", nargs=-1, required=True)
+@click.argument("remote")
+@click.option("--server", is_flag=False, help="Name or ID of server to use.")
+@click.option(
+    "--parallel",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of concurrent streams to spread files across.",
+)
+@click.option(
+    "--summary",
+    is_flag=True,
+    help="Print the number of files and bytes transferred, and the rate.",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Send files as one compressed tar stream, for many small files.",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Copy large files in verified chunks, resuming if interrupted.",
+)
+def put(project, local, remote, server, parallel, summary, stream, resume):
+    """Copy local files to Faculty workspace.
+
+    Several LOCAL paths and glob patterns may be given, in which case REMOTE
+    must be a directory. They are all copied over a single SSH connection.
+    With --stream, REMOTE is always a directory, created if needed. With
+    --resume, an interrupted copy continues where it stopped when the same
+    command is run again.
+    """
+    _check_transfer_options(parallel, stream, resume)
+    sources = _expand_local(local)
+    if resume:
+        for source in sources:
+            if os.path.isdir(source):
+                faculty_cli.util.print_and_exit(
+                    "{} is a directory, and --resume only copies "
+                    "files".format(source),
+                    64,
+                )
+    escaped_remote = faculty_cli.shell.quote(remote)
+
+    with faculty_cli.ssh.connection(project, server) as connection:
+        started_at = time.monotonic()
+        if stream:
+            exit_code = faculty_cli.stream.upload(
+                connection, faculty_cli.stream.local_members(sources), remote
+            )
+            _exit_if_stream_failed(exit_code)
+        elif resume:
+            for source, destination in _resumable_destinations(
+                sources,
+                remote,
+                functools.partial(
+                    faculty_cli.chunked.remote_is_directory, connection
+                ),
+                posixpath,
+            ):
+                faculty_cli.chunked.upload(connection, source, destination)
+            exit_code = 0
+        else:
+            exit_code = _scp(
+                connection,
+                sources,
+                _remote_path(connection, escaped_remote),
+                parallel,
+                weight=lambda source: _local_size([source])[1],
+            )
+        elapsed = time.monotonic() - started_at
+
+    if exit_code != 0:
+        # scp reports its own errors
+        sys.exit(exit_code)
+    if summary:
+        _echo_summary(*_local_size(sources), elapsed)
+
+
+def _received_paths(sources, local):
+    """Find local paths files copied from the server were written to."""
+    if not os.path.isdir(local):
+        return [local]
+    paths = set()
+    for source in sources:
+        path = os.path.join(local, os.path.basename(source.rstrip("/")))
+        if faculty_cli.shell.has_glob(path):
+            paths.update(glob.glob(path))
+        else:
+            paths.add(path)
+    return sorted(paths)
+
+
+@file.command()
+@click.argument("project")
+@click.argument("remote", nargs=-1, required=True)
+@click.argument("local")
+@click.option("--server", is_flag=False, help="Name or ID of server to use.")
+@click.option(
+    "--parallel",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of concurrent streams to spread files across.",
+)
+@click.option(
+    "--summary",
+    is_flag=True,
+    help="Print the number of files and bytes transferred, and the rate.",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Send files as one compressed tar stream, for many small files.",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Copy large files in verified chunks, resuming if interrupted.",
+)
+def get(project, remote, local, server, parallel, summary, stream, resume):
+    """Copy files from Faculty workspace to the local machine.
+
+    Several REMOTE paths and glob patterns may be given, in which case LOCAL
+    must be a directory. They are all copied over a single SSH connection.
+    With --stream, LOCAL is always a directory, created if needed. With
+    --resume, an interrupted copy continues where it stopped when the same
+    command is run again.
+    """
+    _check_transfer_options(parallel, stream, resume)
+    local = os.path.expanduser(local)
+
+    with faculty_cli.ssh.connection(project, server) as connection:
+        started_at = time.monotonic()
+        if (parallel > 1 or stream or resume) and any(
+            map(faculty_cli.shell.has_glob, remote)
+        ):
+            # Patterns are expanded first, to spread the files they match or
+            # to copy them one by one
+            remote = _expand_remote(connection, remote)
+            escaped_remote = map(faculty_cli.shell.quote, remote)
+        else:
+            escaped_remote = map(faculty_cli.shell.quote_pattern, remote)
+        if stream:
+            exit_code = faculty_cli.stream.download(
+                connection, faculty_cli.stream.remote_members(remote), local
+            )
+            _exit_if_stream_failed(exit_code)
+        elif resume:
+            for source, destination in _resumable_destinations(
+                remote, local, os.path.isdir, os.path
+            ):
+                faculty_cli.chunked.download(connection, source, destination)
+            exit_code = 0
+        else:
+            exit_code = _scp(
+                connection,
+                [_remote_path(connection, path) for path in escaped_remote],
+                local,
+                parallel,
+            )
+        elapsed = time.monotonic() - started_at
+
+    if exit_code != 0:
+        # scp reports its own errors
+        sys.exit(exit_code)
+    if summary:
+        # scp only reports progress on a terminal, so count what arrived
+        _echo_summary(*_local_size(_received_paths(remote, local)), elapsed)
+
+
+def _rsync_source(path, pathmodule):
+    """Split an rsync source into the directory whose entries are copied,
+    and the path relative to it under which they are placed.
+    """
+    name = pathmodule.basename(path)
+    if name in ("", "."):
+        return path, ""
+    return pathmodule.dirname(path) or ".", name
+
+
+def _local_entries(base, prefix):
+    """Weigh the top level entries of a local directory for sharding."""
+    directory = os.path.join(base, prefix)
+    if not os.path.isdir(directory):
+        return {}
+    entries = {}
+    for entry in os.scandir(directory):
+        files, size = _local_size([entry.path])
+        entries[os.path.join(prefix, entry.name)] = (
+            size + max(files, 1) * RSYNC_FILE_WEIGHT
+        )
+    return entries
+
+
+def _remote_entries(connection, base, prefix):
+    """Weigh the top level entries of a directory on the server."""
+    output = faculty_cli.ssh.remote_output(
+        connection,
+        # A missing directory leaves nothing to shard, and rsync reports it
+        "find {} -mindepth 1 -printf '%s %P\\0' 2>/dev/null; true".format(
+            faculty_cli.shell.quote(posixpath.join(base, prefix))
+        ),
+    )
+    entries = collections.Counter()
+    for record in output.decode("utf-8").split("\0"):
+        if record:
+            size, _, path = record.partition(" ")
+            entry = posixpath.join(prefix, path.split("/", 1)[0])
+            entries[entry] += int(size) + RSYNC_FILE_WEIGHT
+    return entries
+
+
+def _run_rsync(rsync_cmd, connection, summary):
+    """Run rsync, returning its exit code and the files and bytes it sent.
+
+    With summary, rsync is asked for --stats, which are read from its output.
+    """
+    if not summary:
+        return faculty_cli.ssh.run_ssh_cmd(rsync_cmd, connection), None, None
+
+    output = bytearray()
+
+    def collect(chunk):
+        # Keep machine readable output free of rsync's own output
+        click.echo(chunk, nl=False, err=faculty_cli.table.machine_readable())
+        output.extend(chunk)
+        del output[:-RSYNC_OUTPUT_TAIL_LENGTH]
+
+    exit_code = faculty_cli.ssh.run_ssh_cmd(
+        rsync_cmd + ["--stats"], connection, stdout_callback=collect
+    )
+    return (
+        exit_code,
+        _parse_count(RSYNC_FILES_PATTERN, output),
+        _parse_count(RSYNC_BYTES_PATTERN, output),
+    )
+
+
+def _run_rsync_shards(
+    ssh_cmd, source, path_to, rsync_opts, shards, connection, summary
+):
+    """Run an rsync worker for each shard of entries of a source directory.
+
+    Each worker is given its entries with --files-from, relative to the
+    source. Returns the exit codes of the workers, and the files and bytes
+    they sent in total.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        worker_cmds = []
+        for i, shard in enumerate(shards):
+            files_from = os.path.join(directory, "shard-{}".format(i))
+            with open(files_from, "wb") as fp:
+                fp.write(b"\0".join(path.encode("utf-8") for path in shard))
+            worker_cmds.append(
+                [
+                    "rsync",
+                    "-a",
+                    "-r",
+                    "--from0",
+                    "--files-from={}".format(files_from),
+                    "-e",
+                    ssh_cmd,
+                    source,
+                    path_to,
+                ]
+                + list(rsync_opts)
+            )
+
+        results = []
+        with concurrent.futures.ThreadPoolExecutor(len(shards)) as executor:
+            futures = [
+                executor.submit(_run_rsync, cmd, connection, summary)
+                for cmd in worker_cmds
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                results.append(future.result())
+                click.echo(
+                    "Finished {} of {} rsync workers.".format(
+                        len(results), len(futures)
+                    ),
+                    err=True,
+                )
+
+    exit_codes, files, sizes = zip(*results)
+    return (
+        exit_codes,
+        None if None in files else sum(files),
+        None if None in sizes else sum(sizes),
+    )
+
+
+def _stream_sync(project, local, remote, server, up, summary):
+    """Copy a tree from or to server as a tar stream, placing it as rsync."""
+    with faculty_cli.ssh.connection(project, server) as connection:
+        started_at = time.monotonic()
+        if up:
+            base, prefix = _rsync_source(local, os.path)
+            exit_code = faculty_cli.stream.upload(
+                connection, [(base, prefix or ".")], remote
+            )
+        else:
+            base, prefix = _rsync_source(remote, posixpath)
+            exit_code = faculty_cli.stream.download(
+                connection, [(base, prefix or ".")], local
+            )
+        elapsed = time.monotonic() - started_at
+
+    _exit_if_stream_failed(exit_code)
+    if summary:
+        if up:
+            paths = [local]
+        else:
+            paths = [os.path.join(local, prefix)]
+        _echo_summary(*_local_size(paths), elapsed)
+
+
+def _rsync(
+    project,
+    local,
+    remote,
+    server,
+    rsync_opts,
+    up,
+    summary=False,
+    parallel=1,
+    stream=False,
+):
+    """Sync files from or to server.
+
+    With parallel, the top level entries of the source directory are split
+    into shards of similar size, which are synced by concurrent rsync
+    workers sharing the multiplexed SSH connection to the server. With
+    stream, the source is copied whole as a tar stream instead.
+    """
+    _check_transfer_options(parallel, stream, rsync_opts=rsync_opts)
+    if stream:
+        _stream_sync(project, local, remote, server, up, summary)
+        return
+
+    escaped_remote = faculty_cli.shell.quote(remote)
+
+    with faculty_cli.ssh.connection(project, server) as connection:
+        if up:
+            path_from = local
+            path_to = _remote_path(connection, escaped_remote)
+        else:
+            path_from = _remote_path(connection, escaped_remote)
+            path_to = local
+
+        ssh_cmd = " ".join(
+            ["ssh"]
+            + [
+                faculty_cli.shell.quote(option)
+                for option in connection.options
+            ]
+            + ["-p", str(connection.port)]
+        )
+
+        rsync_cmd = ["rsync", "-a", "-e", ssh_cmd, path_from, path_to]
+        rsync_cmd += list(rsync_opts)
+
+        shards = []
+        if parallel > 1:
+            if up:
+                base, prefix = _rsync_source(local, os.path)
+                entries = _local_entries(base, prefix)
+                source = os.path.join(base, "")
+            else:
+                base, prefix = _rsync_source(remote, posixpath)
+                entries = _remote_entries(connection, base, prefix)
+                source = _remote_path(
+                    connection,
+                    faculty_cli.shell.quote(posixpath.join(base, "")),
+                )
+            shards = _shards(list(entries), parallel, entries.get)
+
+        started_at = time.monotonic()
+        if len(shards) > 1:
+            exit_codes, files, size = _run_rsync_shards(
+                ssh_cmd,
+                source,
+                path_to,
+                rsync_opts,
+                shards,
+                connection,
+                summary,
+            )
+        else:
+            exit_code, files, size = _run_rsync(rsync_cmd, connection, summary)
+            exit_codes = [exit_code]
+        elapsed = time.monotonic() - started_at
+
+    failed = [code for code in exit_codes if code != 0]
+    if summary and not failed:
+        _echo_summary(files, size, elapsed)
+    if len(shards) > 1 and failed:
+        faculty_cli.util.print_and_exit(
+            "{} of {} rsync workers failed.".format(len(failed), len(shards)),
+            failed[0],
+        )
+    elif failed:
+        faculty_cli.util.print_and_exit("Syncing files failed.", failed[0])
+
+
+@file.command(
+    name="sync-up", context_settings={"ignore_unknown_options": True}
+)
+@click.argument("project")
+@click.argument("local")
+@click.argument("remote")
+@click.argument("rsync_opts", nargs=-1, type=click.UNPROCESSED)
+@click.option("--server", is_flag=False, help="Name or ID of server to use.")
+@click.option(
+    "--summary",
+    is_flag=True,
+    help="Print the number of files and bytes transferred, and the rate.",
+)
+@click.option(
+    "--parallel",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of concurrent rsync workers to split the tree between.",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Send files as one compressed tar stream, for many small files.",
+)
+def sync_up(
+    project, local, remote, server, rsync_opts, summary, parallel, stream
+):
+    """Sync local files up to a project with rsync.
+
+    Arguments are used as "rsync -a LOCAL server:REMOTE [RSYNC_OPTS]".
+
+    With --parallel, the entries at the top of the source directory are
+    split between rsync workers by size. Each worker syncs only its entries,
+    so options such as --delete do not remove entries at the top of the
+    destination that are missing from the source. With --stream, the whole
+    source is copied as a compressed tar stream instead of with rsync.
+    """
+    _rsync(
+        project,
+        local,
+        remote,
+        server,
+        rsync_opts,
+        True,
+        summary,
+        parallel,
+        stream,
+    )
+
+
+@file.command(
+    name="sync-down", context_settings={"ignore_unknown_options": True}
+)
+@click.argument("project")
+@click.argument("remote")
+@click.argument("local")
+@click.argument("rsync_opts", nargs=-1, type=click.UNPROCESSED)
+@click.option("--server", is_flag=False, help="Name or ID of server to use.")
+@click.option(
+    "--summary",
+    is_flag=True,
+    help="Print the number of files and bytes transferred, and the rate.",
+)
+@click.option(
+    "--parallel",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of concurrent rsync workers to split the tree between.",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Send files as one compressed tar stream, for many small files.",
+)
+def sync_down(
+    project, remote, local, server, rsync_opts, summary, parallel, stream
+):
+    """Sync remote files down from project with rsync.
+
+    Arguments are used as "rsync -a server:REMOTE LOCAL [RSYNC_OPTS]".
+
+    With --parallel, the entries at the top of the source directory are
+    split between rsync workers by size. Each worker syncs only its entries,
+    so options such as --delete do not remove entries at the top of the
+    destination that are missing from the source. With --stream, the whole
+    source is copied as a compressed tar stream instead of with rsync.
+    """
+    _rsync(
+        project,
+        local,
+        remote,
+        server,
+        rsync_opts,
+        False,
+        summary,
+        parallel,
+        stream,
+    )
+
+
+@file.command()
+@click.argument("project")
+@click.argument("path")
+def ls(project, path):
+    """List files and directories on Faculty workspace."""
+    if not path.startswith("/project"):
+        faculty_cli.util.print_and_exit(
+            "{} is outside the project workspace".format(path), 66
+        )
+
+    project_id = faculty_cli.resolve.resolve_project(project)
+    relative_path = os.path.relpath(path, "/project")
+    client = faculty_cli.auth.client("workspace")
+
+    try:
+        directory_details_list = client.list(
+            project_id=project_id, prefix=relative_path, depth=1
+        )
+    except faculty.clients.base.NotFound:
+        faculty_cli.util.print_and_exit(
+            "{}: No such file or directory".format(path), 66
+        )
+
+    try:
+        [directory_details] = directory_details_list
+    except ValueError:
+        faculty_cli.util.print_and_exit(
+            "Zero or more than one objects returned", 70
+        )
+
+    for item in directory_details.content:
+        if hasattr(item, "content"):
+            click.echo("/project{}/".format(item.path))
+        else:
+            click.echo("/project{}".format(item.path))
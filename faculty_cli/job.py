@@ -0,0 +1,274 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Commands for manipulating Faculty jobs."""
+
+import itertools
+
+import click
+
+import faculty_cli.auth
+import faculty_cli.parse
+import faculty_cli.resolve
+import faculty_cli.table
+import faculty_cli.util
+
+
+def _format_datetime(timestamp):
+    if timestamp is None:
+        return "-"
+    else:
+        return timestamp.strftime("%Y-%m-%d %H:%M")
+
+
+@click.group()
+def job():
+    """Manipulate Faculty jobs."""
+    pass
+
+
+@job.command(name="list")
+@click.argument("project")
+@click.option(
+    "-v", "--verbose", is_flag=True, help="Print extra information about jobs."
+)
+def list_jobs(project, verbose):
+    """List the jobs in a project."""
+
+    project_id = faculty_cli.resolve.resolve_project(project)
+
+    jobs = faculty_cli.resolve.list_jobs(project_id)
+    if faculty_cli.table.machine_readable():
+        faculty_cli.table.echo_records(
+            (
+                (job.id, job.metadata.name, job.metadata.description)
+                for job in jobs
+            ),
+            ("id", "name", "description"),
+        )
+    elif verbose:
+        if not jobs:
+            click.echo("No jobs.")
+        else:
+            faculty_cli.table.echo_table(
+                (
+                    (job.metadata.name, job.id, job.metadata.description)
+                    for job in jobs
+                ),
+                ("Name", "ID", "Description"),
+                (None, faculty_cli.table.UUID_WIDTH, None),
+            )
+    else:
+        for job in jobs:
+            click.echo(job.metadata.name)
+
+
+@job.command(name="list-runs")
+@click.argument("project")
+@click.argument("job")
+@click.option(
+    "-v", "--verbose", is_flag=True, help="Print extra information about runs."
+)
+def list_job_runs(project, job, verbose):
+    """List the runs of a job."""
+
+    client = faculty_cli.auth.client("job")
+    (project_id, job_id), list_runs_result = faculty_cli.resolve.with_resolved(
+        lambda: faculty_cli.resolve.resolve_job(project, job),
+        lambda ids: (ids, client.list_runs(*ids)),
+    )
+
+    def list_runs(list_runs_result):
+        for run in list_runs_result.runs:
+            yield run
+        while list_runs_result.pagination.next is not None:
+            list_runs_result = client.list_runs(
+                project_id,
+                job_id,
+                start=list_runs_result.pagination.next.start,
+                limit=list_runs_result.pagination.next.limit,
+            )
+            for run in list_runs_result.runs:
+                yield run
+
+    # Runs are printed as pages of them are fetched
+    runs = list_runs(list_runs_result)
+    if faculty_cli.table.machine_readable():
+        faculty_cli.table.echo_records(
+            (
+                (
+                    run.id,
+                    run.run_number,
+                    run.state,
+                    run.submitted_at,
+                    run.started_at,
+                    run.ended_at,
+                )
+                for run in runs
+            ),
+            (
+                "id",
+                "run_number",
+                "state",
+                "submitted_at",
+                "started_at",
+                "ended_at",
+            ),
+        )
+    elif verbose:
+        first_run = next(runs, None)
+        if first_run is None:
+            click.echo("No runs.")
+        else:
+            rows = (
+                (
+                    run.run_number,
+                    run.id,
+                    run.state.value,
+                    _format_datetime(run.submitted_at),
+                    _format_datetime(run.started_at),
+                    _format_datetime(run.ended_at),
+                )
+                for run in itertools.chain([first_run], runs)
+            )
+            faculty_cli.table.echo_table(
+                rows,
+                (
+                    "Number",
+                    "ID",
+                    "State",
+                    "Submitted At",
+                    "Started At",
+                    "Ended At",
+                ),
+                (None, faculty_cli.table.UUID_WIDTH, None)
+                + (faculty_cli.table.DATETIME_WIDTH,) * 3,
+            )
+    else:
+        for run in runs:
+            click.echo(run.run_number)
+
+
+@job.command(name="run")
+@click.argument("project")
+@click.argument("job")
+@click.argument(
+    "parameter_values",
+    type=faculty_cli.parse.parse_parameter_values,
+    nargs=-1,
+    required=False,
+)
+@click.option("--num-subruns", type=int, help="Number of sub runs")
+def run_job(project, job, parameter_values, num_subruns):
+    """Run a job.
+
+    \b
+    To run a single job:
+    $ faculty job run PROJECT JOB
+
+    \b
+    To run a single job with parameters:
+    $ faculty job run PROJECT JOB "foo=bar,eggs=spam"
+
+    \b
+    To run a job multiple times with different parameters:
+    $ faculty job run PROJECT JOB "foo=bar,eggs=spam" "foo=bar2,eggs=spam2"
+
+    \b
+    To run a job multiple times with no parameters:
+    $ faculty job run PROJECT JOB --num-subruns 2
+
+    """
+
+    if num_subruns is None and not parameter_values:
+        parameter_values = [{}]
+    elif num_subruns is None and parameter_values:
+        pass
+    elif num_subruns is not None and not parameter_values:
+        parameter_values = [{} for _ in range(num_subruns)]
+    else:
+        faculty_cli.util.print_and_exit(
+            "Cannot set both 'parameter_values' and 'num_subruns'.", 64
+        )
+
+    client = faculty_cli.auth.client("job")
+    faculty_cli.resolve.with_resolved(
+        lambda: faculty_cli.resolve.resolve_job(project, job),
+        lambda ids: client.create_run(*ids, parameter_values),
+    )
+
+    if len(parameter_values) == 1:
+        run_type = "run"
+        suffix = ""
+    else:
+        run_type = "run array"
+        suffix = " with {} subruns".format(len(parameter_values))
+
+    click.echo(
+        "Submitted {} of job '{}' in project '{}'{}".format(
+            run_type, job, project, suffix
+        )
+    )
+
+
+@job.command("logs")
+@click.argument("project")
+@click.argument("job")
+@click.argument("run", type=faculty_cli.parse.parse_run_identifier)
+def job_run_logs(project, job, run):
+    """Print the logs for a run."""
+
+    job_client = faculty_cli.auth.client("job")
+    (project_id, job_id), run_details = faculty_cli.resolve.with_resolved(
+        lambda: faculty_cli.resolve.resolve_job(project, job),
+        lambda ids: (ids, job_client.get_run(*ids, run.run_number)),
+    )
+    if run.subrun_number is not None:
+        subrun_number = run.subrun_number
+    elif len(run_details.subruns) == 1:
+        subrun_number = run_details.subruns[0].subrun_number
+    else:
+        faculty_cli.util.print_and_exit(
+            (
+                "Run {0} has {1} subruns. You must specify the subrun "
+                "to show logs from, e.g. '{0}.1'."
+            ).format(run.run_number, len(run_details.subruns)),
+            64,
+        )
+
+    subrun_details = job_client.get_subrun(
+        project_id, job_id, run.run_number, subrun_number
+    )
+
+    log_client = faculty_cli.auth.client("log")
+
+    for env_step_exec in subrun_details.environment_step_executions:
+        env_name = env_step_exec.environment_name
+        click.secho(
+            'Logs for step of environment "{}":'.format(env_name), fg="yellow"
+        )
+        parts = log_client.get_subrun_environment_step_logs(
+            project_id,
+            job_id,
+            run_details.id,
+            subrun_details.id,
+            env_step_exec.environment_step_id,
+        )
+        click.echo("".join(part.content for part in parts), nl=False)
+
+    click.secho("Logs for job command:", fg="yellow")
+    parts = log_client.get_subrun_command_logs(
+        project_id, job_id, run_details.id, subrun_details.id
+    )
+    click.echo("".join(part.content for part in parts), nl=False)
@@ -0,0 +1,78 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Commands for manipulating Faculty projects."""
+
+import click
+import faculty
+import faculty.clients.base
+
+import faculty_cli.auth
+import faculty_cli.resolve
+import faculty_cli.table
+import faculty_cli.util
+
+
+@click.group()
+def project():
+    """Manipulate Faculty projects."""
+    pass
+
+
+@project.command(name="list")
+@click.option(
+    "-v",
+    "--verbose",
+    is_flag=True,
+    help="Print extra information about projects.",
+)
+def list_projects(verbose):
+    """List accessible Faculty projects."""
+    faculty_cli.auth.check_credentials()
+    projects = faculty_cli.resolve.list_projects()
+    if faculty_cli.table.machine_readable():
+        faculty_cli.table.echo_records(
+            ((p.id, p.name, p.owner_id) for p in projects),
+            ("id", "name", "owner_id"),
+        )
+    elif verbose:
+        if not projects:
+            click.echo("No projects.")
+        else:
+            faculty_cli.table.echo_table(
+                ((p.name, p.id) for p in projects),
+                ("Project Name", "ID"),
+                (None, faculty_cli.table.UUID_WIDTH),
+            )
+    else:
+        for project in projects:
+            click.echo(project.name)
+
+
+@project.command(name="new")
+@click.argument("name")
+def new_project(name):
+    """Create new project."""
+    client = faculty_cli.auth.client("project")
+    try:
+        returned_project = faculty_cli.auth.with_authenticated_user_id(
+            client.create, name
+        )
+    except faculty.clients.base.BadRequest as err:
+        faculty_cli.util.print_and_exit(err.error, 64)
+    click.echo(
+        "Created project {} with ID {}".format(
+            returned_project.name, returned_project.id
+        )
+    )
@@ -0,0 +1,409 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Resolution of resource names to IDs.
+
+Names are resolved using indexes of resources by name kept in the local cache,
+so that repeated commands against the same project do not need to list
+resources. An index is refreshed whenever the resources it covers are listed,
+including when a name is not found in it.
+
+A resource may be deleted and recreated under the same name outside the CLI,
+leaving a stale ID in an index. Requests made with resolved IDs therefore go
+through :func:`with_resolved`, which removes the indexes used and resolves the
+names and makes the request again if the API reports a resource as not found.
+"""
+
+import concurrent.futures
+import operator
+import threading
+import uuid
+
+import faculty
+import faculty.clients.base
+import faculty.config
+from faculty.clients.server import ServerStatus
+
+import faculty_cli.auth
+import faculty_cli.cache
+import faculty_cli.util
+from faculty_cli.util import AmbiguousNameError, NameNotFoundError
+
+
+# Names of cached indexes that names have been resolved with, recorded per
+# thread while in with_resolved
+_USED_INDEXES = threading.local()
+
+
+def _project_index_name(project_id, resource):
+    return "projects/{}/{}".format(project_id, resource)
+
+
+def _build_index(resources, get_name, get_entry=None):
+    """Build an index of resources by name, for resolving names to IDs."""
+    index = {}
+    for resource in resources:
+        if get_entry is None:
+            entry = str(resource.id)
+        else:
+            entry = get_entry(resource)
+        index.setdefault(get_name(resource), []).append(entry)
+    return index
+
+
+def _store_index(index_name, resources, get_name, get_entry=None):
+    index = _build_index(resources, get_name, get_entry)
+    faculty_cli.cache.store(
+        faculty.config.resolve_profile(), index_name, index
+    )
+
+
+def _load_index(index_name):
+    return faculty_cli.cache.load(faculty.config.resolve_profile(), index_name)
+
+
+def _record_index(index_name):
+    used_indexes = getattr(_USED_INDEXES, "names", None)
+    if used_indexes is not None:
+        used_indexes.add(index_name)
+
+
+def with_resolved(resolve, request):
+    """Resolve names to IDs and make a request with them.
+
+    If the request raises NotFound and any names were resolved with cached
+    indexes, those indexes are removed, and the names resolved and the request
+    made once more, in case a resource was recreated under the same name.
+    """
+    _USED_INDEXES.names = set()
+    try:
+        ids = resolve()
+    finally:
+        used_indexes = _USED_INDEXES.names
+        del _USED_INDEXES.names
+    try:
+        return request(ids)
+    except faculty.clients.base.NotFound:
+        if not used_indexes:
+            raise
+    profile = faculty.config.resolve_profile()
+    for index_name in used_indexes:
+        faculty_cli.cache.invalidate(profile, index_name)
+    return request(resolve())
+
+
+def _cached_id(index_name, name):
+    """Find an ID in a cached index, or None if it is not unique there."""
+    index = _load_index(index_name)
+    if index is None:
+        return None
+    matching_ids = index.get(name, [])
+    if len(matching_ids) == 1:
+        _record_index(index_name)
+        return uuid.UUID(matching_ids[0])
+    return None
+
+
+def list_projects():
+    """List all projects accessible by user."""
+    client = faculty_cli.auth.client("project")
+    projects = faculty_cli.auth.with_authenticated_user_id(
+        client.list_accessible_by_user
+    )
+    _store_index("projects", projects, operator.attrgetter("name"))
+    return projects
+
+
+def _match_project(project):
+    """Find a project by matching its name.
+
+    Project IDs are looked up in the cache first. On a miss, the project list
+    is fetched again, which also refreshes the cache.
+    """
+    project_id = _cached_id("projects", project)
+    if project_id is not None:
+        return project_id
+
+    projects = list_projects()
+    matching_projects = [p for p in projects if p.name == project]
+    if len(matching_projects) == 1:
+        project = matching_projects[0]
+    else:
+        if not matching_projects:
+            msg = 'no project of name "{}" found'.format(project)
+            raise NameNotFoundError(msg)
+        else:
+            msg = (
+                'more than one project of name "{}", please select by '
+                "project ID instead"
+            ).format(project)
+            raise AmbiguousNameError(msg)
+    return project.id
+
+
+def resolve_project(project):
+    """Resolve a project name or ID to a project ID."""
+    try:
+        project_id = uuid.UUID(project)
+    except ValueError:
+        project_id = _match_project(project)
+    return project_id
+
+
+def _server_index_entry(server):
+    return [str(server.id), server.status.value]
+
+
+def get_servers(project_id, name=None, status=None):
+    """List servers in the given project."""
+    client = faculty_cli.auth.client("server")
+    servers = client.list(project_id, name)
+    if name is None:
+        _store_index(
+            _project_index_name(project_id, "servers"),
+            servers,
+            operator.attrgetter("name"),
+            _server_index_entry,
+        )
+    if status is not None:
+        servers = [s for s in servers if s.status == status]
+    return servers
+
+
+def invalidate_servers(project_id):
+    """Remove cached servers of a project, after creating or deleting one."""
+    faculty_cli.cache.invalidate(
+        faculty.config.resolve_profile(),
+        _project_index_name(project_id, "servers"),
+    )
+
+
+def list_user_servers(user_id, status=None):
+    """List all servers owned by user."""
+    client = faculty_cli.auth.client("server")
+    servers = client.list_for_user(user_id)
+    if status is not None:
+        servers = [s for s in servers if s.status == status]
+    return servers
+
+
+def list_user_servers_with_project_names(status=None):
+    """List servers owned by the user, with the names of their projects.
+
+    Projects and servers are fetched concurrently.
+    """
+    # Get the user ID up front, so that it is only fetched once
+    faculty_cli.auth.get_authenticated_user_id()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        projects_future = executor.submit(list_projects)
+        servers_future = executor.submit(
+            faculty_cli.auth.with_authenticated_user_id,
+            list_user_servers,
+            status=status,
+        )
+        projects = {
+            project.id: project.name for project in projects_future.result()
+        }
+        return [
+            (projects[server.project_id], server)
+            for server in servers_future.result()
+        ]
+
+
+def _cached_server_id(project_id, server_name, status=None):
+    """Find a server ID in the cache, or None if it is not unique there."""
+    index_name = _project_index_name(project_id, "servers")
+    index = _load_index(index_name)
+    if index is None:
+        return None
+    matching_ids = [
+        server_id
+        for server_id, server_status in index.get(server_name, [])
+        if status is None or server_status == status.value
+    ]
+    if len(matching_ids) == 1:
+        _record_index(index_name)
+        return uuid.UUID(matching_ids[0])
+    return None
+
+
+def _server_by_name(project_id, server_name, status=None):
+    """Resolve a project ID and server name to a server ID."""
+    server_id = _cached_server_id(project_id, server_name, status)
+    if server_id is not None:
+        return server_id
+
+    servers = [
+        server
+        for server in get_servers(project_id, status=status)
+        if server.name == server_name
+    ]
+    if len(servers) == 1:
+        return servers[0].id
+    else:
+        adjective = "available" if status is None else status.value
+        if not servers:
+            msg = 'no {} server of name "{}" in this project'.format(
+                adjective, server_name
+            )
+            raise NameNotFoundError(msg)
+        else:
+            msg = (
+                'more than one {} server of name "{}", please select by '
+                "server ID instead"
+            ).format(adjective, server_name)
+            raise AmbiguousNameError(msg)
+
+
+def _any_server(project_id, status=None):
+    """Get any server from project."""
+    servers = get_servers(project_id, status=status)
+    if not servers:
+        adjective = "available" if status is None else status.value
+        faculty_cli.util.print_and_exit(
+            "No {} server in project.".format(adjective), 78
+        )
+    return servers[0].id
+
+
+def resolve_server(project, server=None, ensure_running=True):
+    """Resolve project and server names to project and server IDs."""
+    project_id = resolve_project(project)
+    status = ServerStatus.RUNNING if ensure_running else None
+    try:
+        server_id = uuid.UUID(server)
+    except ValueError:
+        server_id = _server_by_name(project_id, server, status)
+    except TypeError:
+        server_id = _any_server(project_id, status)
+    return project_id, server_id
+
+
+def list_jobs(project_id):
+    """List jobs in the given project."""
+    client = faculty_cli.auth.client("job")
+    jobs = client.list(project_id)
+    _store_index(
+        _project_index_name(project_id, "jobs"),
+        jobs,
+        operator.attrgetter("metadata.name"),
+    )
+    return jobs
+
+
+def _job_by_name(project_id, job_name):
+    """Resolve a project ID and job name to a job ID."""
+    job_id = _cached_id(_project_index_name(project_id, "jobs"), job_name)
+    if job_id is not None:
+        return job_id
+
+    jobs = list_jobs(project_id)
+    matching_jobs = [job for job in jobs if job.metadata.name == job_name]
+    if len(matching_jobs) == 1:
+        return matching_jobs[0].id
+    else:
+        if not matching_jobs:
+            msg = 'no job of name "{}" in this project'.format(job_name)
+            raise NameNotFoundError(msg)
+        else:
+            msg = (
+                'more than one job of name "{}", please select by job ID '
+                "instead"
+            ).format(job_name)
+            raise AmbiguousNameError(msg)
+
+
+def resolve_job(project, job):
+    """Resolve project and job names to project and job IDs."""
+    project_id = resolve_project(project)
+    try:
+        job_id = uuid.UUID(job)
+    except ValueError:
+        job_id = _job_by_name(project_id, job)
+    return project_id, job_id
+
+
+def list_environments(project_id):
+    """List environments in the given project."""
+    client = faculty_cli.auth.client("environment")
+    environments = client.list(project_id)
+    _store_index(
+        _project_index_name(project_id, "environments"),
+        environments,
+        operator.attrgetter("name"),
+    )
+    return environments
+
+
+def _environments_by_name(project_id, environment_names):
+    """Resolve environment names in a project to environment IDs.
+
+    Environments are listed at most once, however many names are given, and
+    all names that cannot be resolved are reported together.
+    """
+    index_name = _project_index_name(project_id, "environments")
+    index = _load_index(index_name)
+    if index is None or any(
+        len(index.get(name, [])) != 1 for name in environment_names
+    ):
+        environments = list_environments(project_id)
+        index = _build_index(environments, operator.attrgetter("name"))
+    else:
+        _record_index(index_name)
+
+    missing_names = [name for name in environment_names if name not in index]
+    ambiguous_names = [
+        name for name in environment_names if len(index.get(name, [])) > 1
+    ]
+    messages = [
+        'no available environment of name "{}"'.format(name)
+        for name in missing_names
+    ] + [
+        (
+            'more than one environment of name "{}", please select by '
+            "environment ID instead"
+        ).format(name)
+        for name in ambiguous_names
+    ]
+    if missing_names:
+        raise NameNotFoundError("\n".join(messages))
+    elif ambiguous_names:
+        raise AmbiguousNameError("\n".join(messages))
+
+    return {name: uuid.UUID(index[name][0]) for name in environment_names}
+
+
+def resolve_environments(project_id, environments):
+    """Resolve environments to environment IDs."""
+    environment_names = []
+    for environment in environments:
+        try:
+            uuid.UUID(environment)
+        except ValueError:
+            environment_names.append(environment)
+
+    ids_by_name = {}
+    if environment_names:
+        ids_by_name = _environments_by_name(project_id, environment_names)
+
+    return [
+        ids_by_name.get(environment) or uuid.UUID(environment)
+        for environment in environments
+    ]
+
+
+def resolve_environment(project_id, environment):
+    """Resolve environment to environment IDs."""
+    [environment_id] = resolve_environments(project_id, [environment])
+    return environment_id
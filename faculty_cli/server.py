@@ -0,0 +1,1021 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Commands for manipulating Faculty servers."""
+
+import collections
+import concurrent.futures
+import datetime
+import decimal
+import fnmatch
+import functools
+import operator
+import os
+import random
+import sys
+import time
+
+import click
+import faculty
+import faculty.clients.base
+import faculty.config
+from faculty.clients.server import (
+    DedicatedServerResources,
+    ServerStatus,
+    SharedServerResources,
+)
+from tabulate import tabulate
+
+import faculty_cli.auth
+import faculty_cli.cache
+import faculty_cli.resolve
+import faculty_cli.ssh
+import faculty_cli.table
+import faculty_cli.util
+
+
+def _server_spec(server):
+    """Return formatted strings for machine type, cpu and memory of server."""
+    if isinstance(server.resources, SharedServerResources):
+        machine_type = "-"
+        cpus = "{:.3g}".format(server.resources.milli_cpus / 1000)
+        memory_gb = "{:.3g}GB".format(server.resources.memory_mb / 1000)
+    else:
+        machine_type = server.resources.node_type
+        cpus = "-"
+        memory_gb = "-"
+    return machine_type, cpus, memory_gb
+
+
+# Polling intervals when waiting for servers to start, in seconds
+WAIT_INITIAL_INTERVAL = 1.0
+WAIT_MAX_INTERVAL = 30.0
+
+# Default interval between refreshes of the table of servers being watched
+WATCH_INTERVAL = 2.0
+
+# Maximum number of requests to create or delete servers made at once
+REQUEST_PARALLELISM = 8
+
+FAILED_SERVER_STATUSES = {ServerStatus.ERROR, ServerStatus.DESTROYED}
+
+
+def _backoff_intervals(initial, maximum):
+    """Yield exponentially increasing polling intervals, with jitter.
+
+    Jitter spreads out the requests of several clients waiting at once.
+    """
+    interval = initial
+    while True:
+        yield random.uniform(interval / 2, interval)
+        interval = min(interval * 2, maximum)
+
+
+def _fetch_servers(client, servers):
+    """Get the current state of servers.
+
+    A single server is fetched on its own, while several are fetched by
+    listing their projects, so that each round of polling makes one request
+    per project. Servers that no longer exist are reported as destroyed.
+    """
+    if len(servers) == 1:
+        [server] = servers
+        try:
+            return [client.get(server.project_id, server.id)]
+        except faculty.clients.base.NotFound:
+            return [server._replace(status=ServerStatus.DESTROYED)]
+
+    current = {}
+    for project_id in {server.project_id for server in servers}:
+        current.update({s.id: s for s in client.list(project_id)})
+    return [
+        current.get(server.id, server._replace(status=ServerStatus.DESTROYED))
+        for server in servers
+    ]
+
+
+def _refresh_servers(client, servers):
+    """Get the current state of servers, reporting any change of status."""
+    refreshed = _fetch_servers(client, servers)
+    for server, refreshed_server in zip(servers, refreshed):
+        if refreshed_server.status != server.status:
+            click.echo(
+                "Server {} is {}".format(
+                    refreshed_server.name, refreshed_server.status.value
+                ),
+                err=True,
+            )
+    return refreshed
+
+
+def _wait_for_servers(client, servers, timeout=None):
+    """Wait until servers are running, or have failed to start.
+
+    Only the servers still starting are polled, with exponential backoff.
+    Changes in their status are reported on standard error.
+    Returns the servers that failed to start and those still starting when
+    the timeout expired.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    intervals = _backoff_intervals(WAIT_INITIAL_INTERVAL, WAIT_MAX_INTERVAL)
+    failed = []
+    pending = servers
+    while True:
+        failed += [s for s in pending if s.status in FAILED_SERVER_STATUSES]
+        pending = [
+            s
+            for s in pending
+            if s.status != ServerStatus.RUNNING
+            and s.status not in FAILED_SERVER_STATUSES
+        ]
+        if not pending:
+            return failed, []
+
+        interval = next(intervals)
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return failed, pending
+            interval = min(interval, remaining)
+        time.sleep(interval)
+        pending = _refresh_servers(client, pending)
+
+
+@click.group()
+def server():
+    """Manipulate Faculty servers."""
+    pass
+
+
+SERVER_HEADERS = (
+    "Project Name",
+    "Server Name",
+    "Type",
+    "Machine Type",
+    "CPUs",
+    "RAM",
+    "Status",
+    "Server ID",
+    "Started",
+)
+SERVER_COLUMN_WIDTHS = (None,) * 7 + (
+    faculty_cli.table.UUID_WIDTH,
+    faculty_cli.table.DATETIME_WIDTH,
+)
+
+
+def _server_row(project_name, server):
+    machine_type, cpus, memory_gb = _server_spec(server)
+    return (
+        project_name,
+        server.name,
+        server.type,
+        machine_type,
+        cpus,
+        memory_gb,
+        server.status.value,
+        server.id,
+        server.created_at.strftime("%Y-%m-%d %H:%M"),
+    )
+
+
+SERVER_FIELDS = (
+    "project_id",
+    "project_name",
+    "id",
+    "name",
+    "type",
+    "machine_type",
+    "milli_cpus",
+    "memory_mb",
+    "status",
+    "created_at",
+)
+
+
+def _server_record(project_name, server):
+    if isinstance(server.resources, SharedServerResources):
+        machine_type = None
+        milli_cpus = server.resources.milli_cpus
+        memory_mb = server.resources.memory_mb
+    else:
+        machine_type = server.resources.node_type
+        milli_cpus = None
+        memory_mb = None
+    return (
+        server.project_id,
+        project_name,
+        server.id,
+        server.name,
+        server.type,
+        machine_type,
+        milli_cpus,
+        memory_mb,
+        server.status,
+        server.created_at,
+    )
+
+
+class _LiveTable:
+    """A table that is redrawn in place, rewriting only rows that changed.
+
+    Rows are identified by a key, and rows whose status changed since the
+    last update are highlighted. When not writing to a terminal, the whole
+    table is printed again whenever it changes.
+    """
+
+    def __init__(self, headers, status_column):
+        self.headers = tuple(headers)
+        self.status_column = status_column
+        self._keys = None
+        self._lines = None
+        self._widths = None
+        self._rows = {}
+
+    def _format(self, row, widths):
+        cells = (str(cell).ljust(width) for cell, width in zip(row, widths))
+        return "  ".join(cells).rstrip()
+
+    def update(self, rows):
+        """Draw rows, given as a list of (key, row) pairs."""
+        keys = [key for key, _ in rows]
+        widths = [
+            max(len(str(cell)) for cell in column)
+            for column in zip(self.headers, *(row for _, row in rows))
+        ]
+        lines = [self._format(self.headers, widths)]
+        for key, row in rows:
+            line = self._format(row, widths)
+            previous = self._rows.get(key)
+            if (
+                previous is not None
+                and previous[self.status_column] != row[self.status_column]
+            ):
+                line = click.style(line, fg="yellow", bold=True)
+            lines.append(line)
+        self._rows = dict(rows)
+
+        if not sys.stdout.isatty():
+            # Highlighting is not shown, so only print changes in content
+            if list(map(click.unstyle, lines)) != list(
+                map(click.unstyle, self._lines or [])
+            ):
+                click.echo("\n".join(lines) + "\n")
+        elif keys != self._keys or widths != self._widths:
+            click.clear()
+            click.echo("\n".join(lines))
+        else:
+            # Move up to each changed line and rewrite it, then move back
+            for index, (old, new) in enumerate(zip(self._lines, lines)):
+                if old != new:
+                    up = len(lines) - index
+                    click.echo(
+                        "\x1b[{}F\x1b[2K{}\x1b[{}E".format(up, new, up),
+                        nl=False,
+                    )
+        self._keys, self._lines, self._widths = keys, lines, widths
+
+
+def _watch_servers(project_id, status, interval):
+    """Keep redrawing a table of servers until interrupted.
+
+    Only servers are fetched on each refresh. Project names are listed once,
+    and again only when a server in a new project appears.
+    """
+    if project_id is None:
+        first_column = 0
+        projects = {}
+
+        def fetch():
+            servers = faculty_cli.auth.with_authenticated_user_id(
+                faculty_cli.resolve.list_user_servers, status=status
+            )
+            if any(server.project_id not in projects for server in servers):
+                projects.update(
+                    (project.id, project.name)
+                    for project in faculty_cli.resolve.list_projects()
+                )
+            return [
+                (projects.get(server.project_id, ""), server)
+                for server in servers
+            ]
+
+    else:
+        first_column = 1
+
+        def fetch():
+            return [
+                ("", server)
+                for server in faculty_cli.resolve.get_servers(
+                    project_id, status=status
+                )
+            ]
+
+    headers = SERVER_HEADERS[first_column:]
+    table = _LiveTable(headers, headers.index("Status"))
+    try:
+        while True:
+            rows = [
+                (server.id, _server_row(project_name, server)[first_column:])
+                for project_name, server in fetch()
+            ]
+            table.update(rows)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+@server.command(name="list")
+@click.argument("project", required=False, metavar="PROJECT")
+@click.option(
+    "-a",
+    "--all",
+    is_flag=True,
+    help="Show all servers, not just running ones.",
+)
+@click.option(
+    "-v",
+    "--verbose",
+    is_flag=True,
+    help="Print extra information about servers.",
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    help="Keep refreshing a table of servers, highlighting changes in "
+    "status.",
+)
+@click.option(
+    "--interval",
+    type=click.FloatRange(min=0.1),
+    default=None,
+    help="Seconds between refreshes with --watch (default 2).",
+)
+def list_servers(project, all, verbose, watch, interval):
+    """List your Faculty servers.
+
+    If you do not specify a project, all servers will be listed."""
+    if interval is not None and not watch:
+        raise click.UsageError("--interval can only be used with --watch")
+    status_filter = None if all else ServerStatus.RUNNING
+    if watch:
+        project_id = None
+        if project:
+            project_id = faculty_cli.resolve.resolve_project(project)
+        _watch_servers(
+            project_id,
+            status_filter,
+            WATCH_INTERVAL if interval is None else interval,
+        )
+        return
+
+    if not project:
+        servers = faculty_cli.resolve.list_user_servers_with_project_names(
+            status_filter
+        )
+    else:
+        project_id = faculty_cli.resolve.resolve_project(project)
+        servers = [
+            ("", server)
+            for server in faculty_cli.resolve.get_servers(
+                project_id, status=status_filter
+            )
+        ]
+
+    if faculty_cli.table.machine_readable():
+        faculty_cli.table.echo_records(
+            (
+                _server_record(project_name or None, server)
+                for project_name, server in servers
+            ),
+            SERVER_FIELDS,
+        )
+        return
+
+    found_servers = [
+        _server_row(project_name, server) for project_name, server in servers
+    ]
+    if not found_servers and verbose:
+        click.echo("No servers.")
+    elif project and verbose:
+        faculty_cli.table.echo_table(
+            (server[1:] for server in found_servers),
+            SERVER_HEADERS[1:],
+            SERVER_COLUMN_WIDTHS[1:],
+        )
+    elif project or not verbose:
+        for server in found_servers:
+            click.echo(server[1])
+    elif not project and verbose:
+        faculty_cli.table.echo_table(
+            found_servers, SERVER_HEADERS, SERVER_COLUMN_WIDTHS
+        )
+
+
+@server.command(name="open")
+@click.argument("project")
+@click.option("--server", is_flag=False, help="Name or ID of server to use.")
+def open_(project, server):
+    """Open a Faculty server in your browser."""
+    client = faculty_cli.auth.client("server")
+    server = faculty_cli.resolve.with_resolved(
+        lambda: faculty_cli.resolve.resolve_server(project, server),
+        lambda ids: client.get(*ids),
+    )
+
+    https_services = [
+        service for service in server.services if service.name == "https"
+    ]
+    if not https_services:
+        faculty_cli.util.print_and_exit(
+            "Server {} is not running an application that "
+            "can be opened in a web browser".format(server.name),
+            1,
+        )
+    [https_service] = https_services
+    url = "{}://{}".format(https_service.scheme, https_service.host)
+    click.echo("Opening {}".format(url))
+    click.launch(url)
+
+
+InstanceType = collections.namedtuple(
+    "InstanceType",
+    [
+        "name",
+        "milli_cpus",
+        "memory_mb",
+        "num_gpus",
+        "gpu_name",
+        "cost_usd_per_hour",
+    ],
+)
+
+INSTANCE_TYPES_TTL_ENV_VAR = "FACULTY_CLI_INSTANCE_TYPES_TTL"
+DEFAULT_INSTANCE_TYPES_TTL = 86400
+
+
+def _instance_types_ttl():
+    """Return the time in seconds for which instance types are cached.
+
+    This can be configured with the FACULTY_CLI_INSTANCE_TYPES_TTL environment
+    variable.
+    """
+    try:
+        return float(os.environ[INSTANCE_TYPES_TTL_ENV_VAR])
+    except (KeyError, ValueError):
+        return DEFAULT_INSTANCE_TYPES_TTL
+
+
+def _cached_instance_types():
+    """Load the cached catalogue of server types, or None if it expired."""
+    entries = faculty_cli.cache.load(
+        faculty.config.resolve_profile(),
+        "instance_types",
+        _instance_types_ttl(),
+    )
+    if entries is None:
+        return None
+    return [
+        InstanceType(*entry[:-1], decimal.Decimal(entry[-1]))
+        for entry in entries
+    ]
+
+
+def _list_instance_types(refresh=False):
+    """List the types of servers available on dedicated infrastructure.
+
+    The catalogue rarely changes, so it is cached for a day by default. Pass
+    refresh=True to fetch it again regardless.
+    """
+    if not refresh:
+        types = _cached_instance_types()
+        if types is not None:
+            return types
+
+    client = faculty_cli.auth.client("cluster")
+    types = [
+        InstanceType(
+            node_type.name,
+            node_type.milli_cpus,
+            node_type.memory_mb,
+            node_type.num_gpus,
+            node_type.gpu_name,
+            node_type.cost_usd_per_hour,
+        )
+        for node_type in client.list_single_tenanted_node_types(
+            interactive_instances_configured=True
+        )
+    ]
+    faculty_cli.cache.store(
+        faculty.config.resolve_profile(),
+        "instance_types",
+        [type_[:-1] + (str(type_.cost_usd_per_hour),) for type_ in types],
+    )
+    return types
+
+
+def _validate_machine_type(machine_type):
+    """Check that a machine type exists before creating a server with it.
+
+    If the type is not in the cached catalogue, it is fetched again in case
+    the type was added since. Validation is skipped if the catalogue cannot
+    be listed.
+    """
+    types = _cached_instance_types()
+    if types is None or machine_type not in {type_.name for type_ in types}:
+        try:
+            types = _list_instance_types(refresh=True)
+        except faculty.clients.base.HttpError:
+            return
+    if machine_type in {type_.name for type_ in types}:
+        return
+    faculty_cli.util.print_and_exit(
+        'Unknown machine type "{}". Available machine types are: {}'.format(
+            machine_type, ", ".join(sorted(type_.name for type_ in types))
+        ),
+        64,
+    )
+
+
+def _server_name(template, number, count):
+    """Number the name of one of the servers being created.
+
+    The number replaces {i} in the name, or is appended to it when creating
+    more than one server, so that the servers can be told apart.
+    """
+    if template is None:
+        return None
+    if "{i}" not in template and count > 1:
+        template += "-{i}"
+    return template.replace("{i}", str(number))
+
+
+def _new_servers(client, project_id, names, create, wait, timeout):
+    """Create servers concurrently, optionally waiting for them."""
+    # pylint: disable=too-many-arguments
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(len(names), REQUEST_PARALLELISM)
+    ) as executor:
+        futures = [executor.submit(create, name=name) for name in names]
+
+    created_names, server_ids, errors = [], [], []
+    for name, future in zip(names, futures):
+        try:
+            server_ids.append(future.result())
+            created_names.append(name)
+        except faculty.clients.base.HttpError as err:
+            # Keep going, so that the IDs of servers created are printed
+            errors.append(err)
+            click.echo(
+                "Failed to create server{}: {}".format(
+                    "" if name is None else " " + name, err.error or err
+                ),
+                err=True,
+            )
+    if not server_ids:
+        bad_request = all(
+            isinstance(err, faculty.clients.base.BadRequest) for err in errors
+        )
+        sys.exit(64 if bad_request else 1)
+
+    faculty_cli.resolve.invalidate_servers(project_id)
+    for server_id in server_ids:
+        click.echo(server_id)
+
+    try:
+        servers = {server.id: server for server in client.list(project_id)}
+    except faculty.clients.base.HttpError as err:
+        click.echo(
+            "Failed to get the servers created: {}".format(err.error or err),
+            err=True,
+        )
+        servers = {}
+    created = []
+    for name, server_id in zip(created_names, server_ids):
+        server = servers.get(server_id)
+        if server is not None:
+            created.append(server)
+            name = server.name
+        click.echo(
+            "Creating server {}".format(server_id if name is None else name),
+            err=True,
+        )
+
+    failed, pending = [], []
+    if wait and created:
+        failed, pending = _wait_for_servers(client, created, timeout)
+        for server in failed:
+            click.echo(
+                "Server {} failed to start".format(server.name), err=True
+            )
+        for server in pending:
+            click.echo(
+                "Timed out waiting for server {} to start".format(server.name),
+                err=True,
+            )
+
+    if len(created) < len(names) or failed or pending:
+        sys.exit(1)
+
+
+@server.command()
+@click.argument("project")
+@click.option(
+    "--cores",
+    type=float,
+    default=1,
+    show_default=True,
+    help="Number of CPU cores",
+)
+@click.option(
+    "--memory",
+    type=float,
+    default=4,
+    show_default=True,
+    help="Server memory in GB",
+)
+@click.option(
+    "--type",
+    "type_",
+    is_flag=False,
+    default="jupyter",
+    show_default=True,
+    help="Server type",
+)
+@click.option(
+    "--machine-type",
+    "machine_type",
+    default=None,
+    show_default=False,
+    help="Machine type for a dedicated instance, e.g. m5.xlarge. "
+    "If set, the memory and CPU arguments are ignored.",
+)
+@click.option(
+    "--version",
+    "version",
+    is_flag=False,
+    help="Server image version [advanced]",
+)
+@click.option("--name", is_flag=False, help="Name to assign to the server")
+@click.option(
+    "--environment",
+    "environments",
+    multiple=True,
+    help="Environments to apply to the server",
+)
+@click.option(
+    "--wait",
+    is_flag=True,
+    help="Wait until the server is running before exiting.",
+)
+@click.option(
+    "--timeout",
+    type=click.FloatRange(min=0),
+    default=None,
+    help="Maximum time to wait for the server to start, in seconds.",
+)
+@click.option(
+    "--count",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of servers to create. Use {i} in the name to number "
+    "them, or they are numbered at the end.",
+)
+def new(
+    project,
+    cores,
+    memory,
+    type_,
+    machine_type,
+    version,
+    name,
+    environments,
+    wait,
+    timeout,
+    count,
+):
+    """Create a new Faculty server.
+
+    The IDs of the servers created are printed one per line, and other
+    messages are printed to standard error.
+    """
+    # pylint: disable=too-many-arguments
+    if timeout is not None and not wait:
+        raise click.UsageError("--timeout can only be used with --wait")
+    project_id = faculty_cli.resolve.resolve_project(project)
+    environment_ids = faculty_cli.resolve.resolve_environments(
+        project_id, environments
+    )
+
+    if machine_type is None or machine_type == "custom":
+        resources = SharedServerResources(
+            milli_cpus=int(cores * 1000), memory_mb=int(memory * 1000)
+        )
+
+    elif machine_type is not None and machine_type != "custom":
+        _validate_machine_type(machine_type)
+        resources = DedicatedServerResources(node_type=machine_type)
+
+    client = faculty_cli.auth.client("server")
+    _new_servers(
+        client,
+        project_id,
+        [_server_name(name, i, count) for i in range(1, count + 1)],
+        functools.partial(
+            client.create,
+            project_id,
+            type_,
+            resources,
+            image_version=version,
+            initial_environment_ids=environment_ids,
+        ),
+        wait,
+        timeout,
+    )
+
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def _parse_duration(ctx, param, value):
+    """Parse a duration like '30m' or '8h' into a timedelta."""
+    if value is None:
+        return None
+    number, unit = value[:-1], value[-1:].lower()
+    try:
+        seconds = float(number) * DURATION_UNITS[unit]
+    except (KeyError, ValueError):
+        raise click.BadParameter(
+            "expected a number followed by one of {}, e.g. 8h".format(
+                ", ".join(DURATION_UNITS)
+            )
+        )
+    return datetime.timedelta(seconds=seconds)
+
+
+def _age(server):
+    created_at = server.created_at
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=datetime.timezone.utc)
+    return datetime.datetime.now(datetime.timezone.utc) - created_at
+
+
+def _select_servers(servers, match, status, older_than):
+    """Filter servers by name pattern, status and age."""
+    return [
+        (project_name, server)
+        for project_name, server in servers
+        if (match is None or fnmatch.fnmatchcase(server.name, match))
+        and (status is None or server.status.value == status)
+        and (older_than is None or _age(server) > older_than)
+    ]
+
+
+def _terminate_servers(servers):
+    """Terminate servers concurrently, returning those that failed."""
+    client = faculty_cli.auth.client("server")
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(len(servers), REQUEST_PARALLELISM)
+    ) as executor:
+        futures = {
+            executor.submit(client.delete, server.id): (project_name, server)
+            for project_name, server in servers
+        }
+
+    failures = []
+    for future, (project_name, server) in futures.items():
+        try:
+            future.result()
+        except faculty.clients.base.HttpError as err:
+            failures.append((project_name, server, err))
+    for project_id in {server.project_id for _, server in servers}:
+        faculty_cli.resolve.invalidate_servers(project_id)
+    return failures
+
+
+@server.command()
+@click.argument("project", required=False)
+@click.argument("server", required=False)
+@click.option(
+    "--match",
+    help="Terminate all servers with names matching this pattern, "
+    "e.g. 'worker-*'.",
+)
+@click.option(
+    "--status",
+    type=click.Choice([status.value for status in ServerStatus]),
+    help="Terminate all servers with this status.",
+)
+@click.option(
+    "--older-than",
+    callback=_parse_duration,
+    help="Terminate all servers created longer ago than this, e.g. 8h.",
+)
+@click.option(
+    "--all-projects",
+    is_flag=True,
+    help="Select servers you own in all projects, instead of in PROJECT.",
+)
+@click.option("-y", "--yes", is_flag=True, help="Do not ask for confirmation.")
+def terminate(project, server, match, status, older_than, all_projects, yes):
+    """Terminate Faculty servers.
+
+    Terminate a single SERVER in PROJECT, or select servers to terminate with
+    --match, --status and --older-than. Selected servers are listed and
+    confirmed before being terminated.
+    """
+    # pylint: disable=too-many-arguments
+    bulk = match is not None or status is not None or older_than is not None
+    if all_projects and project is not None:
+        raise click.UsageError("Cannot give a project with --all-projects.")
+    if bulk and server is not None:
+        raise click.UsageError(
+            "Cannot give a server with --match, --status or --older-than."
+        )
+    if not bulk:
+        if all_projects or project is None or server is None:
+            raise click.UsageError(
+                "Give a project and server, or select servers with "
+                "--match, --status or --older-than."
+            )
+        client = faculty_cli.auth.client("server")
+
+        def delete_server(ids):
+            project_id, server_id = ids
+            client.delete(server_id)
+            faculty_cli.resolve.invalidate_servers(project_id)
+
+        faculty_cli.resolve.with_resolved(
+            lambda: faculty_cli.resolve.resolve_server(
+                project, server, ensure_running=False
+            ),
+            delete_server,
+        )
+        return
+
+    if all_projects:
+        servers = faculty_cli.resolve.list_user_servers_with_project_names()
+    elif project is None:
+        raise click.UsageError("Give a project, or use --all-projects.")
+    else:
+        project_id = faculty_cli.resolve.resolve_project(project)
+        servers = [
+            (project, server_)
+            for server_ in faculty_cli.resolve.get_servers(project_id)
+        ]
+
+    selected = _select_servers(servers, match, status, older_than)
+    if not selected:
+        click.echo("No matching servers.")
+        return
+    for project_name, server_ in selected:
+        click.echo(
+            "{}\t{}\t{}".format(
+                project_name, server_.name, server_.status.value
+            )
+        )
+    if not yes:
+        click.confirm(
+            "Terminate {} servers?".format(len(selected)), abort=True
+        )
+
+    failures = _terminate_servers(selected)
+    for project_name, server_, err in failures:
+        click.echo(
+            "Failed to terminate server {} in project {}: {}".format(
+                server_.name, project_name, err
+            ),
+            err=True,
+        )
+    click.echo(
+        "Terminated {} servers, {} failed.".format(
+            len(selected) - len(failures), len(failures)
+        )
+    )
+    if failures:
+        sys.exit(1)
+
+
+@server.command(name="instance-types")
+@click.option(
+    "-v",
+    "--verbose",
+    is_flag=True,
+    help="Print extra information about instance types.",
+)
+@click.option(
+    "--refresh",
+    is_flag=True,
+    help="Fetch the instance types again, instead of using the cache.",
+)
+def instance_types(verbose, refresh):
+    """List the types of servers available on dedicated infrastructure."""
+    types = _list_instance_types(refresh=refresh)
+    types = sorted(types, key=operator.attrgetter("cost_usd_per_hour"))
+
+    if faculty_cli.table.machine_readable():
+        faculty_cli.table.echo_records(
+            (
+                (
+                    type_.name,
+                    type_.milli_cpus,
+                    type_.memory_mb,
+                    type_.num_gpus,
+                    type_.gpu_name,
+                    type_.cost_usd_per_hour,
+                )
+                for type_ in types
+            ),
+            (
+                "name",
+                "milli_cpus",
+                "memory_mb",
+                "num_gpus",
+                "gpu_name",
+                "cost_usd_per_hour",
+            ),
+        )
+    elif verbose:
+        if not types:
+            click.echo("No servers on dedicated infrastructure available.")
+
+        else:
+            headers = (
+                "Machine Type",
+                "CPUs",
+                "RAM",
+                "GPUs",
+                "GPU Name",
+                "Cost",
+            )
+            rows = [
+                (
+                    type_.name,
+                    "{:.3g}".format(type_.milli_cpus / 1000),
+                    "{:.3g} GB".format(type_.memory_mb / 1000),
+                    type_.num_gpus or "-",
+                    type_.gpu_name or "-",
+                    "$ {:.3f} / hour".format(type_.cost_usd_per_hour),
+                )
+                for type_ in types
+            ]
+            faculty_cli.table.echo_table(rows, headers)
+
+    else:
+        for type_ in types:
+            click.echo(type_.name)
+
+
+@server.command()
+@click.argument("project")
+@click.argument("server")
+def ssh_details(project, server):
+    """Echo the username, hostname and SSH port for a Faculty server.
+
+    After running this command, SSH into the server using:
+
+    $ ssh <username>@<hostname> -p <port>
+
+    For this command to work, you will first need to add your public SSH key
+    to `~/.ssh/authorized_keys` on the Faculty Platform.
+
+    """
+    details = faculty_cli.ssh.get_ssh_details(project, server)
+    click.echo(
+        tabulate(
+            [(details.hostname, details.port, details.username)],
+            ("Hostname", "Port", "Username"),
+            tablefmt="plain",
+        )
+    )
+
+
+@click.command(context_settings={"ignore_unknown_options": True})
+@click.argument("project")
+@click.argument("server")
+@click.argument("ssh_opts", nargs=-1, type=click.UNPROCESSED)
+def shell(project, server, ssh_opts):
+    """Open a shell on a Faculty server.
+
+    Any additional arguments given are passed on to SSH. This allows you to set
+    up, for example, port forwarding:
+
+    $ faculty shell <project> <server> -L 9000:localhost:8888
+
+    """
+
+    with faculty_cli.ssh.connection(project, server) as connection:
+        cmd = faculty_cli.ssh.ssh_command(connection, *ssh_opts)
+        faculty_cli.ssh.run_ssh_cmd(cmd, connection)
@@ -14,4 +14,58 @@
 
 """Shell helper functions."""
 
+import re
 from shlex import quote  # noqa: F401
+
+
+# Glob patterns, which are left unquoted to be expanded by the remote shell
+_GLOB_PATTERN = re.compile(r"[*?]|\[[^\]/]+\]")
+
+
+def has_glob(path):
+    """Check if a path contains glob patterns."""
+    return _GLOB_PATTERN.search(path) is not None
+
+
+# Characters left as they are in a bracket expression, as they mean nothing
+# else to a shell
+_BRACKET_SAFE_CHARACTERS = re.compile(r"[A-Za-z0-9._-]")
+
+
+def _quote_bracket(expression):
+    """Quote a bracket expression for a shell, keeping its meaning in globs.
+
+    Characters other than those known to be safe are escaped with
+    backslashes, which a shell removes while matching them literally.
+    """
+    contents = expression[1:-1]
+    negation = ""
+    if contents.startswith("!"):
+        negation, contents = "!", contents[1:]
+    if not contents or "\n" in contents:
+        return quote(expression)
+    escaped = "".join(
+        character
+        if _BRACKET_SAFE_CHARACTERS.match(character)
+        else "\\" + character
+        for character in contents
+    )
+    return "[{}{}]".format(negation, escaped)
+
+
+def quote_pattern(path):
+    """Quote a path for a shell, leaving glob patterns in it to be expanded."""
+    parts = []
+    position = 0
+    for match in _GLOB_PATTERN.finditer(path):
+        start = match.start()
+        if start > position:
+            parts.append(quote(path[position:start]))
+        pattern = match.group()
+        if pattern.startswith("["):
+            pattern = _quote_bracket(pattern)
+        parts.append(pattern)
+        position = match.end()
+    if position < len(path) or not parts:
+        parts.append(quote(path[position:]))
+    return "".join(parts)
@@ -0,0 +1,464 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Helpers for connecting to Faculty servers over SSH."""
+
+import collections
+import concurrent.futures
+import contextlib
+import math
+import os
+import re
+import selectors
+import shutil
+import stat
+import subprocess
+import tempfile
+
+import click
+import faculty.clients.base
+import faculty.config
+from faculty.clients.server import ServerStatus
+
+import faculty_cli.auth
+import faculty_cli.cache
+import faculty_cli.resolve
+import faculty_cli.util
+
+
+SSH_OPTIONS = [
+    "-o",
+    "IdentitiesOnly=yes",
+    "-o",
+    "StrictHostKeyChecking=no",
+    "-o",
+    "BatchMode=yes",
+]
+
+
+DISABLE_MULTIPLEXING_ENV_VAR = "FACULTY_CLI_DISABLE_SSH_MULTIPLEXING"
+
+# Shared connections are closed after being idle for this long
+CONTROL_PERSIST = "10m"
+
+# Unix socket paths are limited to 104 bytes on some platforms, and ssh first
+# creates control sockets with a random suffix of 17 characters
+MAX_CONTROL_PATH_LENGTH = 86
+
+
+def get_ssh_details(project, server):
+    client = faculty_cli.auth.client("server")
+    return faculty_cli.resolve.with_resolved(
+        lambda: faculty_cli.resolve.resolve_server(project, server),
+        lambda ids: client.get_ssh_details(*ids),
+    )
+
+
+@contextlib.contextmanager
+def save_key_to_file(key):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(tmpdir, "key.pem")
+        with open(filename, "w") as keyfile:
+            keyfile.write(key)
+        os.chmod(filename, stat.S_IRUSR & ~stat.S_IRGRP & ~stat.S_IROTH)
+        yield filename
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def _private_directory():
+    """Get a directory private to the user for control sockets and keys."""
+    path = os.path.join(faculty_cli.cache.cache_directory(), "ssh")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    os.chmod(path, 0o700)
+    return path
+
+
+def multiplexing_options(server_id):
+    """Get SSH options to share one connection to a server between commands.
+
+    The first command to connect to a server starts a master connection,
+    which later commands reuse until it has been idle for CONTROL_PERSIST.
+    Control sockets are kept in the cache directory, keyed by server ID.
+    Multiplexing can be disabled by setting the
+    FACULTY_CLI_DISABLE_SSH_MULTIPLEXING environment variable.
+    """
+    if os.environ.get(DISABLE_MULTIPLEXING_ENV_VAR) or os.name != "posix":
+        return []
+    try:
+        control_path = os.path.join(_private_directory(), server_id.hex)
+    except OSError:
+        return []
+    if len(control_path) > MAX_CONTROL_PATH_LENGTH:
+        return []
+    return [
+        "-o",
+        "ControlMaster=auto",
+        "-o",
+        "ControlPath={}".format(control_path),
+        "-o",
+        "ControlPersist={}".format(CONTROL_PERSIST),
+    ]
+
+
+SSHConnection = collections.namedtuple(
+    "SSHConnection",
+    ["project_id", "server_id", "hostname", "port", "username", "options"],
+)
+
+
+def _ssh_details_entry_name(server_id):
+    return "ssh/{}".format(server_id)
+
+
+def _key_path(server_id):
+    return os.path.join(_private_directory(), "{}.key".format(server_id.hex))
+
+
+def _write_private_file(path, content):
+    temporary_path = "{}.{}".format(path, os.getpid())
+    fd = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as fp:
+        fp.write(content)
+    os.replace(temporary_path, path)
+
+
+def _cache_ssh_details(profile, server_id, details):
+    """Cache the SSH details of a server, returning the path to its key."""
+    key_path = _key_path(server_id)
+    _write_private_file(key_path, details.key)
+    faculty_cli.cache.store(
+        profile,
+        _ssh_details_entry_name(server_id),
+        {
+            "hostname": details.hostname,
+            "port": details.port,
+            "username": details.username,
+        },
+    )
+    return key_path
+
+
+def _load_ssh_details(profile, server_id):
+    """Load cached SSH details of a server and the path to its key."""
+    data = faculty_cli.cache.load(
+        profile, _ssh_details_entry_name(server_id), ttl=math.inf
+    )
+    try:
+        key_path = _key_path(server_id)
+    except OSError:
+        return None
+    if data is None or not os.path.exists(key_path):
+        return None
+    return data, key_path
+
+
+def _ssh_details(profile, project_id, server_id):
+    """Get the SSH details of a server and the path to its key file.
+
+    Raises OSError if the key cannot be written to the private directory.
+    """
+    cached = _load_ssh_details(profile, server_id)
+    if cached is not None:
+        return cached
+    client = faculty_cli.auth.client("server")
+    details = client.get_ssh_details(project_id, server_id)
+    key_path = _cache_ssh_details(profile, server_id, details)
+    return details._asdict(), key_path
+
+
+def invalidate_ssh_details(server_id):
+    """Remove the cached SSH details and key of a server."""
+    faculty_cli.cache.invalidate(
+        faculty.config.resolve_profile(), _ssh_details_entry_name(server_id)
+    )
+    try:
+        os.remove(_key_path(server_id))
+    except OSError:
+        pass
+
+
+@contextlib.contextmanager
+def connection(project, server):
+    """Get the details of a server, and options for connecting to it.
+
+    Yields an SSHConnection, whose options for ssh, scp or rsync include an
+    identity file with the key of the server. The port is not included, as
+    scp and ssh take it with different flags.
+
+    SSH details and keys are cached per server, with keys in a private
+    directory, so that repeated connections make no requests. Pass the
+    connection to run_ssh_cmd so that they are removed if connecting fails.
+    """
+    profile = faculty.config.resolve_profile()
+
+    def fetch_ssh_details(ids):
+        cached = _load_ssh_details(profile, ids[1])
+        if cached is not None:
+            return ids, cached, None
+        client = faculty_cli.auth.client("server")
+        return ids, None, client.get_ssh_details(*ids)
+
+    (
+        (project_id, server_id),
+        cached,
+        details,
+    ) = faculty_cli.resolve.with_resolved(
+        lambda: faculty_cli.resolve.resolve_server(project, server),
+        fetch_ssh_details,
+    )
+
+    with contextlib.ExitStack() as stack:
+        if cached is not None:
+            data, key_path = cached
+        else:
+            data = details._asdict()
+            try:
+                if faculty_cli.cache.default_ttl() <= 0:
+                    raise OSError("the cache is disabled")
+                key_path = _cache_ssh_details(profile, server_id, details)
+            except OSError:
+                key_path = stack.enter_context(save_key_to_file(details.key))
+
+        yield SSHConnection(
+            project_id,
+            server_id,
+            data["hostname"],
+            data["port"],
+            data["username"],
+            SSH_OPTIONS + ["-i", key_path] + multiplexing_options(server_id),
+        )
+
+
+PERMISSION_DENIED_MESSAGE = """
+Permission was denied when attempting to connect to your Faculty server. A
+bug in earlier versions of OpenSSH (including the version distributed with
+macOS 10.10) may be the cause - please try updating your operating system or
+SSH version and try again.
+""".replace(
+    "\n", " "
+).strip()
+
+
+# Errors from ssh after which cached details of a server should not be reused
+CONNECTION_FAILURE_MESSAGES = [
+    b"Permission denied (publickey",
+    b"Connection refused",
+    b"Connection timed out",
+    b"Could not resolve hostname",
+    b"No route to host",
+    b"Connection closed by",
+]
+
+
+# Output of commands is passed on in chunks of up to this many bytes
+PUMP_CHUNK_SIZE = 65536
+
+# Length of a line kept while waiting for the rest of it, when looking for
+# error messages in the standard error of a command
+MAX_PARTIAL_LINE_LENGTH = 4096
+
+
+def _scan_error_line(line):
+    """Print hints for a line of standard error, and return if it failed."""
+    if (
+        b"Permission denied" in line
+        and b"rsync: send_files failed to open" not in line
+    ):
+        click.echo(PERMISSION_DENIED_MESSAGE, err=True)
+    return any(message in line for message in CONNECTION_FAILURE_MESSAGES)
+
+
+def run_ssh_cmd(argv, connection=None, stdout_callback=None, stdin=None):
+    """Run a command and print a message when a string is matched.
+
+    Standard error of the command is read through a pipe as it arrives and
+    passed on in chunks, with complete lines checked for known errors. Its
+    standard output is left attached, so that progress meters of scp, which
+    are only shown on a terminal, still work, unless a stdout_callback is
+    given. In that case standard output is read in the same loop and each
+    chunk passed to the callback instead of being printed. Standard input
+    is inherited, unless a file to read it from is given.
+
+    If the SSHConnection used by the command is given and connecting fails,
+    the cached details of its server are removed, so that they are fetched
+    again, and whether it is running checked, on the next connection.
+    """
+    process = subprocess.Popen(
+        argv,
+        stdin=stdin,
+        stdout=None if stdout_callback is None else subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    connection_failed = False
+    partial_line = b""
+
+    def handle_stderr(chunk):
+        nonlocal connection_failed, partial_line
+        click.echo(chunk, nl=False, err=True)
+        lines = (partial_line + chunk).split(b"\n")
+        partial_line = lines.pop()[-MAX_PARTIAL_LINE_LENGTH:]
+        for line in lines:
+            connection_failed |= _scan_error_line(line)
+
+    with selectors.DefaultSelector() as selector:
+        selector.register(process.stderr, selectors.EVENT_READ, handle_stderr)
+        if stdout_callback is not None:
+            selector.register(
+                process.stdout, selectors.EVENT_READ, stdout_callback
+            )
+        while selector.get_map():
+            for key, _ in selector.select():
+                chunk = os.read(key.fd, PUMP_CHUNK_SIZE)
+                if chunk:
+                    key.data(chunk)
+                else:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+    if partial_line:
+        connection_failed |= _scan_error_line(partial_line)
+
+    if connection_failed and connection is not None:
+        invalidate_ssh_details(connection.server_id)
+        faculty_cli.resolve.invalidate_servers(connection.project_id)
+    return process.wait()
+
+
+def ssh_command(connection, *args):
+    """Build an ssh command running arguments on a connected server."""
+    return (
+        ["ssh"]
+        + connection.options
+        + [
+            "-p",
+            str(connection.port),
+            "{}@{}".format(connection.username, connection.hostname),
+        ]
+        + list(args)
+    )
+
+
+def remote_output(connection, command):
+    """Run a shell command on a server and return its standard output."""
+    output = bytearray()
+    exit_code = run_ssh_cmd(
+        ssh_command(connection, command),
+        connection,
+        stdout_callback=output.extend,
+    )
+    if exit_code != 0:
+        faculty_cli.util.print_and_exit(
+            "Command failed on the server: {}".format(command), 69
+        )
+    return bytes(output)
+
+
+def _host_alias(project_name, server_name):
+    """Make an SSH host alias for a server from its project and name."""
+    return "faculty-{}-{}".format(
+        re.sub(r"[^A-Za-z0-9._-]+", "-", project_name),
+        re.sub(r"[^A-Za-z0-9._-]+", "-", server_name),
+    )
+
+
+def _ssh_config_value(value):
+    value = str(value)
+    return '"{}"'.format(value) if " " in value else value
+
+
+def _ssh_config_block(alias, data, key_path, server_id):
+    """Format the OpenSSH configuration of a host."""
+    options = [
+        ("HostName", data["hostname"]),
+        ("Port", data["port"]),
+        ("User", data["username"]),
+        ("IdentityFile", key_path),
+    ]
+    command_line_options = SSH_OPTIONS + multiplexing_options(server_id)
+    for option in command_line_options[1::2]:
+        options.append(tuple(option.split("=", 1)))
+    lines = ["Host {}".format(alias)] + [
+        "    {} {}".format(key, _ssh_config_value(value))
+        for key, value in options
+    ]
+    return "\n".join(lines) + "\n"
+
+
+@click.command(name="ssh-config")
+@click.option(
+    "--file",
+    "path",
+    type=click.Path(dir_okay=False),
+    help="Write the configuration to this file instead of printing it.",
+)
+def ssh_config(path):
+    """Generate OpenSSH configuration for servers.
+
+    A host is configured for each of your running servers, named
+    faculty-PROJECT-SERVER, so that ssh, scp, rsync and other tools can
+    connect to servers directly, for example:
+
+    $ ssh faculty-my-project-my-server
+
+    Keys are kept in the cache directory of the CLI. To use the configuration,
+    write it to a file with --file, and add 'Include FILE' at the top of
+    ~/.ssh/config. Run this command again to refresh it as servers change.
+    """
+    profile = faculty.config.resolve_profile()
+    servers = faculty_cli.resolve.list_user_servers_with_project_names(
+        status=ServerStatus.RUNNING
+    )
+
+    def server_block(project_name, server):
+        try:
+            data, key_path = _ssh_details(
+                profile, server.project_id, server.id
+            )
+        except faculty.clients.base.HttpError as err:
+            click.echo(
+                "Skipping server {} in project {}: {}".format(
+                    server.name, project_name, err
+                ),
+                err=True,
+            )
+            return None
+        return _ssh_config_block(
+            _host_alias(project_name, server.name), data, key_path, server.id
+        )
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            blocks = [
+                block
+                for block in executor.map(lambda s: server_block(*s), servers)
+                if block is not None
+            ]
+    except OSError as err:
+        faculty_cli.util.print_and_exit(
+            "Could not save server keys: {}".format(err), 73
+        )
+
+    config = "\n".join(blocks)
+    if path is None:
+        click.echo(config, nl=False)
+    else:
+        _write_private_file(path, config)
+        click.echo(
+            "Wrote configuration for {} servers to {}".format(
+                len(blocks), path
+            ),
+            err=True,
+        )
@@ -0,0 +1,190 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Transfer of files to and from servers as compressed tar streams.
+
+Copying many small files with scp or rsync costs a round trip or more per
+file. Instead, files are packed with tar on one end, compressed, sent over a
+single SSH channel and unpacked on the other end. The fastest compressor
+available on both ends is used.
+"""
+
+import collections
+import os
+import posixpath
+import shutil
+import subprocess
+
+import faculty_cli.shell
+import faculty_cli.ssh
+
+
+Compressor = collections.namedtuple(
+    "Compressor", ["name", "compress", "decompress"]
+)
+
+# In order of preference
+COMPRESSORS = [
+    Compressor("zstd", ["zstd", "-q", "-c"], ["zstd", "-q", "-d", "-c"]),
+    Compressor("lz4", ["lz4", "-q", "-c"], ["lz4", "-q", "-d", "-c"]),
+    Compressor("gzip", ["gzip", "-1", "-c"], ["gzip", "-d", "-c"]),
+]
+
+
+def _compressor(connection):
+    """Find the preferred compressor available locally and on the server.
+
+    Returns None if there is none, in which case tar streams are sent
+    uncompressed.
+    """
+    names = [compressor.name for compressor in COMPRESSORS]
+    output = faculty_cli.ssh.remote_output(
+        connection, "command -v {}; true".format(" ".join(names))
+    )
+    remote_names = {
+        os.path.basename(line) for line in output.decode("utf-8").split()
+    }
+    for compressor in COMPRESSORS:
+        if compressor.name in remote_names and shutil.which(compressor.name):
+            return compressor
+    return None
+
+
+def _member(path, pathmodule):
+    """Split a path into a directory for tar to change to and a member."""
+    path = path.rstrip("/") or "/"
+    name = pathmodule.basename(path) or "."
+    if name.startswith("-"):
+        name = "./" + name
+    return pathmodule.dirname(path) or ".", name
+
+
+def _tar_arguments(members):
+    arguments = []
+    for directory, name in members:
+        arguments += ["-C", directory, name]
+    return arguments
+
+
+def _first_failure(*exit_codes):
+    return next((code for code in exit_codes if code != 0), 0)
+
+
+def upload(connection, members, destination):
+    """Copy local files into a directory on a server, as a tar stream.
+
+    Members are pairs of a local directory and a path in it to copy, which
+    is created under the destination directory. Returns the first non-zero
+    exit code of the processes involved, or zero.
+    """
+    compressor = _compressor(connection)
+    quoted_destination = faculty_cli.shell.quote(destination)
+    unpack = "tar -xf - -C {}".format(quoted_destination)
+    if compressor is not None:
+        unpack = "{} | {}".format(" ".join(compressor.decompress), unpack)
+    remote_command = "mkdir -p {} && {}".format(quoted_destination, unpack)
+
+    tar = subprocess.Popen(
+        ["tar", "-cf", "-"] + _tar_arguments(members), stdout=subprocess.PIPE
+    )
+    processes = [tar]
+    if compressor is not None:
+        processes.append(
+            subprocess.Popen(
+                compressor.compress,
+                stdin=tar.stdout,
+                stdout=subprocess.PIPE,
+            )
+        )
+        tar.stdout.close()
+    stream = processes[-1].stdout
+
+    exit_code = faculty_cli.ssh.run_ssh_cmd(
+        faculty_cli.ssh.ssh_command(connection, remote_command),
+        connection,
+        stdin=stream,
+    )
+    stream.close()
+    return _first_failure(
+        exit_code, *(process.wait() for process in processes)
+    )
+
+
+def download(connection, members, destination):
+    """Copy files from a server into a local directory, as a tar stream.
+
+    Members are pairs of a directory on the server and a path in it to copy,
+    which is created under the destination directory. Returns the first
+    non-zero exit code of the processes involved, or zero.
+    """
+    compressor = _compressor(connection)
+    remote_command = "tar -cf - " + " ".join(
+        faculty_cli.shell.quote(argument)
+        for argument in _tar_arguments(members)
+    )
+    if compressor is not None:
+        # Exit with the status of tar rather than the compressor, without
+        # relying on pipefail, which not every shell supports
+        remote_command = (
+            "exec 4>&1; exit $( ( ({}; echo $? >&3) | {} >&4 ) 3>&1 )"
+        ).format(remote_command, " ".join(compressor.compress))
+
+    os.makedirs(destination, exist_ok=True)
+    processes = []
+    if compressor is not None:
+        processes.append(
+            subprocess.Popen(
+                compressor.decompress,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+        )
+    tar = subprocess.Popen(
+        ["tar", "-xf", "-", "-C", destination],
+        stdin=processes[0].stdout if processes else subprocess.PIPE,
+    )
+    if processes:
+        processes[0].stdout.close()
+    processes.append(tar)
+    stream = processes[0].stdin
+
+    def write(chunk):
+        try:
+            stream.write(chunk)
+        except BrokenPipeError:
+            # Unpacking failed, which is reported by its exit code
+            pass
+
+    exit_code = faculty_cli.ssh.run_ssh_cmd(
+        faculty_cli.ssh.ssh_command(connection, remote_command),
+        connection,
+        stdout_callback=write,
+    )
+    try:
+        stream.close()
+    except BrokenPipeError:
+        pass
+    return _first_failure(
+        exit_code, *(process.wait() for process in processes)
+    )
+
+
+def local_members(paths):
+    """Make tar members for local paths."""
+    return [_member(path, os.path) for path in paths]
+
+
+def remote_members(paths):
+    """Make tar members for paths on a server."""
+    return [_member(path, posixpath) for path in paths]
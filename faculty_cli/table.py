@@ -0,0 +1,166 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Printing of tables and machine-readable records.
+
+Tables are streamed when they may be large, and records are streamed in
+formats chosen with the global --output option.
+"""
+
+import csv
+import datetime
+import decimal
+import enum
+import itertools
+import json
+import numbers
+import sys
+import uuid
+
+import click
+from tabulate import tabulate
+
+import faculty_cli.util
+
+
+# Tables with at least this many rows are streamed, even on a terminal
+STREAM_THRESHOLD = 1000
+
+# Number of rows used to size the columns of a streamed table
+SAMPLE_SIZE = 100
+
+# Widths of values with a known format, for sizing streamed columns
+UUID_WIDTH = 36
+DATETIME_WIDTH = len("YYYY-MM-DD HH:MM")
+
+
+def _is_number(value):
+    """Check if a value is aligned as a number, as tabulate does."""
+    if isinstance(value, str):
+        try:
+            float(value)
+        except ValueError:
+            return False
+        return True
+    return isinstance(value, numbers.Number) and not isinstance(value, bool)
+
+
+def _stream_table(rows, headers, widths):
+    """Print rows as they arrive, in columns sized from a sample of rows."""
+    sample = list(itertools.islice(rows, SAMPLE_SIZE))
+    # Pad headers like tabulate does, so that small tables look the same
+    # whether or not they are streamed
+    widths = [
+        max(
+            [len(str(header)) + 2, width or 0]
+            + [len(str(row[i])) for row in sample]
+        )
+        for i, (header, width) in enumerate(zip(headers, widths))
+    ]
+    right_aligned = [
+        bool(sample) and all(_is_number(row[i]) for row in sample)
+        for i in range(len(headers))
+    ]
+
+    def format_row(row):
+        cells = [
+            str(cell).rjust(width) if right else str(cell).ljust(width)
+            for cell, width, right in zip(row, widths, right_aligned)
+        ]
+        return "  ".join(cells).rstrip()
+
+    click.echo(format_row(headers))
+    for row in itertools.chain(sample, rows):
+        click.echo(format_row(row))
+
+
+def echo_table(rows, headers, widths=None):
+    """Print rows as a table with aligned columns.
+
+    Small tables printed to a terminal are formatted to fit all their rows.
+    Otherwise, rows are printed as they are produced, in columns sized from
+    the first rows and the known widths of columns, if given, so that large
+    tables start printing immediately and are never held in memory. Values
+    wider than their column are printed in full.
+    """
+    rows = iter(rows)
+    if widths is None:
+        widths = [None] * len(headers)
+
+    if sys.stdout.isatty():
+        buffered = list(itertools.islice(rows, STREAM_THRESHOLD))
+        if len(buffered) < STREAM_THRESHOLD:
+            click.echo(tabulate(buffered, headers, tablefmt="plain"))
+            return
+        rows = itertools.chain(buffered, rows)
+
+    _stream_table(rows, headers, widths)
+
+
+def output_format():
+    """Get the output format chosen for the current command."""
+    ctx = click.get_current_context(silent=True)
+    if ctx is None:
+        return "text"
+    return ctx.find_root().meta.get(faculty_cli.util.OUTPUT_FORMAT_KEY, "text")
+
+
+def machine_readable():
+    """Check if records should be printed instead of text."""
+    return output_format() != "text"
+
+
+def _serialise(value):
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    elif isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    elif isinstance(value, enum.Enum):
+        return value.value
+    elif isinstance(value, decimal.Decimal):
+        return float(value)
+    return value
+
+
+def _json_line(fields, row):
+    return json.dumps(
+        {field: _serialise(value) for field, value in zip(fields, row)}
+    )
+
+
+def echo_records(rows, fields):
+    """Print rows as records with the given fields, in the output format.
+
+    Records are printed as they are produced, so that large listings are
+    never held in memory, including as a JSON array.
+    """
+    fmt = output_format()
+    if fmt == "ndjson":
+        for row in rows:
+            click.echo(_json_line(fields, row))
+    elif fmt == "json":
+        separator = "["
+        for row in rows:
+            click.echo(separator + _json_line(fields, row), nl=False)
+            separator = ",\n "
+        click.echo("[]" if separator == "[" else "]")
+    elif fmt == "csv":
+        writer = csv.writer(sys.stdout, lineterminator="\n")
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow(
+                ["" if value is None else _serialise(value) for value in row]
+            )
+    else:
+        raise ValueError("no records in output format {}".format(fmt))
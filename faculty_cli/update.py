@@ -12,18 +12,29 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-"""Prompt the user to update the Faculty CLI."""
+"""Prompt the user to update the Faculty CLI.
+
+Checking PyPI for new releases is done by a detached background process,
+started at most once a day, that records the latest release in the cache
+directory. Commands only ever read the recorded result, so no network requests
+are made on their critical path.
+"""
 
 import errno
 import os
+import subprocess
+import sys
 import time
-from distutils.version import StrictVersion
 
 import click
-import requests
+import faculty_cli.cache
 import faculty_cli.version
 
 
+PYPI_URL = "https://pypi.org/pypi/faculty-cli/json"
+DISABLE_UPDATE_CHECK_ENV_VAR = "FACULTY_CLI_DISABLE_UPDATE_CHECK"
+
+
 def _ensure_parent_exists(path):
     directory = os.path.dirname(path)
     try:
@@ -42,46 +53,107 @@ def _set_mtime(path):
 
 
 def _last_update_path():
-    xdg_cache_dir = os.environ.get("XDG_CACHE_DIR")
+    return os.path.join(
+        faculty_cli.cache.cache_directory(), "last_update_check"
+    )
+
+
+def _update_check_disabled():
+    value = os.environ.get(DISABLE_UPDATE_CHECK_ENV_VAR, "")
+    return value.strip().lower() not in ("", "0", "false", "no")
 
-    if not xdg_cache_dir:
-        xdg_cache_dir = os.path.expanduser("~/.cache")
 
-    return os.path.join(xdg_cache_dir, "faculty", "last_update_check")
+def _parse_version(version):
+    """Parse a release version like '0.31.0' into a tuple of integers."""
+    try:
+        return tuple(int(part) for part in version.split("."))
+    except ValueError:
+        return None
 
 
 def _get_pypi_versions():
-    response = requests.get(
-        "https://pypi.org/pypi/faculty-cli/json", timeout=1
-    )
+    import requests
+
+    response = requests.get(PYPI_URL, timeout=10)
     versions = response.json()["releases"].keys()
-    return [StrictVersion(v) for v in versions]
+    return [v for v in versions if _parse_version(v) is not None]
+
+
+def _record_latest_release():
+    """Query PyPI and record the latest release in the cache directory."""
+    latest = max(_get_pypi_versions(), key=_parse_version)
+    path = _last_update_path()
+    _ensure_parent_exists(path)
+    temporary_path = "{}.{}".format(path, os.getpid())
+    with open(temporary_path, "w") as fp:
+        fp.write(latest)
+    os.replace(temporary_path, path)
+
+
+def _start_background_check():
+    subprocess.Popen(
+        [sys.executable, "-m", "faculty_cli.update"],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def _warn_if_outdated(path):
+    try:
+        with open(path) as fp:
+            latest = fp.read().strip()
+    except OSError:
+        return
 
+    current = faculty_cli.version.__version__
+    current_version = _parse_version(current)
+    latest_version = _parse_version(latest)
+    if current_version is None or latest_version is None:
+        return
 
-def _check_for_new_release():
-    current = StrictVersion(faculty_cli.version.__version__)
-    latest = max(_get_pypi_versions())
-    if current < latest:
+    if current_version < latest_version:
         template = (
             "You are using faculty-cli version {}, however version {} is "
             "available.\n"
             "You should upgrade with 'pip install --upgrade faculty-cli'."
         )
         click.secho(template.format(current, latest), err=True, fg="yellow")
-    _set_mtime(_last_update_path())
 
 
 def check_for_new_release():
-    """Check for new releases, at most once every day."""
-    check_pypi = True
+    """Check for new releases, at most once every day.
+
+    The warning is based on the release recorded by the previous check, and a
+    new check is started in the background. Set the
+    FACULTY_CLI_DISABLE_UPDATE_CHECK environment variable to disable this.
+    """
+    if _update_check_disabled():
+        return
 
+    path = _last_update_path()
     try:
-        last_check_time = os.stat(_last_update_path()).st_mtime
+        last_check_time = os.stat(path).st_mtime
         one_day_ago = time.time() - 86400
         if last_check_time > one_day_ago:
-            check_pypi = False
+            return
     except OSError:
         pass
 
-    if check_pypi:
-        _check_for_new_release()
+    _warn_if_outdated(path)
+
+    try:
+        # Mark the check as done before starting it, so that concurrent
+        # invocations do not all start a check of their own
+        _set_mtime(path)
+    except OSError:
+        # The cache directory is not writable, so the background check would
+        # have nowhere to record its result
+        return
+
+    _start_background_check()
+
+
+if __name__ == "__main__":
+    _record_latest_release()
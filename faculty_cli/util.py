@@ -0,0 +1,43 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Helpers shared by all command groups."""
+
+import sys
+
+import click
+
+
+# Formats of the global --output option, stored in the metadata of the root
+# click context
+OUTPUT_FORMATS = ("text", "json", "ndjson", "csv")
+OUTPUT_FORMAT_KEY = "faculty_cli.output_format"
+
+
+class AmbiguousNameError(Exception):
+    """Exception when name matches multiple resources."""
+
+    pass
+
+
+class NameNotFoundError(Exception):
+    """Exception when a resource name is not found."""
+
+    pass
+
+
+def print_and_exit(msg, code):
+    """Print error message and exit with given code."""
+    click.echo(msg, err=True)
+    sys.exit(code)
@@ -15,11 +15,11 @@
 """Module version information."""
 
 import platform
-from pkg_resources import get_distribution, DistributionNotFound
+from importlib.metadata import PackageNotFoundError, version
 
 try:
-    __version__ = get_distribution("faculty-cli").version
-except DistributionNotFound:
+    __version__ = version("faculty-cli")
+except PackageNotFoundError:
     # package is not installed
     pass
 
@@ -57,9 +57,6 @@ setup(
         "requests",
         "tabulate",
         "faculty>=0.31.0",
-        # TODO: setuptools is required to supply `distutils`
-        # until we remove that dependency in the code
-        "setuptools",
     ],
-    entry_points={"console_scripts": ["faculty=faculty_cli.cli:cli"]},
+    entry_points={"console_scripts": ["faculty=faculty_cli.cli:main"]},
 )
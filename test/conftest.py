@@ -17,6 +17,28 @@ import pytest
 from test.fixtures import PROFILE, USER_ID
 
 
+@pytest.fixture(autouse=True)
+def cache_dir(tmpdir, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_DIR", str(tmpdir.join("cache")))
+    monkeypatch.delenv("FACULTY_CLI_CACHE_TTL", raising=False)
+    return tmpdir.join("cache")
+
+
+@pytest.fixture(autouse=True)
+def clear_user_ids(mocker):
+    mocker.patch.dict("faculty_cli.auth._USER_IDS", clear=True)
+
+
+@pytest.fixture(autouse=True)
+def clear_clients(mocker):
+    mocker.patch.dict("faculty_cli.auth._CLIENTS", clear=True)
+
+
+@pytest.fixture(autouse=True)
+def disable_update_check(monkeypatch):
+    monkeypatch.setenv("FACULTY_CLI_DISABLE_UPDATE_CHECK", "1")
+
+
 @pytest.fixture
 def mock_profile(mocker):
     mocker.patch("faculty.config.resolve_profile", return_value=PROFILE)
@@ -29,11 +51,11 @@ def mock_update_check(mocker):
 
 @pytest.fixture
 def mock_check_credentials(mocker):
-    mocker.patch("faculty_cli.cli._check_credentials")
+    mocker.patch("faculty_cli.auth.check_credentials")
 
 
 @pytest.fixture
 def mock_user_id(mocker):
     mocker.patch(
-        "faculty_cli.cli._get_authenticated_user_id", return_value=USER_ID
+        "faculty_cli.auth.get_authenticated_user_id", return_value=USER_ID
     )
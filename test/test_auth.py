@@ -0,0 +1,160 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import uuid
+
+import pytest
+
+import faculty.clients.base
+import faculty_cli.auth
+from faculty.clients.account import AccountClient
+from faculty.session.accesstoken import AccessToken
+from test.fixtures import PROFILE, USER_ID
+
+
+@pytest.fixture
+def mock_authenticated_user_id(mocker):
+    return mocker.patch.object(
+        AccountClient, "authenticated_user_id", return_value=USER_ID
+    )
+
+
+def test_get_authenticated_user_id_cached(
+    mock_profile, mock_authenticated_user_id
+):
+    assert faculty_cli.auth.get_authenticated_user_id() == USER_ID
+    assert faculty_cli.auth.get_authenticated_user_id() == USER_ID
+    mock_authenticated_user_id.assert_called_once_with()
+
+
+def test_get_authenticated_user_id_per_profile(
+    mocker, mock_profile, mock_authenticated_user_id
+):
+    faculty_cli.auth.get_authenticated_user_id()
+    mocker.patch(
+        "faculty.config.resolve_profile",
+        return_value=PROFILE._replace(client_id=uuid.uuid4()),
+    )
+    faculty_cli.auth.get_authenticated_user_id()
+    assert mock_authenticated_user_id.call_count == 2
+
+
+def test_with_authenticated_user_id(
+    mocker, mock_profile, mock_authenticated_user_id
+):
+    function = mocker.Mock()
+    result = faculty_cli.auth.with_authenticated_user_id(
+        function, "arg", kwarg="kwarg"
+    )
+    assert result == function.return_value
+    function.assert_called_once_with(USER_ID, "arg", kwarg="kwarg")
+
+
+def test_with_authenticated_user_id_refreshes_stale_id(
+    mocker, mock_profile, mock_authenticated_user_id
+):
+    stale_user_id = uuid.uuid4()
+    mock_authenticated_user_id.return_value = stale_user_id
+    faculty_cli.auth.get_authenticated_user_id()
+    mock_authenticated_user_id.return_value = USER_ID
+
+    forbidden = faculty.clients.base.Forbidden("response")
+    function = mocker.Mock(side_effect=[forbidden, "result"])
+
+    assert faculty_cli.auth.with_authenticated_user_id(function) == "result"
+    assert function.call_args_list == [
+        mocker.call(stale_user_id),
+        mocker.call(USER_ID),
+    ]
+    assert faculty_cli.auth.get_authenticated_user_id() == USER_ID
+
+
+def test_with_authenticated_user_id_reraises(
+    mocker, mock_profile, mock_authenticated_user_id
+):
+    forbidden = faculty.clients.base.Forbidden("response")
+    function = mocker.Mock(side_effect=forbidden)
+    with pytest.raises(faculty.clients.base.Forbidden):
+        faculty_cli.auth.with_authenticated_user_id(function)
+    function.assert_called_once_with(USER_ID)
+
+
+def _access_token(expires_in):
+    expires_at = datetime.datetime.now(
+        datetime.timezone.utc
+    ) + datetime.timedelta(seconds=expires_in)
+    return AccessToken("token-{}".format(uuid.uuid4()), expires_at)
+
+
+def test_access_token_file_cache_shared(mocker):
+    access_token = _access_token(3600)
+    get_access_token = mocker.patch(
+        "faculty.session._get_access_token", return_value=access_token
+    )
+
+    first_cache = faculty_cli.auth.AccessTokenFileCache()
+    assert first_cache.get(PROFILE) == access_token
+    assert first_cache.get(PROFILE) == access_token
+
+    second_cache = faculty_cli.auth.AccessTokenFileCache()
+    assert second_cache.get(PROFILE).token == access_token.token
+
+    get_access_token.assert_called_once_with(PROFILE)
+
+
+def test_access_token_file_cache_expired(mocker):
+    expiring_token = _access_token(30)
+    fresh_token = _access_token(3600)
+    mocker.patch(
+        "faculty.session._get_access_token",
+        side_effect=[expiring_token, fresh_token],
+    )
+
+    assert faculty_cli.auth.AccessTokenFileCache().get(PROFILE) == (
+        expiring_token
+    )
+    assert faculty_cli.auth.AccessTokenFileCache().get(PROFILE) == (
+        fresh_token
+    )
+
+
+def test_access_token_file_cache_expired_in_memory(mocker):
+    expiring_token = _access_token(30)
+    fresh_token = _access_token(3600)
+    get_access_token = mocker.patch(
+        "faculty.session._get_access_token", return_value=expiring_token
+    )
+
+    cache = faculty_cli.auth.AccessTokenFileCache()
+    assert cache.get(PROFILE) == expiring_token
+
+    # The token refreshed by another invocation is used
+    faculty_cli.auth.AccessTokenFileCache().add(PROFILE, fresh_token)
+    assert cache.get(PROFILE).token == fresh_token.token
+    get_access_token.assert_called_once_with(PROFILE)
+
+
+def test_access_token_file_cache_locks_refresh(mocker):
+    access_token = _access_token(3600)
+    mocker.patch(
+        "faculty.session._get_access_token", return_value=access_token
+    )
+    lock = mocker.spy(faculty_cli.cache, "lock")
+
+    cache = faculty_cli.auth.AccessTokenFileCache()
+    cache.get(PROFILE)
+    cache.get(PROFILE)
+
+    lock.assert_called_once_with(PROFILE, "access_token")
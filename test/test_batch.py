@@ -0,0 +1,82 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from click.testing import CliRunner
+
+import faculty_cli.version
+from faculty_cli.cli import cli
+
+
+BATCH = """\
+# Print the version twice
+version
+
+faculty version
+"""
+
+
+def test_batch():
+    runner = CliRunner()
+    result = runner.invoke(cli, ["batch"], input=BATCH)
+    assert result.exit_code == 0
+    assert result.stdout == 2 * (faculty_cli.version.__version__ + "\n")
+    assert result.stderr == "2\t0\tversion\n4\t0\tfaculty version\n"
+
+
+def test_batch_failure():
+    runner = CliRunner()
+    result = runner.invoke(cli, ["batch"], input="nope\nversion\n")
+    assert result.exit_code == 1
+    assert "1\t2\tnope\n" in result.stderr
+    assert "2\t0\tversion\n" in result.stderr
+
+
+def test_batch_parallel(mocker):
+    run = mocker.patch("faculty_cli.cli.run", return_value=0)
+    runner = CliRunner()
+    result = runner.invoke(
+        cli, ["batch", "--parallel", "4"], input="job list a\nversion\n"
+    )
+    assert result.exit_code == 0
+    assert sorted(call.args for call in run.call_args_list) == [
+        (["job", "list", "a"],),
+        (["version"],),
+    ]
+
+
+def test_batch_exception(mocker):
+    def run(argv):
+        if argv == ["project", "list"]:
+            raise RuntimeError("connection failed")
+        return 0
+
+    mocker.patch("faculty_cli.cli.run", side_effect=run)
+    runner = CliRunner()
+    result = runner.invoke(
+        cli, ["batch"], input="version\nproject list\nversion\n"
+    )
+    assert result.exit_code == 1
+    assert result.stderr == (
+        "1\t0\tversion\n"
+        "Error: connection failed\n"
+        "2\t1\tproject list\n"
+        "3\t0\tversion\n"
+    )
+
+
+def test_batch_invalid_line():
+    runner = CliRunner()
+    result = runner.invoke(cli, ["batch"], input='version\nfile ls "a\n')
+    assert result.exit_code == 64
+    assert "line 2: No closing quotation" in result.stderr
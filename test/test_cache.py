@@ -0,0 +1,107 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import threading
+import time
+
+from click.testing import CliRunner
+
+import faculty_cli.cache
+from faculty_cli.cli import cli
+from test.fixtures import PROFILE
+
+
+def test_store_and_load():
+    faculty_cli.cache.store(PROFILE, "test", {"key": ["value"]})
+    assert faculty_cli.cache.load(PROFILE, "test") == {"key": ["value"]}
+
+
+def test_load_missing():
+    assert faculty_cli.cache.load(PROFILE, "test") is None
+
+
+def test_load_corrupt(cache_dir):
+    faculty_cli.cache.store(PROFILE, "test", "value")
+    [path] = cache_dir.visit("*.json")
+    path.write("{")
+    assert faculty_cli.cache.load(PROFILE, "test") is None
+
+
+def test_load_expired(mocker):
+    faculty_cli.cache.store(PROFILE, "test", "value")
+    mocker.patch("time.time", return_value=time.time() + 7200)
+    assert faculty_cli.cache.load(PROFILE, "test") is None
+    assert faculty_cli.cache.load(PROFILE, "test", ttl=10000) == "value"
+
+
+def test_ttl_from_environment(monkeypatch):
+    monkeypatch.setenv("FACULTY_CLI_CACHE_TTL", "0")
+    faculty_cli.cache.store(PROFILE, "test", "value")
+    assert faculty_cli.cache.load(PROFILE, "test", ttl=10000) is None
+
+
+def test_store_unwritable(mocker):
+    mocker.patch("os.makedirs", side_effect=PermissionError)
+    faculty_cli.cache.store(PROFILE, "test", "value")
+    assert faculty_cli.cache.load(PROFILE, "test") is None
+
+
+def test_store_is_per_profile():
+    other_profile = PROFILE._replace(domain="other.domain")
+    faculty_cli.cache.store(PROFILE, "test", "value")
+    assert faculty_cli.cache.load(other_profile, "test") is None
+
+
+def test_invalidate():
+    faculty_cli.cache.store(PROFILE, "test", "value")
+    faculty_cli.cache.invalidate(PROFILE, "test")
+    assert faculty_cli.cache.load(PROFILE, "test") is None
+
+
+def test_cache_clear(mocker, cache_dir):
+    mocker.patch("faculty_cli.update.check_for_new_release")
+    faculty_cli.cache.store(PROFILE, "test", "value")
+    cache_dir.join("last_update_check").write("0.1.0")
+
+    runner = CliRunner()
+    result = runner.invoke(cli, ["cache", "clear"])
+
+    assert result.exit_code == 0
+    assert faculty_cli.cache.load(PROFILE, "test") is None
+    assert os.path.exists(str(cache_dir.join("last_update_check")))
+
+
+def test_lock_is_exclusive():
+    events = []
+
+    def worker(name):
+        with faculty_cli.cache.lock(PROFILE, "test"):
+            events.append((name, "start"))
+            time.sleep(0.05)
+            events.append((name, "end"))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [event for _, event in events] == ["start", "end"] * 2
+
+
+def test_lock_unwritable(mocker):
+    mocker.patch("os.makedirs", side_effect=PermissionError)
+    with faculty_cli.cache.lock(PROFILE, "test"):
+        pass
@@ -0,0 +1,211 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import uuid
+
+import pytest
+from click.testing import CliRunner
+
+import faculty_cli.cache
+import faculty_cli.chunked
+import faculty_cli.ssh
+from faculty_cli.cli import cli
+from test.fixtures import PROFILE
+
+
+CONNECTION = faculty_cli.ssh.SSHConnection(
+    project_id=uuid.uuid4(),
+    server_id=uuid.uuid4(),
+    hostname="test-host",
+    port=2222,
+    username="faculty",
+    options=[],
+)
+
+CONTENT = b"0123456789abcdefghijk"
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(mocker):
+    mocker.patch("faculty_cli.chunked.BLOCK_SIZE", 4)
+    mocker.patch("faculty_cli.chunked.CHUNK_BLOCKS", 2)
+
+
+@pytest.fixture
+def local_server(mocker, mock_profile):
+    """Run commands for the server in a local shell instead of over SSH."""
+    mocker.patch(
+        "faculty_cli.ssh.ssh_command",
+        side_effect=lambda connection, command: ["sh", "-c", command],
+    )
+
+
+@pytest.fixture
+def chunk_commands(mocker):
+    """Record commands copying chunks, and fail the second one."""
+    commands = []
+    run_ssh_cmd = faculty_cli.ssh.run_ssh_cmd
+
+    def record(argv, *args, **kwargs):
+        if "sha256sum" not in argv[-1] and argv[-1].startswith("dd "):
+            commands.append(argv[-1])
+            if len(commands) == 2:
+                return 255
+        return run_ssh_cmd(argv, *args, **kwargs)
+
+    mocker.patch("faculty_cli.ssh.run_ssh_cmd", side_effect=record)
+    return commands
+
+
+def _journal(direction, remote, local):
+    name = faculty_cli.chunked._journal_name(
+        direction, CONNECTION, str(remote), str(local)
+    )
+    return faculty_cli.cache.load(PROFILE, name, float("inf"))
+
+
+def test_upload(local_server, tmpdir):
+    local = tmpdir.join("local")
+    local.write_binary(CONTENT)
+    remote = tmpdir.join("remote")
+
+    faculty_cli.chunked.upload(CONNECTION, str(local), str(remote))
+
+    assert remote.read_binary() == CONTENT
+    assert not tmpdir.join("remote.faculty-part").exists()
+    assert _journal("put", remote, local) is None
+
+
+def test_download(local_server, tmpdir):
+    remote = tmpdir.join("remote")
+    remote.write_binary(CONTENT)
+    local = tmpdir.join("local")
+
+    faculty_cli.chunked.download(CONNECTION, str(remote), str(local))
+
+    assert local.read_binary() == CONTENT
+    assert not tmpdir.join("local.faculty-part").exists()
+    assert _journal("get", remote, local) is None
+
+
+def test_download_resumes(local_server, chunk_commands, tmpdir):
+    remote = tmpdir.join("remote")
+    remote.write_binary(CONTENT)
+    local = tmpdir.join("local")
+
+    with pytest.raises(SystemExit) as excinfo:
+        faculty_cli.chunked.download(CONNECTION, str(remote), str(local))
+    assert excinfo.value.code == 75
+    assert list(_journal("get", remote, local)["chunks"]) == ["0"]
+
+    faculty_cli.chunked.download(CONNECTION, str(remote), str(local))
+
+    assert local.read_binary() == CONTENT
+    assert [command.split()[3] for command in chunk_commands] == [
+        "skip=0",
+        "skip=2",
+        "skip=2",
+        "skip=4",
+    ]
+
+
+def test_upload_resumes(local_server, chunk_commands, tmpdir):
+    local = tmpdir.join("local")
+    local.write_binary(CONTENT)
+    remote = tmpdir.join("remote")
+
+    with pytest.raises(SystemExit) as excinfo:
+        faculty_cli.chunked.upload(CONNECTION, str(local), str(remote))
+    assert excinfo.value.code == 75
+
+    faculty_cli.chunked.upload(CONNECTION, str(local), str(remote))
+
+    assert remote.read_binary() == CONTENT
+    assert len(chunk_commands) == 4
+
+
+def test_download_restarts_when_source_changes(
+    local_server, chunk_commands, tmpdir
+):
+    remote = tmpdir.join("remote")
+    remote.write_binary(CONTENT)
+    local = tmpdir.join("local")
+
+    with pytest.raises(SystemExit):
+        faculty_cli.chunked.download(CONNECTION, str(remote), str(local))
+    remote.write_binary(CONTENT + b"more")
+
+    faculty_cli.chunked.download(CONNECTION, str(remote), str(local))
+
+    assert local.read_binary() == CONTENT + b"more"
+    assert len(chunk_commands) == 6
+    assert chunk_commands[2].split()[3] == "skip=0"
+
+
+def test_hash_mismatch(mocker, local_server, tmpdir):
+    remote_hash = mocker.patch(
+        "faculty_cli.chunked._remote_hash", return_value="0" * 64
+    )
+    remote = tmpdir.join("remote")
+    remote.write_binary(CONTENT)
+
+    with pytest.raises(SystemExit) as excinfo:
+        faculty_cli.chunked.download(
+            CONNECTION, str(remote), str(tmpdir.join("local"))
+        )
+
+    assert excinfo.value.code == 70
+    assert remote_hash.call_count == faculty_cli.chunked.CHUNK_ATTEMPTS
+
+
+def test_file_get_resume(
+    mocker, mock_update_check, mock_check_credentials, tmpdir
+):
+    mocker.patch(
+        "faculty_cli.ssh.connection",
+        return_value=contextlib.nullcontext(CONNECTION),
+    )
+    download = mocker.patch("faculty_cli.chunked.download")
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "file",
+            "get",
+            "project",
+            "/project/a.bin",
+            "/project/b.bin",
+            str(tmpdir),
+            "--resume",
+        ],
+    )
+
+    assert result.exit_code == 0
+    assert download.call_args_list == [
+        mocker.call(CONNECTION, "/project/a.bin", str(tmpdir.join("a.bin"))),
+        mocker.call(CONNECTION, "/project/b.bin", str(tmpdir.join("b.bin"))),
+    ]
+
+
+def test_file_put_resume_directory(
+    mock_update_check, mock_check_credentials, tmpdir
+):
+    runner = CliRunner()
+    result = runner.invoke(
+        cli, ["file", "put", "project", str(tmpdir), "/project", "--resume"]
+    )
+
+    assert result.exit_code == 64
@@ -0,0 +1,46 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+from faculty_cli.cli import cli, LAZY_SUBCOMMANDS
+
+
+def test_import_does_not_load_sdk():
+    code = (
+        "import sys, faculty_cli.cli; "
+        "assert 'faculty' not in sys.modules; "
+        "assert 'requests' not in sys.modules"
+    )
+    subprocess.check_call([sys.executable, "-c", code])
+
+
+def test_help_lists_lazy_subcommands(mocker):
+    import_command = mocker.patch("faculty_cli.cli._import_command")
+    runner = CliRunner()
+    result = runner.invoke(cli, ["--help"])
+    assert result.exit_code == 0
+    for name, lazy_command in LAZY_SUBCOMMANDS.items():
+        assert "{}  ".format(name) in result.output
+        assert lazy_command.short_help in result.output
+    import_command.assert_not_called()
+
+
+def test_lazy_subcommand_short_help_matches_command():
+    for name, lazy_command in LAZY_SUBCOMMANDS.items():
+        command = cli.get_command(None, name)
+        assert command.get_short_help_str() == lazy_command.short_help
@@ -0,0 +1,82 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import threading
+
+import pytest
+
+import faculty_cli.daemon
+import faculty_cli.version
+
+
+@pytest.fixture
+def daemon_server(cache_dir):
+    path = faculty_cli.daemon.socket_path()
+    os.makedirs(os.path.dirname(path))
+    server = faculty_cli.daemon._Server(
+        path, faculty_cli.daemon._CommandHandler
+    )
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_forward_without_daemon():
+    assert faculty_cli.daemon.forward(["version"]) is None
+
+
+def test_forward(daemon_server, capfd):
+    assert faculty_cli.daemon.forward(["version"]) == 0
+    out, _ = capfd.readouterr()
+    assert out == faculty_cli.version.__version__ + "\n"
+
+
+def test_forward_exit_code(daemon_server, capfd):
+    assert faculty_cli.daemon.forward(["no-such-command"]) == 2
+    _, err = capfd.readouterr()
+    assert "No such command 'no-such-command'" in err
+
+
+def test_forward_version_mismatch(mocker, daemon_server):
+    request = faculty_cli.daemon._build_request(["version"])
+    request["version"] = "0.0.0"
+    mocker.patch("faculty_cli.daemon._build_request", return_value=request)
+    assert faculty_cli.daemon.forward(["version"]) is None
+
+
+@pytest.mark.parametrize("command", ["daemon", "login", "shell"])
+def test_forward_in_process_commands(daemon_server, command):
+    assert faculty_cli.daemon.forward([command]) is None
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--output", "json", "shell", "project"],
+        ["--output=json", "shell", "project"],
+    ],
+)
+def test_forward_in_process_commands_after_options(daemon_server, argv):
+    assert faculty_cli.daemon.forward(argv) is None
+
+
+def test_forward_disabled(daemon_server, monkeypatch):
+    monkeypatch.setenv("FACULTY_CLI_NO_DAEMON", "1")
+    assert faculty_cli.daemon.forward(["version"]) is None
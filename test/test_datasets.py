@@ -20,14 +20,19 @@ from faculty_cli.cli import cli
 from test.fixtures import PROJECT
 
 
+@pytest.fixture(autouse=True)
+def mock_client(mocker):
+    return mocker.patch("faculty_cli.auth.client")
+
+
 @pytest.fixture
 def mock_resolve_project(mocker):
     return mocker.patch(
-        "faculty_cli.cli._resolve_project", return_value=PROJECT.id
+        "faculty_cli.resolve.resolve_project", return_value=PROJECT.id
     )
 
 
-def test_datasets_get(mocker, mock_resolve_project):
+def test_datasets_get(mocker, mock_resolve_project, mock_client):
 
     mock_get = mocker.patch("faculty.datasets.get")
 
@@ -39,7 +44,10 @@ def test_datasets_get(mocker, mock_resolve_project):
 
     mock_resolve_project.assert_called_once_with("test-project")
     mock_get.assert_called_once_with(
-        "source", "dest", project_id=mock_resolve_project.return_value
+        "source",
+        "dest",
+        project_id=mock_resolve_project.return_value,
+        object_client=mock_client.return_value,
     )
 
 
@@ -73,7 +81,7 @@ def test_datasets_get_exception(
     assert result.output == "{}\n".format(message)
 
 
-def test_datasets_put(mocker, mock_resolve_project):
+def test_datasets_put(mocker, mock_resolve_project, mock_client):
 
     mock_put = mocker.patch("faculty.datasets.put")
 
@@ -85,7 +93,10 @@ def test_datasets_put(mocker, mock_resolve_project):
 
     mock_resolve_project.assert_called_once_with("test-project")
     mock_put.assert_called_once_with(
-        "source", "dest", project_id=mock_resolve_project.return_value
+        "source",
+        "dest",
+        project_id=mock_resolve_project.return_value,
+        object_client=mock_client.return_value,
     )
 
 
@@ -109,7 +120,7 @@ def test_datasets_put_exception(mocker, mock_resolve_project, exception):
     assert result.output == "{}\n".format(exception)
 
 
-def test_datasets_mv(mocker, mock_resolve_project):
+def test_datasets_mv(mocker, mock_resolve_project, mock_client):
 
     mock_mv = mocker.patch("faculty.datasets.mv")
 
@@ -121,7 +132,10 @@ def test_datasets_mv(mocker, mock_resolve_project):
 
     mock_resolve_project.assert_called_once_with("test-project")
     mock_mv.assert_called_once_with(
-        "source", "dest", project_id=mock_resolve_project.return_value
+        "source",
+        "dest",
+        project_id=mock_resolve_project.return_value,
+        object_client=mock_client.return_value,
     )
 
 
@@ -139,7 +153,7 @@ def test_datasets_mv_source_not_found(mocker, mock_resolve_project):
     assert result.output == "{}\n".format(exception)
 
 
-def test_datasets_cp(mocker, mock_resolve_project):
+def test_datasets_cp(mocker, mock_resolve_project, mock_client):
 
     mock_cp = mocker.patch("faculty.datasets.cp")
 
@@ -155,10 +169,11 @@ def test_datasets_cp(mocker, mock_resolve_project):
         "dest",
         project_id=mock_resolve_project.return_value,
         recursive=False,
+        object_client=mock_client.return_value,
     )
 
 
-def test_datasets_cp_recursive(mocker, mock_resolve_project):
+def test_datasets_cp_recursive(mocker, mock_resolve_project, mock_client):
 
     mock_cp = mocker.patch("faculty.datasets.cp")
 
@@ -182,6 +197,7 @@ def test_datasets_cp_recursive(mocker, mock_resolve_project):
         "dest-directory",
         project_id=mock_resolve_project.return_value,
         recursive=True,
+        object_client=mock_client.return_value,
     )
 
 
@@ -205,7 +221,7 @@ def test_datasets_cp_exception(mocker, mock_resolve_project, exception):
     assert result.output == "{}\n".format(exception)
 
 
-def test_datasets_rm(mocker, mock_resolve_project):
+def test_datasets_rm(mocker, mock_resolve_project, mock_client):
 
     mock_rm = mocker.patch("faculty.datasets.rm")
 
@@ -215,11 +231,14 @@ def test_datasets_rm(mocker, mock_resolve_project):
 
     mock_resolve_project.assert_called_once_with("test-project")
     mock_rm.assert_called_once_with(
-        "object", project_id=mock_resolve_project.return_value, recursive=False
+        "object",
+        project_id=mock_resolve_project.return_value,
+        recursive=False,
+        object_client=mock_client.return_value,
     )
 
 
-def test_datasets_rm_recursive(mocker, mock_resolve_project):
+def test_datasets_rm_recursive(mocker, mock_resolve_project, mock_client):
 
     mock_rm = mocker.patch("faculty.datasets.rm")
 
@@ -234,6 +253,7 @@ def test_datasets_rm_recursive(mocker, mock_resolve_project):
         "directory",
         project_id=mock_resolve_project.return_value,
         recursive=True,
+        object_client=mock_client.return_value,
     )
 
 
@@ -256,7 +276,7 @@ def test_datasets_rm_exception(mocker, mock_resolve_project, exception):
     assert result.output == "{}\n".format(exception)
 
 
-def test_datasets_ls(mocker, mock_resolve_project):
+def test_datasets_ls(mocker, mock_resolve_project, mock_client):
 
     mock_ls = mocker.patch(
         "faculty.datasets.ls",
@@ -274,5 +294,8 @@ def test_datasets_ls(mocker, mock_resolve_project):
 
     mock_resolve_project.assert_called_once_with("test-project")
     mock_ls.assert_called_once_with(
-        "/", project_id=mock_resolve_project.return_value, show_hidden=True
+        "/",
+        project_id=mock_resolve_project.return_value,
+        show_hidden=True,
+        object_client=mock_client.return_value,
     )
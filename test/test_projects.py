@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
+
 import pytest
 from click.testing import CliRunner
 
@@ -28,7 +30,7 @@ def mock_update_check(mocker):
 
 @pytest.fixture
 def mock_check_credentials(mocker):
-    mocker.patch("faculty_cli.cli._check_credentials")
+    mocker.patch("faculty_cli.auth.check_credentials")
 
 
 def test_list_projects(
@@ -108,3 +110,27 @@ def test_create_project_bad_request(
 
     assert result.exit_code == 64
     assert result.output == "some error\n"
+
+
+def test_list_projects_json(
+    mocker,
+    mock_update_check,
+    mock_check_credentials,
+    mock_profile,
+    mock_user_id,
+):
+    runner = CliRunner()
+    mocker.patch.object(
+        ProjectClient, "list_accessible_by_user", return_value=[PROJECT]
+    )
+
+    result = runner.invoke(cli, ["--output", "json", "project", "list"])
+
+    assert result.exit_code == 0
+    assert json.loads(result.output) == [
+        {
+            "id": str(PROJECT.id),
+            "name": PROJECT.name,
+            "owner_id": str(PROJECT.owner_id),
+        }
+    ]
@@ -0,0 +1,270 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import types
+import uuid
+
+import pytest
+
+import faculty.clients.base
+import faculty_cli.resolve
+from faculty.clients.environment import EnvironmentClient
+from faculty.clients.job import JobClient
+from faculty.clients.project import Project, ProjectClient
+from faculty.clients.server import ServerClient, ServerStatus
+from faculty_cli.util import AmbiguousNameError, NameNotFoundError
+from test.fixtures import DEDICATED_SERVER, PROJECT, SHARED_SERVER, USER_ID
+
+STOPPED_SERVER = SHARED_SERVER._replace(
+    name="stopped-server", status=ServerStatus.ERROR
+)
+JOB = types.SimpleNamespace(
+    id=uuid.uuid4(), metadata=types.SimpleNamespace(name="test-job")
+)
+ENVIRONMENT = types.SimpleNamespace(id=uuid.uuid4(), name="test-environment")
+
+
+@pytest.fixture
+def mock_list_accessible_by_user(mocker):
+    return mocker.patch.object(
+        ProjectClient, "list_accessible_by_user", return_value=[PROJECT]
+    )
+
+
+def test_resolve_project_by_id(mock_list_accessible_by_user):
+    project_id = faculty_cli.resolve.resolve_project(str(PROJECT.id))
+    assert project_id == PROJECT.id
+    mock_list_accessible_by_user.assert_not_called()
+
+
+def test_resolve_project_by_name(
+    mock_profile, mock_user_id, mock_list_accessible_by_user
+):
+    project_id = faculty_cli.resolve.resolve_project(PROJECT.name)
+    assert project_id == PROJECT.id
+    mock_list_accessible_by_user.assert_called_once_with(USER_ID)
+
+
+def test_resolve_project_by_name_cached(
+    mock_profile, mock_user_id, mock_list_accessible_by_user
+):
+    faculty_cli.resolve.resolve_project(PROJECT.name)
+    project_id = faculty_cli.resolve.resolve_project(PROJECT.name)
+    assert project_id == PROJECT.id
+    mock_list_accessible_by_user.assert_called_once_with(USER_ID)
+
+
+def test_resolve_project_cache_miss(
+    mock_profile, mock_user_id, mock_list_accessible_by_user
+):
+    faculty_cli.resolve.list_projects()
+    other_project = Project(
+        id=uuid.uuid4(),
+        name="other-project",
+        owner_id=USER_ID,
+        archived_at=None,
+    )
+    mock_list_accessible_by_user.return_value = [PROJECT, other_project]
+
+    project_id = faculty_cli.resolve.resolve_project(other_project.name)
+
+    assert project_id == other_project.id
+    assert mock_list_accessible_by_user.call_count == 2
+
+
+def test_resolve_project_not_found(
+    mock_profile, mock_user_id, mock_list_accessible_by_user
+):
+    with pytest.raises(NameNotFoundError):
+        faculty_cli.resolve.resolve_project("other-project")
+
+
+def test_resolve_project_ambiguous(
+    mock_profile, mock_user_id, mock_list_accessible_by_user
+):
+    other_project = Project(
+        id=uuid.uuid4(), name=PROJECT.name, owner_id=USER_ID, archived_at=None
+    )
+    mock_list_accessible_by_user.return_value = [PROJECT, other_project]
+    with pytest.raises(AmbiguousNameError):
+        faculty_cli.resolve.resolve_project(PROJECT.name)
+    with pytest.raises(AmbiguousNameError):
+        faculty_cli.resolve.resolve_project(PROJECT.name)
+    assert mock_list_accessible_by_user.call_count == 2
+
+
+@pytest.fixture
+def mock_list_servers(mocker):
+    return mocker.patch.object(
+        ServerClient, "list", return_value=[DEDICATED_SERVER, STOPPED_SERVER]
+    )
+
+
+def test_resolve_server_by_name_cached(mock_profile, mock_list_servers):
+    for _ in range(2):
+        project_id, server_id = faculty_cli.resolve.resolve_server(
+            str(PROJECT.id), DEDICATED_SERVER.name
+        )
+        assert project_id == PROJECT.id
+        assert server_id == DEDICATED_SERVER.id
+    mock_list_servers.assert_called_once_with(PROJECT.id, None)
+
+
+def test_resolve_server_cached_status(mock_profile, mock_list_servers):
+    faculty_cli.resolve.resolve_server(
+        str(PROJECT.id), STOPPED_SERVER.name, ensure_running=False
+    )
+    with pytest.raises(NameNotFoundError):
+        faculty_cli.resolve.resolve_server(
+            str(PROJECT.id), STOPPED_SERVER.name
+        )
+    assert mock_list_servers.call_count == 2
+
+
+def test_resolve_server_ambiguous(mock_profile, mocker):
+    mocker.patch.object(
+        ServerClient, "list", return_value=[DEDICATED_SERVER, SHARED_SERVER]
+    )
+    with pytest.raises(AmbiguousNameError):
+        faculty_cli.resolve.resolve_server(
+            str(PROJECT.id), DEDICATED_SERVER.name
+        )
+
+
+def test_invalidate_servers(mock_profile, mock_list_servers):
+    faculty_cli.resolve.resolve_server(str(PROJECT.id), DEDICATED_SERVER.name)
+    faculty_cli.resolve.invalidate_servers(PROJECT.id)
+    faculty_cli.resolve.resolve_server(str(PROJECT.id), DEDICATED_SERVER.name)
+    assert mock_list_servers.call_count == 2
+
+
+def test_resolve_job_by_name_cached(mocker, mock_profile):
+    mock_list = mocker.patch.object(JobClient, "list", return_value=[JOB])
+    for _ in range(2):
+        project_id, job_id = faculty_cli.resolve.resolve_job(
+            str(PROJECT.id), JOB.metadata.name
+        )
+        assert project_id == PROJECT.id
+        assert job_id == JOB.id
+    mock_list.assert_called_once_with(PROJECT.id)
+
+
+def test_resolve_job_cache_miss(mocker, mock_profile):
+    mock_list = mocker.patch.object(JobClient, "list", return_value=[JOB])
+    faculty_cli.resolve.list_jobs(PROJECT.id)
+    with pytest.raises(NameNotFoundError):
+        faculty_cli.resolve.resolve_job(str(PROJECT.id), "other-job")
+    assert mock_list.call_count == 2
+
+
+def test_with_resolved_retries_stale_cached_id(mocker, mock_profile):
+    stale_id = uuid.uuid4()
+    stale_job = types.SimpleNamespace(id=stale_id, metadata=JOB.metadata)
+    mocker.patch.object(JobClient, "list", return_value=[stale_job])
+    faculty_cli.resolve.list_jobs(PROJECT.id)
+    JobClient.list.return_value = [JOB]
+    request = mocker.Mock(
+        side_effect=[faculty.clients.base.NotFound(mocker.Mock()), "result"]
+    )
+
+    result = faculty_cli.resolve.with_resolved(
+        lambda: faculty_cli.resolve.resolve_job(
+            str(PROJECT.id), JOB.metadata.name
+        ),
+        request,
+    )
+
+    assert result == "result"
+    assert request.call_args_list == [
+        mocker.call((PROJECT.id, stale_id)),
+        mocker.call((PROJECT.id, JOB.id)),
+    ]
+
+
+def test_with_resolved_not_retried_without_cached_id(mocker, mock_profile):
+    mocker.patch.object(JobClient, "list", return_value=[JOB])
+    request = mocker.Mock(
+        side_effect=faculty.clients.base.NotFound(mocker.Mock())
+    )
+
+    with pytest.raises(faculty.clients.base.NotFound):
+        faculty_cli.resolve.with_resolved(
+            lambda: faculty_cli.resolve.resolve_job(
+                str(PROJECT.id), JOB.metadata.name
+            ),
+            request,
+        )
+
+    request.assert_called_once_with((PROJECT.id, JOB.id))
+    JobClient.list.assert_called_once_with(PROJECT.id)
+
+
+def test_resolve_environment_by_name_cached(mocker, mock_profile):
+    mock_list = mocker.patch.object(
+        EnvironmentClient, "list", return_value=[ENVIRONMENT]
+    )
+    for _ in range(2):
+        environment_id = faculty_cli.resolve.resolve_environment(
+            PROJECT.id, ENVIRONMENT.name
+        )
+        assert environment_id == ENVIRONMENT.id
+    mock_list.assert_called_once_with(PROJECT.id)
+
+
+def test_resolve_environments(mocker, mock_profile):
+    other_environment = types.SimpleNamespace(
+        id=uuid.uuid4(), name="other-environment"
+    )
+    mock_list = mocker.patch.object(
+        EnvironmentClient,
+        "list",
+        return_value=[ENVIRONMENT, other_environment],
+    )
+    environment_id = uuid.uuid4()
+
+    environment_ids = faculty_cli.resolve.resolve_environments(
+        PROJECT.id,
+        [other_environment.name, str(environment_id), ENVIRONMENT.name],
+    )
+
+    assert environment_ids == [
+        other_environment.id,
+        environment_id,
+        ENVIRONMENT.id,
+    ]
+    mock_list.assert_called_once_with(PROJECT.id)
+
+
+def test_resolve_environments_reports_all_errors(mocker, mock_profile):
+    duplicate_environment = types.SimpleNamespace(
+        id=uuid.uuid4(), name=ENVIRONMENT.name
+    )
+    mock_list = mocker.patch.object(
+        EnvironmentClient,
+        "list",
+        return_value=[ENVIRONMENT, duplicate_environment],
+    )
+
+    with pytest.raises(NameNotFoundError) as excinfo:
+        faculty_cli.resolve.resolve_environments(
+            PROJECT.id, ["missing-1", ENVIRONMENT.name, "missing-2"]
+        )
+
+    assert str(excinfo.value).splitlines() == [
+        'no available environment of name "missing-1"',
+        'no available environment of name "missing-2"',
+        'more than one environment of name "test-environment", please '
+        "select by environment ID instead",
+    ]
+    mock_list.assert_called_once_with(PROJECT.id)
@@ -12,17 +12,31 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import datetime
+import decimal
+import json
+import uuid
+
+import click
+import faculty.clients.base
+import pytest
 from click.testing import CliRunner
 
-from faculty_cli.cli import cli, _server_spec
+from faculty_cli.cli import cli
+from faculty_cli.server import _LiveTable, _server_spec
 
-from faculty.clients.server import ServerClient
+from faculty.clients.account import AccountClient
+from faculty.clients.cluster import ClusterClient, NodeType
+from faculty.clients.project import ProjectClient
+from faculty.clients.server import ServerClient, ServerStatus
 from test.fixtures import (
+    USER_ID,
     PROJECT,
     SHARED_SERVER,
     DEDICATED_SERVER,
     DEDICATED_RESOURCE,
     SHARED_RESOURCE,
+    SERVER_CREATION_DATE,
 )
 
 
@@ -34,8 +48,8 @@ def test_no_servers_verbose(
     mock_user_id,
 ):
     runner = CliRunner()
-    mocker.patch("faculty_cli.cli._list_projects", return_value=[PROJECT])
-    mocker.patch("faculty_cli.cli._list_user_servers", return_value=[])
+    mocker.patch("faculty_cli.resolve.list_projects", return_value=[PROJECT])
+    mocker.patch("faculty_cli.resolve.list_user_servers", return_value=[])
     mocker.patch.object(ServerClient, "_get", return_value=[])
     result = runner.invoke(cli, ["server", "list", "-v"])
     assert result.exit_code == 0
@@ -50,8 +64,8 @@ def test_list_all_servers_no_servers(
     mock_user_id,
 ):
     runner = CliRunner()
-    mocker.patch("faculty_cli.cli._list_projects", return_value=[PROJECT])
-    mocker.patch("faculty_cli.cli._list_user_servers", return_value=[])
+    mocker.patch("faculty_cli.resolve.list_projects", return_value=[PROJECT])
+    mocker.patch("faculty_cli.resolve.list_user_servers", return_value=[])
     result = runner.invoke(cli, ["server", "list"])
     assert result.exit_code == 0
     assert result.output == ""
@@ -65,9 +79,10 @@ def test_list_all_servers(
     mock_user_id,
 ):
     runner = CliRunner()
-    mocker.patch("faculty_cli.cli._list_projects", return_value=[PROJECT])
+    mocker.patch("faculty_cli.resolve.list_projects", return_value=[PROJECT])
     mocker.patch(
-        "faculty_cli.cli._list_user_servers", return_value=[DEDICATED_SERVER]
+        "faculty_cli.resolve.list_user_servers",
+        return_value=[DEDICATED_SERVER],
     )
     result = runner.invoke(cli, ["server", "list"])
     assert result.exit_code == 0
@@ -82,40 +97,39 @@ def test_list_all_servers_verbose(
     mock_user_id,
 ):
     runner = CliRunner()
-    mocker.patch("faculty_cli.cli._list_projects", return_value=[PROJECT])
+    mocker.patch("faculty_cli.resolve.list_projects", return_value=[PROJECT])
     mocker.patch(
-        "faculty_cli.cli._list_user_servers", return_value=[DEDICATED_SERVER]
+        "faculty_cli.resolve.list_user_servers",
+        return_value=[DEDICATED_SERVER],
     )
-    tabulate = mocker.patch("faculty_cli.cli.tabulate")
+    echo_table = mocker.patch("faculty_cli.table.echo_table")
 
     result = runner.invoke(cli, ["server", "list", "--verbose"])
     assert result.exit_code == 0
-    tabulate.assert_called_once_with(
-        [
-            (
-                PROJECT.name,
-                DEDICATED_SERVER.name,
-                DEDICATED_SERVER.type,
-                DEDICATED_RESOURCE.node_type,
-                "-",
-                "-",
-                DEDICATED_SERVER.status.value,
-                DEDICATED_SERVER.id,
-                DEDICATED_SERVER.created_at.strftime("%Y-%m-%d %H:%M"),
-            )
-        ],
+    [rows, headers, _], _ = echo_table.call_args
+    assert list(rows) == [
         (
-            "Project Name",
-            "Server Name",
-            "Type",
-            "Machine Type",
-            "CPUs",
-            "RAM",
-            "Status",
-            "Server ID",
-            "Started",
-        ),
-        tablefmt="plain",
+            PROJECT.name,
+            DEDICATED_SERVER.name,
+            DEDICATED_SERVER.type,
+            DEDICATED_RESOURCE.node_type,
+            "-",
+            "-",
+            DEDICATED_SERVER.status.value,
+            DEDICATED_SERVER.id,
+            DEDICATED_SERVER.created_at.strftime("%Y-%m-%d %H:%M"),
+        )
+    ]
+    assert headers == (
+        "Project Name",
+        "Server Name",
+        "Type",
+        "Machine Type",
+        "CPUs",
+        "RAM",
+        "Status",
+        "Server ID",
+        "Started",
     )
 
 
@@ -128,9 +142,11 @@ def test_list_servers(
 ):
     runner = CliRunner()
     mocker.patch(
-        "faculty_cli.cli._get_servers", return_value=[DEDICATED_SERVER]
+        "faculty_cli.resolve.get_servers", return_value=[DEDICATED_SERVER]
+    )
+    mocker.patch(
+        "faculty_cli.resolve.resolve_project", return_value=PROJECT.id
     )
-    mocker.patch("faculty_cli.cli._resolve_project", return_value=PROJECT.id)
     result = runner.invoke(cli, ["server", "list", "{}".format(PROJECT.id)])
     assert result.exit_code == 0
     assert result.output == DEDICATED_SERVER.name + "\n"
@@ -145,38 +161,38 @@ def test_list_servers_verbose(
 ):
     runner = CliRunner()
     mocker.patch(
-        "faculty_cli.cli._get_servers", return_value=[DEDICATED_SERVER]
+        "faculty_cli.resolve.get_servers", return_value=[DEDICATED_SERVER]
+    )
+    mocker.patch(
+        "faculty_cli.resolve.resolve_project", return_value=PROJECT.id
     )
-    mocker.patch("faculty_cli.cli._resolve_project", return_value=PROJECT.id)
-    tabulate = mocker.patch("faculty_cli.cli.tabulate")
+    echo_table = mocker.patch("faculty_cli.table.echo_table")
     result = runner.invoke(
         cli, ["server", "list", "{}".format(PROJECT.id), "--verbose"]
     )
     assert result.exit_code == 0
-    tabulate.assert_called_once_with(
-        [
-            (
-                DEDICATED_SERVER.name,
-                DEDICATED_SERVER.type,
-                DEDICATED_RESOURCE.node_type,
-                "-",
-                "-",
-                DEDICATED_SERVER.status.value,
-                DEDICATED_SERVER.id,
-                DEDICATED_SERVER.created_at.strftime("%Y-%m-%d %H:%M"),
-            )
-        ],
+    [rows, headers, _], _ = echo_table.call_args
+    assert list(rows) == [
         (
-            "Server Name",
-            "Type",
-            "Machine Type",
-            "CPUs",
-            "RAM",
-            "Status",
-            "Server ID",
-            "Started",
-        ),
-        tablefmt="plain",
+            DEDICATED_SERVER.name,
+            DEDICATED_SERVER.type,
+            DEDICATED_RESOURCE.node_type,
+            "-",
+            "-",
+            DEDICATED_SERVER.status.value,
+            DEDICATED_SERVER.id,
+            DEDICATED_SERVER.created_at.strftime("%Y-%m-%d %H:%M"),
+        )
+    ]
+    assert headers == (
+        "Server Name",
+        "Type",
+        "Machine Type",
+        "CPUs",
+        "RAM",
+        "Status",
+        "Server ID",
+        "Started",
     )
 
 
@@ -192,3 +208,593 @@ def test_server_spec_shared():
     assert machine_type == "-"
     assert cpus == "{:.3g}".format(SHARED_RESOURCE.milli_cpus / 1000)
     assert memory_gb == "{:.3g}GB".format(SHARED_RESOURCE.memory_mb / 1000)
+
+
+def test_list_all_servers_fetches_user_id_once(
+    mocker, mock_update_check, mock_check_credentials, mock_profile
+):
+    authenticated_user_id = mocker.patch.object(
+        AccountClient, "authenticated_user_id", return_value=USER_ID
+    )
+    list_accessible_by_user = mocker.patch.object(
+        ProjectClient, "list_accessible_by_user", return_value=[PROJECT]
+    )
+    list_for_user = mocker.patch.object(
+        ServerClient, "list_for_user", return_value=[DEDICATED_SERVER]
+    )
+
+    runner = CliRunner()
+    result = runner.invoke(cli, ["server", "list"])
+
+    assert result.exit_code == 0
+    assert result.output == DEDICATED_SERVER.name + "\n"
+    authenticated_user_id.assert_called_once_with()
+    list_accessible_by_user.assert_called_once_with(USER_ID)
+    list_for_user.assert_called_once_with(USER_ID)
+
+
+CREATING_SERVER = SHARED_SERVER._replace(status=ServerStatus.CREATING)
+
+
+@pytest.fixture
+def mock_sleep(mocker):
+    return mocker.patch("time.sleep")
+
+
+def test_new(mocker, mock_update_check, mock_check_credentials, mock_profile):
+    create = mocker.patch.object(
+        ServerClient, "create", return_value=SHARED_SERVER.id
+    )
+    mocker.patch.object(ServerClient, "list", return_value=[SHARED_SERVER])
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli, ["server", "new", str(PROJECT.id), "--name", "worker-{i}"]
+    )
+
+    assert result.exit_code == 0
+    assert result.stdout == "{}\n".format(SHARED_SERVER.id)
+    assert result.stderr == "Creating server test-server\n"
+    assert create.call_args.kwargs["name"] == "worker-1"
+
+
+def test_new_name_not_numbered(
+    mocker, mock_update_check, mock_check_credentials, mock_profile
+):
+    create = mocker.patch.object(
+        ServerClient, "create", return_value=SHARED_SERVER.id
+    )
+    mocker.patch.object(ServerClient, "list", return_value=[SHARED_SERVER])
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli, ["server", "new", str(PROJECT.id), "--name", "worker"]
+    )
+
+    assert result.exit_code == 0
+    assert create.call_args.kwargs["name"] == "worker"
+
+
+def test_new_bad_request(
+    mocker, mock_update_check, mock_check_credentials, mock_profile
+):
+    mocker.patch.object(
+        ServerClient,
+        "create",
+        side_effect=faculty.clients.base.BadRequest(
+            mocker.Mock(), error="Quota exceeded"
+        ),
+    )
+    list_servers = mocker.patch.object(ServerClient, "list")
+
+    runner = CliRunner()
+    result = runner.invoke(cli, ["server", "new", str(PROJECT.id)])
+
+    assert result.exit_code == 64
+    assert result.stdout == ""
+    assert "Quota exceeded" in result.stderr
+    list_servers.assert_not_called()
+
+
+def test_new_list_failure(
+    mocker, mock_update_check, mock_check_credentials, mock_profile
+):
+    mocker.patch.object(ServerClient, "create", return_value=SHARED_SERVER.id)
+    mocker.patch.object(
+        ServerClient,
+        "list",
+        side_effect=faculty.clients.base.HttpError(
+            mocker.Mock(), error="Service unavailable"
+        ),
+    )
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli, ["server", "new", str(PROJECT.id), "--name", "worker"]
+    )
+
+    # The ID of the server created is printed regardless
+    assert result.exit_code == 1
+    assert result.stdout == "{}\n".format(SHARED_SERVER.id)
+    assert "Service unavailable" in result.stderr
+    assert "Creating server worker\n" in result.stderr
+
+
+def test_new_wait(
+    mocker,
+    mock_update_check,
+    mock_check_credentials,
+    mock_profile,
+    mock_sleep,
+):
+    mocker.patch.object(ServerClient, "create", return_value=SHARED_SERVER.id)
+    list_servers = mocker.patch.object(
+        ServerClient, "list", return_value=[CREATING_SERVER]
+    )
+    get = mocker.patch.object(
+        ServerClient,
+        "get",
+        side_effect=[CREATING_SERVER, SHARED_SERVER],
+    )
+
+    runner = CliRunner()
+    result = runner.invoke(cli, ["server", "new", str(PROJECT.id), "--wait"])
+
+    assert result.exit_code == 0
+    assert result.stdout == "{}\n".format(SHARED_SERVER.id)
+    assert result.stderr == (
+        "Creating server test-server\nServer test-server is running\n"
+    )
+    list_servers.assert_called_once_with(PROJECT.id)
+    assert get.call_count == 2
+    get.assert_called_with(PROJECT.id, SHARED_SERVER.id)
+
+    # The polling interval backs off exponentially
+    [first_interval], [second_interval] = [
+        call.args for call in mock_sleep.call_args_list
+    ]
+    assert 0.5 <= first_interval <= 1
+    assert 1 <= second_interval <= 2
+
+
+def test_new_wait_failure(
+    mocker,
+    mock_update_check,
+    mock_check_credentials,
+    mock_profile,
+    mock_sleep,
+):
+    mocker.patch.object(ServerClient, "create", return_value=SHARED_SERVER.id)
+    mocker.patch.object(ServerClient, "list", return_value=[CREATING_SERVER])
+    mocker.patch.object(
+        ServerClient,
+        "get",
+        return_value=SHARED_SERVER._replace(status=ServerStatus.ERROR),
+    )
+
+    runner = CliRunner()
+    result = runner.invoke(cli, ["server", "new", str(PROJECT.id), "--wait"])
+
+    assert result.exit_code == 1
+    assert "Server test-server is error\n" in result.output
+    assert "Server test-server failed to start\n" in result.output
+
+
+def test_new_wait_timeout(
+    mocker,
+    mock_update_check,
+    mock_check_credentials,
+    mock_profile,
+    mock_sleep,
+):
+    mocker.patch.object(ServerClient, "create", return_value=SHARED_SERVER.id)
+    mocker.patch.object(ServerClient, "list", return_value=[CREATING_SERVER])
+    mocker.patch.object(ServerClient, "get", return_value=CREATING_SERVER)
+    mocker.patch("time.monotonic", side_effect=[0, 5, 11])
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        ["server", "new", str(PROJECT.id), "--wait", "--timeout", "10"],
+    )
+
+    assert result.exit_code == 1
+    assert "Timed out waiting for server test-server to start" in (
+        result.output
+    )
+
+
+def test_new_timeout_requires_wait(mocker, mock_update_check):
+    create = mocker.patch.object(ServerClient, "create")
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli, ["server", "new", str(PROJECT.id), "--timeout", "10"]
+    )
+
+    assert result.exit_code == 2
+    assert "--timeout can only be used with --wait" in result.output
+    create.assert_not_called()
+
+
+def test_new_count(
+    mocker,
+    mock_update_check,
+    mock_check_credentials,
+    mock_profile,
+    mock_sleep,
+):
+    workers = [
+        CREATING_SERVER._replace(id=uuid.uuid4(), name="worker-{}".format(i))
+        for i in range(1, 4)
+    ]
+    ids_by_name = {server.name: server.id for server in workers}
+    create = mocker.patch.object(
+        ServerClient,
+        "create",
+        side_effect=lambda *args, name, **kwargs: ids_by_name[name],
+    )
+    mocker.patch.object(
+        ServerClient,
+        "list",
+        side_effect=[
+            workers,
+            [s._replace(status=ServerStatus.RUNNING) for s in workers],
+        ],
+    )
+    get = mocker.patch.object(ServerClient, "get")
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "server",
+            "new",
+            str(PROJECT.id),
+            "--count",
+            "3",
+            "--name",
+            "worker-{i}",
+            "--wait",
+        ],
+    )
+
+    assert result.exit_code == 0
+    assert result.stdout == "".join(
+        "{}\n".format(server.id) for server in workers
+    )
+    assert sorted(call.kwargs["name"] for call in create.call_args_list) == [
+        "worker-1",
+        "worker-2",
+        "worker-3",
+    ]
+    assert "Server worker-3 is running" in result.stderr
+    get.assert_not_called()
+
+
+def test_new_count_create_failure(
+    mocker, mock_update_check, mock_check_credentials, mock_profile
+):
+    bad_request = faculty.clients.base.BadRequest(
+        mocker.Mock(), error="Quota exceeded"
+    )
+    mocker.patch.object(
+        ServerClient,
+        "create",
+        side_effect=[SHARED_SERVER.id, bad_request],
+    )
+    mocker.patch.object(ServerClient, "list", return_value=[SHARED_SERVER])
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli, ["server", "new", str(PROJECT.id), "--count", "2"]
+    )
+
+    assert result.exit_code == 1
+    assert result.stdout == "{}\n".format(SHARED_SERVER.id)
+    assert "Quota exceeded" in result.stderr
+
+
+def test_new_count_http_error(
+    mocker, mock_update_check, mock_check_credentials, mock_profile
+):
+    def create(*args, name, **kwargs):
+        if name == "worker-2":
+            raise faculty.clients.base.Forbidden(mocker.Mock())
+        return SHARED_SERVER.id
+
+    create = mocker.patch.object(ServerClient, "create", side_effect=create)
+    mocker.patch.object(ServerClient, "list", return_value=[SHARED_SERVER])
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        ["server", "new", str(PROJECT.id), "--count", "2", "--name", "worker"],
+    )
+
+    assert result.exit_code == 1
+    assert result.stdout == "{}\n".format(SHARED_SERVER.id)
+    assert "Failed to create server worker-2" in result.stderr
+    assert sorted(call.kwargs["name"] for call in create.call_args_list) == [
+        "worker-1",
+        "worker-2",
+    ]
+
+
+def _worker(name, status=ServerStatus.RUNNING, age_hours=24):
+    return SHARED_SERVER._replace(
+        id=uuid.uuid4(),
+        name=name,
+        status=status,
+        created_at=datetime.datetime.now(datetime.timezone.utc)
+        - datetime.timedelta(hours=age_hours),
+    )
+
+
+def test_terminate_match(
+    mocker, mock_update_check, mock_check_credentials, mock_profile
+):
+    old_worker = _worker("worker-1")
+    new_worker = _worker("worker-2", age_hours=1)
+    other = _worker("notebook")
+    mocker.patch.object(
+        ServerClient, "list", return_value=[old_worker, new_worker, other]
+    )
+    delete = mocker.patch.object(ServerClient, "delete")
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "server",
+            "terminate",
+            str(PROJECT.id),
+            "--match",
+            "worker-*",
+            "--older-than",
+            "8h",
+        ],
+        input="y\n",
+    )
+
+    assert result.exit_code == 0
+    assert "worker-1" in result.output
+    assert "worker-2" not in result.output
+    assert "Terminated 1 servers, 0 failed." in result.output
+    delete.assert_called_once_with(old_worker.id)
+
+
+def test_terminate_all_projects(
+    mocker,
+    mock_update_check,
+    mock_check_credentials,
+    mock_profile,
+    mock_user_id,
+):
+    workers = [_worker("worker-{}".format(i)) for i in range(3)]
+    mocker.patch("faculty_cli.resolve.list_projects", return_value=[PROJECT])
+    mocker.patch("faculty_cli.resolve.list_user_servers", return_value=workers)
+    not_found = faculty.clients.base.NotFound(mocker.Mock())
+
+    def delete_server(server_id):
+        if server_id == workers[0].id:
+            raise not_found
+
+    delete = mocker.patch.object(
+        ServerClient, "delete", side_effect=delete_server
+    )
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        ["server", "terminate", "--all-projects", "--match", "*", "--yes"],
+    )
+
+    assert result.exit_code == 1
+    assert delete.call_count == 3
+    assert "Failed to terminate server worker-0" in result.stderr
+    assert "Terminated 2 servers, 1 failed." in result.stdout
+
+
+def test_terminate_aborted(
+    mocker, mock_update_check, mock_check_credentials, mock_profile
+):
+    mocker.patch.object(
+        ServerClient, "list", return_value=[_worker("worker-1")]
+    )
+    delete = mocker.patch.object(ServerClient, "delete")
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        ["server", "terminate", str(PROJECT.id), "--status", "running"],
+        input="n\n",
+    )
+
+    assert result.exit_code == 1
+    delete.assert_not_called()
+
+
+def test_terminate_requires_server_or_filter(mock_update_check):
+    runner = CliRunner()
+    result = runner.invoke(cli, ["server", "terminate", "project"])
+    assert result.exit_code == 2
+
+
+def test_list_servers_watch(
+    mocker, mock_update_check, mock_check_credentials, mock_profile
+):
+    sleep = mocker.patch("time.sleep")
+    get_servers = mocker.patch(
+        "faculty_cli.resolve.get_servers",
+        side_effect=[
+            [CREATING_SERVER],
+            [SHARED_SERVER],
+            [SHARED_SERVER],
+            KeyboardInterrupt,
+        ],
+    )
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "server",
+            "list",
+            str(PROJECT.id),
+            "--all",
+            "--watch",
+            "--interval",
+            "5",
+        ],
+    )
+
+    assert result.exit_code == 0
+    assert get_servers.call_count == 4
+    sleep.assert_called_with(5)
+    tables = result.output.split("\n\n")
+    # The table is only printed again when it changes
+    assert len(tables) == 3 and tables[-1] == ""
+    assert "creating" in tables[0]
+    assert "running" in tables[1]
+    assert str(SHARED_SERVER.id) in tables[1]
+
+
+def test_list_servers_watch_before_project(
+    mocker, mock_update_check, mock_check_credentials, mock_profile
+):
+    sleep = mocker.patch("time.sleep")
+    get_servers = mocker.patch(
+        "faculty_cli.resolve.get_servers",
+        side_effect=[[SHARED_SERVER], KeyboardInterrupt],
+    )
+
+    runner = CliRunner()
+    result = runner.invoke(cli, ["server", "list", "--watch", str(PROJECT.id)])
+
+    assert result.exit_code == 0
+    get_servers.assert_called_with(PROJECT.id, status=ServerStatus.RUNNING)
+    sleep.assert_called_once_with(2.0)
+
+
+def test_list_servers_interval_requires_watch(mock_update_check):
+    runner = CliRunner()
+    result = runner.invoke(cli, ["server", "list", "--interval", "5"])
+    assert result.exit_code == 2
+    assert "--interval can only be used with --watch" in result.output
+
+
+def test_live_table_highlights_status_changes():
+    table = _LiveTable(("Name", "Status"), 1)
+    table.update([("a", ("server", "creating"))])
+    table.update([("a", ("server", "running"))])
+    assert table._lines[1] == click.style(
+        "server  running", fg="yellow", bold=True
+    )
+    table.update([("a", ("server", "running"))])
+    assert table._lines[1] == "server  running"
+
+
+def test_list_all_servers_ndjson(
+    mocker,
+    mock_update_check,
+    mock_check_credentials,
+    mock_profile,
+    mock_user_id,
+):
+    mocker.patch("faculty_cli.resolve.list_projects", return_value=[PROJECT])
+    mocker.patch(
+        "faculty_cli.resolve.list_user_servers",
+        return_value=[SHARED_SERVER, DEDICATED_SERVER],
+    )
+
+    runner = CliRunner()
+    result = runner.invoke(cli, ["--output", "ndjson", "server", "list"])
+
+    assert result.exit_code == 0
+    shared, dedicated = map(json.loads, result.output.splitlines())
+    assert shared == {
+        "project_id": str(PROJECT.id),
+        "project_name": PROJECT.name,
+        "id": str(SHARED_SERVER.id),
+        "name": SHARED_SERVER.name,
+        "type": SHARED_SERVER.type,
+        "machine_type": None,
+        "milli_cpus": SHARED_RESOURCE.milli_cpus,
+        "memory_mb": SHARED_RESOURCE.memory_mb,
+        "status": "running",
+        "created_at": SERVER_CREATION_DATE.isoformat(),
+    }
+    assert dedicated["machine_type"] == DEDICATED_RESOURCE.node_type
+    assert dedicated["milli_cpus"] is None
+
+
+NODE_TYPE = NodeType(
+    id="m4.xlarge",
+    name="m4.xlarge",
+    instance_group="m4-xlarge",
+    max_interactive_instances=10,
+    max_job_instances=10,
+    milli_cpus=3500,
+    memory_mb=15000,
+    num_gpus=0,
+    gpu_name=None,
+    cost_usd_per_hour=decimal.Decimal("0.2"),
+    spot_max_usd_per_hour=None,
+)
+
+
+def test_instance_types_cached(
+    mocker, mock_update_check, mock_check_credentials, mock_profile
+):
+    list_node_types = mocker.patch.object(
+        ClusterClient,
+        "list_single_tenanted_node_types",
+        return_value=[NODE_TYPE],
+    )
+
+    runner = CliRunner()
+    for _ in range(2):
+        result = runner.invoke(cli, ["server", "instance-types", "-v"])
+        assert result.exit_code == 0
+        assert "$ 0.200 / hour" in result.output
+    list_node_types.assert_called_once_with(
+        interactive_instances_configured=True
+    )
+
+    result = runner.invoke(cli, ["server", "instance-types", "--refresh"])
+    assert result.exit_code == 0
+    assert result.output == "m4.xlarge\n"
+    assert list_node_types.call_count == 2
+
+
+def test_new_unknown_machine_type(
+    mocker, mock_update_check, mock_check_credentials, mock_profile
+):
+    list_node_types = mocker.patch.object(
+        ClusterClient,
+        "list_single_tenanted_node_types",
+        return_value=[NODE_TYPE],
+    )
+    create = mocker.patch.object(ServerClient, "create")
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        ["server", "new", str(PROJECT.id), "--machine-type", "m4.xlarg"],
+    )
+
+    assert result.exit_code == 64
+    assert 'Unknown machine type "m4.xlarg"' in result.output
+    # The catalogue is fetched once, as none was cached
+    list_node_types.assert_called_once()
+    create.assert_not_called()
+
+    result = runner.invoke(
+        cli,
+        ["server", "new", str(PROJECT.id), "--machine-type", "m4.xlarg"],
+    )
+
+    assert result.exit_code == 64
+    # The cached catalogue is refreshed before giving up
+    assert list_node_types.call_count == 2
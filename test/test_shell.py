@@ -0,0 +1,56 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import subprocess
+
+import pytest
+
+from faculty_cli.shell import quote_pattern
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("/project/x", "/project/x"),
+        ("/project/a b/*.csv", "'/project/a b/'*.csv"),
+        ("/project/[ab]c?d", "/project/[ab]c?d"),
+        ("/project/[!a-z]", "/project/[!a-z]"),
+        ("/project/a [x y].txt", "'/project/a '[x\\ y].txt"),
+        ("/project/[$(touch pwned)]", "/project/[\\$\\(touch\\ pwned\\)]"),
+    ],
+)
+def test_quote_pattern(path, expected):
+    assert quote_pattern(path) == expected
+
+
+@pytest.mark.parametrize(
+    "pattern, matches",
+    [
+        ("a [x y].txt", ["a x.txt", "a y.txt"]),
+        ("[$(touch pwned)].txt", ["$.txt"]),
+        ("*.txt", ["$.txt", "a x.txt", "a y.txt"]),
+    ],
+)
+def test_quote_pattern_in_shell(tmpdir, pattern, matches):
+    for name in ["a x.txt", "a y.txt", "$.txt"]:
+        tmpdir.join(name).write("")
+
+    output = subprocess.check_output(
+        ["sh", "-c", "printf '%s\\n' " + quote_pattern(pattern)],
+        cwd=str(tmpdir),
+    )
+
+    assert sorted(output.decode().splitlines()) == matches
+    assert not os.path.exists(str(tmpdir.join("pwned")))
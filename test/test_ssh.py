@@ -0,0 +1,605 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import sys
+import uuid
+
+import faculty.clients.base
+import pytest
+from click.testing import CliRunner
+from faculty.clients.server import ServerClient, ServerStatus, SSHDetails
+
+import faculty_cli.cache
+import faculty_cli.resolve
+import faculty_cli.ssh
+from faculty_cli.cli import cli
+from test.fixtures import PROFILE, PROJECT, SHARED_SERVER, USER_ID
+
+
+SSH_DETAILS = SSHDetails(
+    hostname="test-host", port=2222, username="faculty", key="test-key"
+)
+
+
+@pytest.fixture(autouse=True)
+def enable_multiplexing(mocker, monkeypatch):
+    monkeypatch.delenv(
+        faculty_cli.ssh.DISABLE_MULTIPLEXING_ENV_VAR, raising=False
+    )
+    # Temporary directories are too deep for the control socket path limit
+    mocker.patch("faculty_cli.ssh.MAX_CONTROL_PATH_LENGTH", 1000)
+
+
+@pytest.fixture
+def mock_connection(mocker, mock_profile):
+    mocker.patch(
+        "faculty_cli.resolve.resolve_server",
+        return_value=(PROJECT.id, SHARED_SERVER.id),
+    )
+    mocker.patch.object(
+        ServerClient, "get_ssh_details", return_value=SSH_DETAILS
+    )
+    return mocker.patch("faculty_cli.ssh.run_ssh_cmd", return_value=0)
+
+
+def test_multiplexing_options(cache_dir):
+    server_id = uuid.uuid4()
+    options = faculty_cli.ssh.multiplexing_options(server_id)
+    control_path = cache_dir.join("faculty", "ssh", server_id.hex)
+    assert options == [
+        "-o",
+        "ControlMaster=auto",
+        "-o",
+        "ControlPath={}".format(control_path),
+        "-o",
+        "ControlPersist=10m",
+    ]
+    assert os.stat(control_path.dirname).st_mode & 0o777 == 0o700
+
+
+def test_multiplexing_options_disabled(monkeypatch):
+    monkeypatch.setenv(faculty_cli.ssh.DISABLE_MULTIPLEXING_ENV_VAR, "1")
+    assert faculty_cli.ssh.multiplexing_options(uuid.uuid4()) == []
+
+
+def test_multiplexing_options_long_path(mocker):
+    mocker.patch("faculty_cli.ssh.MAX_CONTROL_PATH_LENGTH", 10)
+    assert faculty_cli.ssh.multiplexing_options(uuid.uuid4()) == []
+
+
+def test_file_put_shares_connection(
+    mock_update_check, mock_connection, cache_dir
+):
+    runner = CliRunner()
+    result = runner.invoke(
+        cli, ["file", "put", "project", "local.txt", "/project/remote.txt"]
+    )
+
+    assert result.exit_code == 0
+    [cmd, _], _ = mock_connection.call_args
+    assert cmd[0] == "scp"
+    assert (
+        "ControlPath={}".format(
+            cache_dir.join("faculty", "ssh", SHARED_SERVER.id.hex)
+        )
+        in cmd
+    )
+    assert cmd[-3:] == [
+        "2222",
+        "local.txt",
+        "faculty@test-host:/project/remote.txt",
+    ]
+
+
+def test_connection_caches_ssh_details(
+    mock_update_check, mock_connection, cache_dir
+):
+    runner = CliRunner()
+    for _ in range(2):
+        result = runner.invoke(
+            cli, ["file", "get", "project", "/project/remote.txt", "local"]
+        )
+        assert result.exit_code == 0
+
+    ServerClient.get_ssh_details.assert_called_once_with(
+        PROJECT.id, SHARED_SERVER.id
+    )
+    key_path = cache_dir.join("faculty", "ssh", SHARED_SERVER.id.hex + ".key")
+    assert key_path.read() == SSH_DETAILS.key
+    assert os.stat(str(key_path)).st_mode & 0o777 == 0o600
+    [cmd, _], _ = mock_connection.call_args
+    assert str(key_path) in cmd
+
+
+def test_stale_cached_server_id(mocker, mock_update_check, mock_profile):
+    stale_id = uuid.uuid4()
+    faculty_cli.cache.store(
+        PROFILE,
+        "projects/{}/servers".format(PROJECT.id),
+        {SHARED_SERVER.name: [[str(stale_id), "running"]]},
+    )
+    mocker.patch.object(ServerClient, "list", return_value=[SHARED_SERVER])
+
+    def get_ssh_details(project_id, server_id):
+        if server_id == stale_id:
+            raise faculty.clients.base.NotFound(mocker.Mock())
+        return SSH_DETAILS
+
+    mocker.patch.object(
+        ServerClient, "get_ssh_details", side_effect=get_ssh_details
+    )
+    run_ssh_cmd = mocker.patch("faculty_cli.ssh.run_ssh_cmd", return_value=0)
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "file",
+            "get",
+            str(PROJECT.id),
+            "/project/remote.txt",
+            "local",
+            "--server",
+            SHARED_SERVER.name,
+        ],
+    )
+
+    assert result.exit_code == 0
+    ServerClient.list.assert_called_once_with(PROJECT.id, None)
+    assert ServerClient.get_ssh_details.call_args_list == [
+        mocker.call(PROJECT.id, stale_id),
+        mocker.call(PROJECT.id, SHARED_SERVER.id),
+    ]
+    run_ssh_cmd.assert_called_once()
+
+
+def test_stale_cached_server_id_not_retried_twice(
+    mocker, mock_update_check, mock_profile
+):
+    mocker.patch.object(ServerClient, "list", return_value=[SHARED_SERVER])
+    mocker.patch.object(
+        ServerClient,
+        "get_ssh_details",
+        side_effect=faculty.clients.base.NotFound(mocker.Mock()),
+    )
+    faculty_cli.resolve.get_servers(PROJECT.id)
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "file",
+            "get",
+            str(PROJECT.id),
+            "/project/remote.txt",
+            "local",
+            "--server",
+            SHARED_SERVER.name,
+        ],
+    )
+
+    assert isinstance(result.exception, faculty.clients.base.NotFound)
+    assert ServerClient.get_ssh_details.call_count == 2
+
+
+def test_run_ssh_cmd_invalidates_on_connection_failure(
+    mocker, mock_profile, cache_dir
+):
+    invalidate_servers = mocker.patch("faculty_cli.resolve.invalidate_servers")
+    mocker.patch(
+        "faculty_cli.resolve.resolve_server",
+        return_value=(PROJECT.id, SHARED_SERVER.id),
+    )
+    mocker.patch.object(
+        ServerClient, "get_ssh_details", return_value=SSH_DETAILS
+    )
+    failing_cmd = [
+        sys.executable,
+        "-c",
+        "import sys; "
+        "sys.stderr.write('ssh: connect to host port 22: "
+        "Connection refused\\n')",
+    ]
+
+    with faculty_cli.ssh.connection("project", "server") as connection:
+        faculty_cli.ssh.run_ssh_cmd(failing_cmd, connection)
+
+    assert faculty_cli.ssh._load_ssh_details(PROFILE, SHARED_SERVER.id) is None
+    invalidate_servers.assert_called_once_with(PROJECT.id)
+
+
+def test_run_ssh_cmd_pumps_output(capsys):
+    chunks = []
+    cmd = [
+        sys.executable,
+        "-c",
+        "import sys; "
+        "sys.stdout.write('x' * 100000); sys.stdout.flush(); "
+        "sys.stderr.write('Permission '); sys.stderr.flush(); "
+        "sys.stderr.write('denied (publickey)\\n')",
+    ]
+
+    exit_code = faculty_cli.ssh.run_ssh_cmd(cmd, stdout_callback=chunks.append)
+
+    assert exit_code == 0
+    assert b"".join(chunks) == b"x" * 100000
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "Permission denied (publickey)\n" in captured.err
+    assert faculty_cli.ssh.PERMISSION_DENIED_MESSAGE in captured.err
+
+
+def test_sync_up_summary(mock_update_check, mock_connection):
+    stats = (
+        b"Number of files: 12 (reg: 10, dir: 2)\n"
+        b"Number of regular files transferred: 3\n"
+        b"Total file size: 9,000,000 bytes\n"
+        b"Total transferred file size: 2,500,000 bytes\n"
+    )
+
+    def run_ssh_cmd(cmd, connection, stdout_callback):
+        stdout_callback(stats[:40])
+        stdout_callback(stats[40:])
+        return 0
+
+    mock_connection.side_effect = run_ssh_cmd
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "--output",
+            "ndjson",
+            "file",
+            "sync-up",
+            "project",
+            "local",
+            "/project/remote",
+            "--summary",
+        ],
+    )
+
+    assert result.exit_code == 0
+    [cmd, _], _ = mock_connection.call_args
+    assert cmd[-1] == "--stats"
+    record = json.loads(result.stdout)
+    assert record["files"] == 3
+    assert record["bytes"] == 2500000
+    assert result.stderr == stats.decode()
+
+
+def test_sync_up_failure(mock_update_check, mock_connection):
+    def run_ssh_cmd(cmd, connection, stdout_callback):
+        stdout_callback(b"Number of regular files transferred: 3\n")
+        return 23
+
+    mock_connection.side_effect = run_ssh_cmd
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "file",
+            "sync-up",
+            "project",
+            "local",
+            "/project/remote",
+            "--summary",
+        ],
+    )
+
+    assert result.exit_code == 23
+    assert "Syncing files failed." in result.stderr
+    assert "Transferred" not in result.output
+
+
+def test_file_put_summary(mock_update_check, mock_connection, tmpdir):
+    local = tmpdir.join("local.txt")
+    local.write("x" * 2000)
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        ["file", "put", "project", str(local), "/project/", "--summary"],
+    )
+
+    assert result.exit_code == 0
+    assert result.stderr.startswith("Transferred 1 file, 0.0 MB in ")
+
+
+def test_file_put_multiple_sources(mock_update_check, mock_connection, tmpdir):
+    for name in ["a.csv", "b.csv", "c.txt"]:
+        tmpdir.join(name).write(name)
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "file",
+            "put",
+            "project",
+            str(tmpdir.join("*.csv")),
+            str(tmpdir.join("c.txt")),
+            "/project/results dir/",
+        ],
+    )
+
+    assert result.exit_code == 0
+    [cmd, _], _ = mock_connection.call_args
+    assert cmd[-4:] == [
+        str(tmpdir.join("a.csv")),
+        str(tmpdir.join("b.csv")),
+        str(tmpdir.join("c.txt")),
+        "faculty@test-host:'/project/results dir/'",
+    ]
+
+
+def test_file_put_existing_path_like_glob(
+    mock_update_check, mock_connection, tmpdir
+):
+    local = tmpdir.join("data[1].csv")
+    local.write("data")
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli, ["file", "put", "project", str(local), "/project/"]
+    )
+
+    assert result.exit_code == 0
+    [cmd, _], _ = mock_connection.call_args
+    assert cmd[-2] == str(local)
+
+
+def test_file_put_no_glob_match(mock_update_check, mock_connection, tmpdir):
+    runner = CliRunner()
+    result = runner.invoke(
+        cli, ["file", "put", "project", str(tmpdir.join("*.csv")), "/project"]
+    )
+
+    assert result.exit_code == 66
+    mock_connection.assert_not_called()
+
+
+def test_file_put_parallel(mock_update_check, mock_connection, tmpdir):
+    sizes = {"a": 300, "b": 200, "c": 100, "d": 100}
+    for name, size in sizes.items():
+        tmpdir.join(name).write("x" * size)
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "file",
+            "put",
+            "project",
+            str(tmpdir.join("*")),
+            "/project/",
+            "--parallel",
+            "2",
+        ],
+    )
+
+    assert result.exit_code == 0
+    shards = []
+    for (cmd, _), _ in mock_connection.call_args_list:
+        sources = cmd[-3:-1]
+        shards.append(sorted(os.path.basename(path) for path in sources))
+    assert sorted(shards) == [["a", "d"], ["b", "c"]]
+
+
+def test_file_put_parallel_failure(mock_update_check, mock_connection, tmpdir):
+    for name in ["a", "b"]:
+        tmpdir.join(name).write(name)
+    mock_connection.side_effect = lambda cmd, connection: (
+        1 if cmd[-2].endswith("b") else 0
+    )
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "file",
+            "put",
+            "project",
+            str(tmpdir.join("*")),
+            "/project/",
+            "--parallel",
+            "2",
+        ],
+    )
+
+    assert mock_connection.call_count == 2
+    assert result.exit_code == 1
+
+
+def test_file_get_remote_glob(mock_update_check, mock_connection):
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "file",
+            "get",
+            "project",
+            "/project/my results/*.csv",
+            "/project/log.txt",
+            "local",
+        ],
+    )
+
+    assert result.exit_code == 0
+    [cmd, _], _ = mock_connection.call_args
+    assert cmd[-3:] == [
+        "faculty@test-host:'/project/my results/'*.csv",
+        "faculty@test-host:/project/log.txt",
+        "local",
+    ]
+
+
+def test_file_get_parallel_expands_remote_glob(
+    mock_update_check, mock_connection
+):
+    def run_ssh_cmd(cmd, connection, stdout_callback=None):
+        if cmd[0] == "ssh":
+            assert cmd[-1] == "printf '%s\\0' /project/*.csv"
+            stdout_callback(b"/project/a.csv\0/project/b.csv\0")
+        return 0
+
+    mock_connection.side_effect = run_ssh_cmd
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "file",
+            "get",
+            "project",
+            "/project/*.csv",
+            "local",
+            "--parallel",
+            "2",
+        ],
+    )
+
+    assert result.exit_code == 0
+    scp_sources = sorted(
+        cmd[-2] for (cmd, _), _ in mock_connection.call_args_list[1:]
+    )
+    assert scp_sources == [
+        "faculty@test-host:/project/a.csv",
+        "faculty@test-host:/project/b.csv",
+    ]
+
+
+def _files_from(cmd):
+    [option] = [arg for arg in cmd if arg.startswith("--files-from=")]
+    with open(option.split("=", 1)[1], "rb") as fp:
+        return sorted(fp.read().decode().split("\0"))
+
+
+def test_sync_up_parallel(mock_update_check, mock_connection, tmpdir):
+    source = tmpdir.mkdir("data")
+    source.join("big").write("x" * 300000)
+    source.mkdir("dir").join("file").write("x" * 200000)
+    source.join("small").write("x")
+    shards = []
+
+    def run_ssh_cmd(cmd, connection):
+        shards.append((cmd[-2:], _files_from(cmd)))
+        return 0
+
+    mock_connection.side_effect = run_ssh_cmd
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "file",
+            "sync-up",
+            "project",
+            str(source),
+            "/project/data",
+            "--parallel",
+            "2",
+        ],
+    )
+
+    assert result.exit_code == 0
+    assert sorted(shards) == [
+        (
+            [str(tmpdir) + "/", "faculty@test-host:/project/data"],
+            ["data/big"],
+        ),
+        (
+            [str(tmpdir) + "/", "faculty@test-host:/project/data"],
+            ["data/dir", "data/small"],
+        ),
+    ]
+    assert "Finished 2 of 2 rsync workers." in result.stderr
+
+
+def test_sync_down_parallel(mock_update_check, mock_connection):
+    listing = b"100 a\0" b"4096 b\0" b"100 b/x\0" b"100 b/y\0" b"100 c\0"
+    shards = []
+
+    def run_ssh_cmd(cmd, connection, stdout_callback=None):
+        if cmd[0] == "ssh":
+            assert cmd[-1].startswith("find /project/data/ -mindepth 1 ")
+            stdout_callback(listing)
+            return 0
+        shards.append(_files_from(cmd))
+        assert cmd[-2:] == ["faculty@test-host:/project/data/", "local"]
+        return 23 if "a" in shards[-1] else 0
+
+    mock_connection.side_effect = run_ssh_cmd
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "file",
+            "sync-down",
+            "project",
+            "/project/data/",
+            "local",
+            "--parallel",
+            "2",
+        ],
+    )
+
+    assert result.exit_code == 23
+    assert sorted(shards) == [["a", "c"], ["b"]]
+    assert "1 of 2 rsync workers failed." in result.stderr
+
+
+def test_ssh_config(
+    mocker, mock_update_check, mock_profile, mock_user_id, cache_dir, tmpdir
+):
+    mocker.patch("faculty_cli.resolve.list_projects", return_value=[PROJECT])
+    list_user_servers = mocker.patch(
+        "faculty_cli.resolve.list_user_servers", return_value=[SHARED_SERVER]
+    )
+    mocker.patch.object(
+        ServerClient, "get_ssh_details", return_value=SSH_DETAILS
+    )
+    path = tmpdir.join("faculty_config")
+
+    runner = CliRunner()
+    result = runner.invoke(cli, ["ssh-config", "--file", str(path)])
+
+    assert result.exit_code == 0
+    list_user_servers.assert_called_once_with(
+        USER_ID, status=ServerStatus.RUNNING
+    )
+    ssh_dir = cache_dir.join("faculty", "ssh")
+    assert path.read() == "\n".join(
+        [
+            "Host faculty-test-project-test-server",
+            "    HostName test-host",
+            "    Port 2222",
+            "    User faculty",
+            "    IdentityFile {}".format(
+                ssh_dir.join(SHARED_SERVER.id.hex + ".key")
+            ),
+            "    IdentitiesOnly yes",
+            "    StrictHostKeyChecking no",
+            "    BatchMode yes",
+            "    ControlMaster auto",
+            "    ControlPath {}".format(ssh_dir.join(SHARED_SERVER.id.hex)),
+            "    ControlPersist 10m",
+            "",
+        ]
+    )
+    assert os.stat(str(path)).st_mode & 0o777 == 0o600
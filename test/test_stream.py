@@ -0,0 +1,162 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import uuid
+
+import pytest
+from click.testing import CliRunner
+
+import faculty_cli.ssh
+import faculty_cli.stream
+from faculty_cli.cli import cli
+
+
+CONNECTION = faculty_cli.ssh.SSHConnection(
+    project_id=uuid.uuid4(),
+    server_id=uuid.uuid4(),
+    hostname="test-host",
+    port=2222,
+    username="faculty",
+    options=[],
+)
+
+
+@pytest.fixture
+def local_server(mocker):
+    """Run commands for the server in a local shell instead of over SSH."""
+    return mocker.patch(
+        "faculty_cli.ssh.ssh_command",
+        side_effect=lambda connection, command: ["sh", "-c", command],
+    )
+
+
+@pytest.mark.parametrize("available", [None, {"gzip"}, {"zstd", "gzip"}])
+def test_round_trip(mocker, local_server, tmpdir, available):
+    if available is not None:
+        mocker.patch(
+            "shutil.which",
+            side_effect=lambda name: name if name in available else None,
+        )
+    source = tmpdir.mkdir("source")
+    source.mkdir("data").join("a.txt").write("a")
+    source.join("data", "-b.txt").write("b" * 10000)
+
+    exit_code = faculty_cli.stream.upload(
+        CONNECTION,
+        faculty_cli.stream.local_members([str(source.join("data"))]),
+        str(tmpdir.join("server")),
+    )
+    assert exit_code == 0
+    assert tmpdir.join("server", "data", "-b.txt").read() == "b" * 10000
+
+    exit_code = faculty_cli.stream.download(
+        CONNECTION,
+        faculty_cli.stream.remote_members(
+            [str(tmpdir.join("server", "data", "a.txt"))]
+        ),
+        str(tmpdir.join("local")),
+    )
+    assert exit_code == 0
+    assert tmpdir.join("local", "a.txt").read() == "a"
+
+
+def test_compressor_preference(mocker, local_server):
+    mocker.patch("shutil.which", return_value="/usr/bin/compressor")
+    mocker.patch(
+        "faculty_cli.ssh.remote_output", return_value=b"/usr/bin/lz4\n"
+    )
+    assert faculty_cli.stream._compressor(CONNECTION).name == "lz4"
+
+
+def test_compressor_unavailable(mocker):
+    mocker.patch("faculty_cli.ssh.remote_output", return_value=b"")
+    assert faculty_cli.stream._compressor(CONNECTION) is None
+
+
+def test_download_failure(local_server, tmpdir):
+    exit_code = faculty_cli.stream.download(
+        CONNECTION,
+        faculty_cli.stream.remote_members([str(tmpdir.join("missing"))]),
+        str(tmpdir.join("local")),
+    )
+    assert exit_code != 0
+
+
+@pytest.mark.parametrize(
+    "remote, expected",
+    [("data", ["data", "a.txt"]), ("data/", ["a.txt"])],
+)
+def test_sync_down_stream(
+    mocker,
+    mock_update_check,
+    mock_check_credentials,
+    local_server,
+    tmpdir,
+    remote,
+    expected,
+):
+    mocker.patch(
+        "faculty_cli.ssh.connection",
+        return_value=contextlib.nullcontext(CONNECTION),
+    )
+    tmpdir.mkdir("server").mkdir("data").join("a.txt").write("a")
+    remote = str(tmpdir.join("server")) + "/" + remote
+    local = tmpdir.join("local")
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        ["file", "sync-down", "project", remote, str(local), "--stream"],
+    )
+
+    assert result.exit_code == 0
+    assert local.join(*expected).read() == "a"
+
+
+@pytest.mark.parametrize("command", ["put", "get"])
+def test_stream_failure(
+    mocker, mock_update_check, mock_check_credentials, tmpdir, command
+):
+    mocker.patch(
+        "faculty_cli.ssh.connection",
+        return_value=contextlib.nullcontext(CONNECTION),
+    )
+    mocker.patch("faculty_cli.stream.upload", return_value=2)
+    mocker.patch("faculty_cli.stream.download", return_value=2)
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        ["file", command, "project", str(tmpdir), str(tmpdir), "--stream"],
+    )
+
+    assert result.exit_code == 2
+    assert "Streaming files failed." in result.stderr
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["file", "put", "project", "a", "/project", "--parallel", "2"],
+        ["file", "sync-up", "project", "a", "/project", "--delete"],
+    ],
+)
+def test_stream_invalid_options(
+    mock_update_check, mock_check_credentials, args
+):
+    runner = CliRunner()
+    result = runner.invoke(cli, args + ["--stream"])
+
+    assert result.exit_code == 64
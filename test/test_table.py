@@ -0,0 +1,120 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import sys
+import uuid
+
+import click
+import pytest
+from tabulate import tabulate
+
+import faculty_cli.table
+import faculty_cli.util
+
+
+ROWS = [("first", uuid.uuid4(), 1), ("second-longer", uuid.uuid4(), 12)]
+HEADERS = ("Name", "ID", "Number")
+
+
+@pytest.fixture
+def mock_isatty(mocker, capsys):
+    return mocker.patch.object(sys.stdout, "isatty")
+
+
+def test_echo_table_on_terminal(mock_isatty, capsys):
+    mock_isatty.return_value = True
+    faculty_cli.table.echo_table(ROWS, HEADERS)
+    out, _ = capsys.readouterr()
+    assert out == tabulate(ROWS, HEADERS, tablefmt="plain") + "\n"
+
+
+def test_echo_table_streamed_matches_tabulate(mock_isatty, capsys):
+    mock_isatty.return_value = False
+    faculty_cli.table.echo_table(iter(ROWS), HEADERS)
+    out, _ = capsys.readouterr()
+    assert out == tabulate(ROWS, HEADERS, tablefmt="plain") + "\n"
+
+
+def test_echo_table_streams_large_tables(mocker, mock_isatty, capsys):
+    mock_isatty.return_value = True
+    mocker.patch("faculty_cli.table.STREAM_THRESHOLD", 2)
+    mocker.patch("faculty_cli.table.SAMPLE_SIZE", 1)
+    tabulate = mocker.patch("faculty_cli.table.tabulate")
+
+    faculty_cli.table.echo_table(
+        ROWS, HEADERS, (None, faculty_cli.table.UUID_WIDTH, None)
+    )
+
+    tabulate.assert_not_called()
+    out, _ = capsys.readouterr()
+    # Columns are sized from the first row, and wider values overflow
+    assert out.splitlines() == [
+        "Name    ID" + " " * 38 + "Number",
+        "first   {}         1".format(ROWS[0][1]),
+        "second-longer  {}        12".format(ROWS[1][1]),
+    ]
+
+
+def test_echo_table_consumes_rows_lazily(mocker, mock_isatty, capsys):
+    mock_isatty.return_value = False
+    mocker.patch("faculty_cli.table.SAMPLE_SIZE", 1)
+    consumed = []
+
+    def rows():
+        for row in ROWS:
+            consumed.append(row)
+            yield row
+            # The row must have been printed before the next is produced
+            assert str(row[1]) in capsys.readouterr().out
+
+    faculty_cli.table.echo_table(rows(), HEADERS)
+    assert consumed == ROWS
+
+
+@pytest.mark.parametrize(
+    "output_format, expected",
+    [
+        (
+            "ndjson",
+            '{{"name": "first", "id": "{}", "number": 1}}\n'
+            '{{"name": "second-longer", "id": "{}", "number": 12}}\n',
+        ),
+        (
+            "json",
+            '[{{"name": "first", "id": "{}", "number": 1}},\n'
+            ' {{"name": "second-longer", "id": "{}", "number": 12}}]\n',
+        ),
+        (
+            "csv",
+            "name,id,number\nfirst,{},1\nsecond-longer,{},12\n",
+        ),
+    ],
+)
+def test_echo_records(output_format, expected, capsys):
+    ctx = click.Context(click.Command("test"))
+    ctx.meta[faculty_cli.util.OUTPUT_FORMAT_KEY] = output_format
+    with ctx:
+        faculty_cli.table.echo_records(iter(ROWS), ("name", "id", "number"))
+    out, _ = capsys.readouterr()
+    assert out == expected.format(ROWS[0][1], ROWS[1][1])
+
+
+def test_echo_records_empty_json(capsys):
+    ctx = click.Context(click.Command("test"))
+    ctx.meta[faculty_cli.util.OUTPUT_FORMAT_KEY] = "json"
+    with ctx:
+        faculty_cli.table.echo_records([], ("name",))
+    out, _ = capsys.readouterr()
+    assert json.loads(out) == []
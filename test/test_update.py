@@ -0,0 +1,102 @@
+# Copyright 2016-2022 Faculty Science Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import time
+
+import pytest
+
+import faculty_cli.update
+
+
+@pytest.fixture(autouse=True)
+def enable_update_check(monkeypatch):
+    monkeypatch.delenv("FACULTY_CLI_DISABLE_UPDATE_CHECK", raising=False)
+
+
+@pytest.fixture
+def mock_background_check(mocker):
+    return mocker.patch("faculty_cli.update._start_background_check")
+
+
+def _write_last_check(cache_dir, content, age):
+    path = cache_dir.join("faculty", "last_update_check")
+    path.write(content, ensure=True)
+    timestamp = time.time() - age
+    os.utime(str(path), (timestamp, timestamp))
+    return path
+
+
+def test_check_for_new_release_first_run(cache_dir, mock_background_check):
+    faculty_cli.update.check_for_new_release()
+    mock_background_check.assert_called_once_with()
+    assert cache_dir.join("faculty", "last_update_check").check()
+
+
+def test_check_for_new_release_recent(cache_dir, mock_background_check):
+    _write_last_check(cache_dir, "0.1.0", age=60)
+    faculty_cli.update.check_for_new_release()
+    mock_background_check.assert_not_called()
+
+
+def test_check_for_new_release_stale(
+    mocker, cache_dir, mock_background_check, capsys
+):
+    mocker.patch("faculty_cli.version.__version__", "0.1.0")
+    path = _write_last_check(cache_dir, "0.2.0", age=2 * 86400)
+
+    faculty_cli.update.check_for_new_release()
+
+    mock_background_check.assert_called_once_with()
+    assert "version 0.2.0 is available" in capsys.readouterr().err
+    assert path.mtime() > time.time() - 60
+    assert path.read() == "0.2.0"
+
+
+def test_check_for_new_release_up_to_date(
+    mocker, cache_dir, mock_background_check, capsys
+):
+    mocker.patch("faculty_cli.version.__version__", "0.2.0")
+    _write_last_check(cache_dir, "0.2.0", age=2 * 86400)
+
+    faculty_cli.update.check_for_new_release()
+
+    mock_background_check.assert_called_once_with()
+    assert capsys.readouterr().err == ""
+
+
+def test_check_for_new_release_disabled(
+    monkeypatch, cache_dir, mock_background_check
+):
+    monkeypatch.setenv("FACULTY_CLI_DISABLE_UPDATE_CHECK", "1")
+    faculty_cli.update.check_for_new_release()
+    mock_background_check.assert_not_called()
+    assert not cache_dir.join("faculty").check()
+
+
+def test_check_for_new_release_unwritable_cache(
+    mocker, cache_dir, mock_background_check
+):
+    mocker.patch("faculty_cli.update._set_mtime", side_effect=OSError)
+    faculty_cli.update.check_for_new_release()
+    mock_background_check.assert_not_called()
+
+
+def test_record_latest_release(mocker, cache_dir):
+    mocker.patch(
+        "faculty_cli.update._get_pypi_versions",
+        return_value=["0.9.0", "0.10.0", "0.2.1"],
+    )
+    faculty_cli.update._record_latest_release()
+    assert cache_dir.join("faculty", "last_update_check").read() == "0.10.0"